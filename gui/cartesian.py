@@ -1,234 +1,96 @@
 import flet
 import numpy as np
-import threading
-import time
-import warnings
-import xml.etree.ElementTree as ET
-from ikpy.chain import Chain
 from scipy.spatial.transform import Rotation as R
-from scipy.spatial.transform import Slerp
-
-# === TOOL DICTIONARY ===
-# UPDATED WITH USER OFFSET: Z(-90) -> RY(-180) -> X(-100)
-ROBOT_TOOLS = {
-    "CHWYTAK_MALY": {
-        "translation": [0.100, 0.0, -0.090],  # 100mm Forward (due to RY flip), 90mm down
-        "orientation": [0.0, -180.0, 0.0]
-    },
-    
-    "CHWYTAK_DUZY": {
-        "translation": [0.0, 0.0, -0.18831],  # Z: -188.31mm
-        "orientation": [0.0, -90.0, 0.0]       # Rotation around Y: -90 degrees
-    }
-}
+from parol6.kinematics import get_kinematics_engine
+from parol6.collision import get_collision_checker
+from parol6.obstacles import get_obstacle_monitor
+from parol6.scheduler import get_setpoint_scheduler
+from parol6.moves import PlanningError
+from parol6.poses import get_move_library
+from parol6.validation import WORKSPACE_LIMITS
+from parol6.program import Program, ProgramError, ProgramRunner, estimate_cycle_time
+from parol6.script import ScriptRunner, load_script
+from parol6.protocol import format_joint_command
+from parol6.state import get_robot_state
+from parol6.streaming import TrajectoryStreamer
+from parol6.tasks import get_task_loop
+from gui.lifecycle import ViewLifecycle
+from gui.render import BoundLabels, get_render_coordinator
+
+UPDATE_PERIOD = 0.05            # Label refresh period [s] (20 Hz)
 
 # ==============================================================================
-# 1. KINEMATICS ENGINE (UPDATED FROM USER REQUEST)
+# 2. CARTESIAN VIEW (MINIMALISTYCZNY)
 # ==============================================================================
-class KinematicsEngine:
-    def __init__(self, urdf_path, active_links_mask=None):
-        self.chain = None
-        self.urdf_path = urdf_path
-        self.n_active_joints = 6
-        self.visual_origins = {}
-        self.joint_limits_rad = [(-np.pi, np.pi)] * 6
-        
-        self.tool_translation = np.zeros(3) 
-        self.tool_rotation_matrix = np.eye(3) 
-        self.current_tool = "NONE"
-        
-        # Zero World Offset - using pure tool calibration instead
-        self.world_offset = np.array([0.0, 0.0, 0.0]) 
+class CartesianView(ViewLifecycle, flet.Container):
+    def __init__(self, uart_communicator, urdf_path, active_links_mask=None, on_error=None, use_ik_worker=False, streamer=None):
+        super().__init__()
+        self.uart = uart_communicator
+        # Shared process-wide engine (same instance as JogView)
+        self.ik = get_kinematics_engine(urdf_path)
+        self.on_error = on_error
 
+        # IK solver for the jog loop: in-process engine or dedicated worker process (optional)
+        self.ik_solver = self.ik
+        if use_ik_worker:
+            try:
+                from parol6.ik_worker import KinematicsWorker
+                self.ik_solver = KinematicsWorker(self.ik, urdf_path)
+            except Exception as e:
+                print(f"[CARTESIAN] IK worker unavailable, using in-process IK: {e}")
+        # Jog / move loops tick on the shared drift-free scheduler (its motion thread)
+        self.scheduler = get_setpoint_scheduler()
+
+        # Mesh-based self-collision check of every jog target
+        self.collision = None
         try:
-            print(f"[IK] Loading URDF: {urdf_path}")
-            
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", UserWarning)
-                self.chain = Chain.from_urdf_file(urdf_path)
-            
-            # Automatyczna maska (fallback logic matching User's code)
-            mask = []
-            for link in self.chain.links:
-                if link.joint_type == 'fixed':
-                    mask.append(False)
-                else:
-                    mask.append(True)
-            
-            self.chain.active_links_mask = mask
-            self.active_links_mask = mask # Store strictly for reference if needed
-            
-            # === ZWIĘKSZONA PRECYZJA (ZOPTYMALIZOWANA DLA LINUX/RPI) ===
-            self.chain.max_iterations = 20
-            self.chain.convergence_limit = 1e-3
-            
-            self.joint_limits_rad = self._load_active_joint_limits()
-            self.visual_origins = self._load_visual_origins(urdf_path)
-            
-            # Default to Small Gripper as per previous behavior/logic
-            self.set_tool("CHWYTAK_MALY")
-            
-            print(f"[IK] Ready. Mask: {mask}")
-
+            self.collision = get_collision_checker(self.ik)
         except Exception as e:
-            print(f"[IK ERROR] {e}")
-            self._setup_mock_chain()
-
-    def set_tool(self, tool_name):
-        if tool_name not in ROBOT_TOOLS:
-            print(f"[IK] Unknown tool: {tool_name}")
-            return
-
-        tool_data = ROBOT_TOOLS[tool_name]
-        self.tool_translation = np.array(tool_data["translation"])
-        rpy = tool_data.get("orientation", [0,0,0])
-        self.tool_rotation_matrix = R.from_euler('xyz', rpy, degrees=True).as_matrix()
-        
-        self.current_tool = tool_name
-        print(f"[IK] Tool Set: {tool_name} -> Offset: {self.tool_translation}")
-
-    # ================= KINEMATYKA =================
-
-    def forward_kinematics(self, active_angles):
-        """Returns 4x4 TCP Matrix (including tool offset)."""
-        full_joints = self._active_to_full(active_angles)
-        flange_matrix = self.chain.forward_kinematics(full_joints)
-        
-        R_flange = flange_matrix[:3, :3]
-        P_flange = flange_matrix[:3, 3]
-        
-        # P_tcp = P_flange + (R_flange * Offset) + WorldOffset
-        offset_global = R_flange @ self.tool_translation
-        P_tcp = P_flange + offset_global + self.world_offset
-        
-        tcp_matrix = np.eye(4)
-        tcp_matrix[:3, 3] = P_tcp
-        tcp_matrix[:3, :3] = R_flange @ self.tool_rotation_matrix
-        
-        return tcp_matrix
-
-    def inverse_kinematics(self, target_position, target_orientation, initial_guess=None):
-        """
-        Solves IK for a target TCP position and orientation.
-        target_position: [x, y, z] of TCP
-        target_orientation: 3x3 rotation matrix of TCP
-        """
-        if initial_guess is None: initial_guess = np.zeros(6)
-        
-        # Revert World Offset before solving in URDF frame
-        target_raw = target_position - self.world_offset
-        
-        # 1. Determine Flange Orientation
-        # R_tcp = R_flange * R_tool  =>  R_flange = R_tcp * inv(R_tool)
-        target_rot_matrix = target_orientation 
-        flange_rot_matrix = target_rot_matrix @ np.linalg.inv(self.tool_rotation_matrix)
-        
-        # 2. Determine Flange Position
-        # P_tcp = P_flange + (R_flange * Offset)  =>  P_flange = P_tcp - (R_flange * Offset)
-        offset_global = flange_rot_matrix @ self.tool_translation
-        target_pos_flange = target_raw - offset_global
-        
-        full_guess = self._active_to_full(initial_guess)
-        
-        # 3. Solver IKPy
-        full_sol = self.chain.inverse_kinematics(
-            target_position=target_pos_flange,
-            target_orientation=flange_rot_matrix, 
-            orientation_mode='all', 
-            initial_position=full_guess
-        )
-        
-        return self._full_to_active(full_sol)
+            print(f"[CARTESIAN] Collision checker unavailable: {e}")
+        self.check_collision = False
+        self.collision_reported = False
 
-    # ================= HELPERS (Updated to match User's logic) =================
-
-    def _active_to_full(self, active_joints):
-        arr = np.array(active_joints, dtype=float).flatten()
-        # Handle cases where input might be [0, J1, J2...] or just [J1, J2...]
-        if len(arr) == 7: arr = arr[1:] 
-        if len(arr) != 6: arr = np.resize(arr, 6)
-        
-        full = np.zeros(len(self.chain.links))
-        curr = 0
-        for i, act in enumerate(self.active_links_mask):
-            if act and curr < 6:
-                full[i] = arr[curr]
-                curr += 1
-        return full
-
-    def _full_to_active(self, full_vector):
-        if self.active_links_mask: return np.compress(self.active_links_mask, full_vector)
-        return np.zeros(6)
-    
-    def _load_active_joint_limits(self):
-        # Specific Parol6 limits
-        deg = [
-            (-90, 90),  # J1
-            (-50, 140), # J2
-            (-100, 70), # J3
-            (-100, 180),# J4
-            (-120, 110),# J5
-            (-110, 180) # J6
-        ]
-        return [(np.deg2rad(mn), np.deg2rad(mx)) for mn, mx in deg]
-
-    def _load_visual_origins(self, urdf_path):
-        origins = {}
+        # Cell obstacles (cell_obstacles.json): slow down near them, hold before contact
+        self.obstacles = None
         try:
-            tree = ET.parse(urdf_path); root = tree.getroot()
-            for link in root.findall('link'):
-                vis = link.find('visual')
-                if vis:
-                    o = vis.find('origin')
-                    if o is not None:
-                        xyz = [float(x) for x in o.attrib.get('xyz','0 0 0').split()]
-                        rpy = [float(r) for r in o.attrib.get('rpy','0 0 0').split()]
-                        origins[link.attrib.get('name')] = (xyz, rpy)
-        except: pass
-        return origins
-
-    def _setup_mock_chain(self):
-        self.chain = type('Mock', (object,), {
-            'links': [], 
-            'active_links_mask': [], 
-            'forward_kinematics': lambda *a, **k: np.eye(4), 
-            'inverse_kinematics': lambda *a, **k: np.zeros(8)
-        })()
-
-
-# ==============================================================================
-# 2. CARTESIAN VIEW (MINIMALISTYCZNY)
-# ==============================================================================
-class CartesianView(flet.Container):
-    def __init__(self, uart_communicator, urdf_path, active_links_mask=None, on_error=None):
-        super().__init__()
-        self.uart = uart_communicator
-        # Note: New KinematicsEngine handles masks internally mostly, but we pass what we have
-        self.ik = KinematicsEngine(urdf_path, active_links_mask)
-        self.on_error = on_error
+            self.obstacles = get_obstacle_monitor(self.ik)
+        except Exception as e:
+            print(f"[CARTESIAN] Obstacle monitor unavailable: {e}")
+        self.obstacle_distance = np.inf
+        self.obstacle_reported = False
+
+        # Named poses (SAFETY, STANDBY, ...) with cached trajectories
+        self.moves = get_move_library(self.ik)
+
+        # Teach-and-playback program (waypoints taught from the commanded joints)
+        # Precomputed trajectories go through the streamer (legacy J_ or buffered)
+        self.streamer = streamer or TrajectoryStreamer(uart_communicator)
+        self.program = Program()
+        self.program_runner = ProgramRunner(self.ik, self.streamer, on_sample=self._on_program_sample,
+                                            on_error=self.on_error)
+        # Robot scripts (programs/<name>.p6), compiled to a validated instruction list before running
+        self.script_runner = ScriptRunner(self.ik, self.streamer, send=self._send_script_command,
+                                          library=self.moves, on_sample=self._on_program_sample,
+                                          on_error=self.on_error)
         
         self.is_jogging = False
-        self.is_robot_homed = False 
         self.alive = True 
         
-        # Pozycje (startowe zera)
-        self.commanded_joints = [0.0] * 6 # Fixed to 6 for standard 6-axis
+        # Zadane / zmierzone pozycje osi [rad]: wspólny magazyn stanu (parol6.state, jak JogView)
         # self.tool_offset is now handled by self.ik.tool_translation / self.ik.set_tool()
-        
-        # UART feedback values (for display - same as JogView)
-        self.feedback_joints_deg = [0.0] * 6
+        self.state = get_robot_state()
         
         # Gripper states
         self.gripper_states = {"pneumatic": False, "electric": False}
         self.jog_speed_percent = 50.0
-        
-        self.last_jog_time = 0.0 # Debounce timer
 
         self.padding = 10 
 
-        # Start update loop IMMEDIATELY
-        self.update_thread = threading.Thread(target=self._update_loop, daemon=True)
-        self.update_thread.start() 
+        # Label refresh (20 Hz, only while the view is shown) runs on the shared task loop;
+        # jog / move loops (IK, collision checks, setpoints) run on the scheduler's motion thread
+        self.tasks = get_task_loop()
+        self.update_task = None
+        self.render = get_render_coordinator()
 
         self._setup_ui()
         
@@ -237,6 +99,26 @@ class CartesianView(flet.Container):
     def did_unmount(self):
         self.alive = False
         self.is_jogging = False
+        if self.update_task:
+            self.update_task.cancel()
+
+    def close(self):
+        """App shutdown: stops the IK worker process (if any) and falls back to in-process IK."""
+        solver, self.ik_solver = self.ik_solver, self.ik
+        if solver is not self.ik:
+            solver.close()
+
+    def on_activate(self):
+        # Catch up from the latest snapshot at once, then refresh at 20 Hz while shown
+        self._update_labels_logic()
+        self.update_task = self.tasks.call_every(UPDATE_PERIOD, self._update_tick, name="CARTESIAN labels",
+                                                 delay=UPDATE_PERIOD)
+
+    def on_deactivate(self):
+        # Hidden: no FK / label work; jog and move loops keep running until they end
+        if self.update_task:
+            self.update_task.cancel()
+            self.update_task = None
 
 
 
@@ -312,6 +194,7 @@ class CartesianView(flet.Container):
             flet.ElevatedButton("GRIPPER CHANGE", icon=flet.icons.HANDYMAN, style=flet.ButtonStyle(bgcolor=flet.colors.PURPLE_700, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_change_tool_click, expand=True, width=10000),
             flet.ElevatedButton("STOP", icon=flet.icons.STOP_CIRCLE, style=flet.ButtonStyle(bgcolor=flet.colors.RED_700, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_stop_click, expand=True, width=10000),
             flet.ElevatedButton("STANDBY", icon=flet.icons.ACCESSIBILITY, style=flet.ButtonStyle(bgcolor=flet.colors.ORANGE_900, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_standby_click, expand=True, width=10000),
+            flet.ElevatedButton("PROGRAM", icon=flet.icons.PLAYLIST_PLAY, style=flet.ButtonStyle(bgcolor=flet.colors.INDIGO_700, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_program_click, expand=True, width=10000),
             # Spacer removed to allow buttons to fill space
             # ERROR RESET moved to Errors tab
         ], spacing=5, expand=True)
@@ -348,6 +231,11 @@ class CartesianView(flet.Container):
                 flet.Row([flet.Text(f"{ax}:", weight="bold"), lbl], alignment="spaceBetween", expand=True)
             )
 
+        # Readouts keep their last text: only labels whose text changed are sent (gui.render)
+        self.labels = BoundLabels(self.render, dict(self.lbl_cart))
+        for i, lbl in enumerate(self.lbl_joints):
+            self.labels.bind(f"J{i+1}", lbl)
+
         position_frame = flet.Container(content=pos_list, **panel_style, expand=4)
 
         # ----------------------------------------------------------------------
@@ -379,29 +267,17 @@ class CartesianView(flet.Container):
             self.update() # Update this control (CartesianView)
         except: pass
         
-    def _update_loop(self):
-        while self.alive:
-            # Fallback: Force sync IF AND ONLY IF we are purely stationary and data has arrived
-            # This handles the initial connection sync without interrupting movements.
-            if not self.is_jogging:
-                has_zeros = all(abs(v) < 0.001 for v in self.commanded_joints)
-                has_feedback = any(abs(v) > 0.01 for v in self.feedback_joints_deg)
-                
-                if has_zeros and has_feedback:
-                    try:
-                        self.commanded_joints = [np.radians(v) for v in self.feedback_joints_deg]
-                    except: pass
+    @property
+    def is_robot_homed(self):
+        return self.state.snapshot.homed
 
-            self._update_labels_logic()
-            
-            # Use page update if possible
-            if self.page:
-                try: self.page.update()
-                except: pass
-            
-            time.sleep(0.05)
+    def _update_tick(self, dt):
+        if not self.alive:
+            return False
+        # Feedback sync (first frame, idle drift) is done by the state store;
+        # changed labels are coalesced with the other UI updates of this frame (gui.render)
+        self._update_labels_logic()
 
-        
     def set_homed_status(self, is_homed):
         # HARDENING: Ensure boolean
         if isinstance(is_homed, str):
@@ -409,7 +285,8 @@ class CartesianView(flet.Container):
             else: is_homed = False
         
         print(f"[CARTESIAN] set_homed_status called: {is_homed} (type: {type(is_homed)})")
-        self.is_robot_homed = bool(is_homed)
+        if self.state.snapshot.homed != bool(is_homed):
+            self.state.set_homed(bool(is_homed))
         
         msg = "Robot homed!" if self.is_robot_homed else "Homing lost! Homing required."
         color = flet.colors.GREEN if self.is_robot_homed else flet.colors.RED
@@ -417,7 +294,7 @@ class CartesianView(flet.Container):
         if self.page:
             self.page.snack_bar = flet.SnackBar(flet.Text(msg), bgcolor=color)
             self.page.snack_bar.open = True
-            self.page.update()
+            self.render.invalidate()
 
     def show_homing_required_dialog(self):
         if not self.page: return
@@ -461,46 +338,19 @@ class CartesianView(flet.Container):
         e.control.content.border = flet.border.all(1, "cyan")
         e.control.content.update()
         
-        threading.Thread(target=self._jog_thread, args=(axis, direction), daemon=True).start()
+        self.scheduler.submit(self._jog_thread, axis, direction)
 
     def on_jog_stop(self, e):
+        if self.is_jogging and self.scheduler.timing.periods:
+            mode = "worker" if self.ik_solver is not self.ik else "in-process"
+            print(f"[CARTESIAN] Jog loop timing ({mode} IK): {self.scheduler.summary()}")
         self.is_jogging = False
-        self.last_jog_time = time.time() # Start debounce timer
         # Reset styling
         if hasattr(e, "control") and e.control:
             e.control.content.bgcolor = "#444444"
             e.control.content.border = flet.border.all(1, "#666")
             e.control.content.update()
 
-    def update_from_feedback(self, joint_values: dict):
-        """
-        Updates the display based on feedback from the robot (via main.py).
-        joint_values: dict like {"J1": 10.0, "J2": -5.0, ...} in degrees.
-        """
-        try:
-            # Store feedback values for display (in degrees, like JogView)
-            for i in range(6):
-                key = f"J{i+1}"
-                if key in joint_values:
-                    self.feedback_joints_deg[i] = joint_values[key]
-            
-            # Debounce: Do NOT sync commanded_joints during jogging or within 1.5s after
-            # This prevents lagging UART feedback from overwriting our IK-computed targets
-            if self.is_jogging:
-                return
-            if (time.time() - self.last_jog_time) < 1.5:
-                return
-                
-            # Sync commanded_joints when NOT jogging and robot is stationary
-            # Use a higher threshold to avoid jitter syncs
-            feedback_rad = [np.radians(v) for v in self.feedback_joints_deg]
-            for i in range(6):
-                if abs(self.commanded_joints[i] - feedback_rad[i]) > np.radians(0.5):
-                    self.commanded_joints[i] = feedback_rad[i]
-                
-        except Exception as e:
-            print(f"[CARTESIAN] Error updating from feedback: {e}")
-
     def on_home_click(self, e):
         self._show_homing_choice_dialog()
 
@@ -516,7 +366,7 @@ class CartesianView(flet.Container):
             if self.uart: 
                 self.uart.send_message("HOME")
             # Reset local joints to 0
-            self.commanded_joints = [0.0] * 6
+            self.state.set_commanded(np.zeros(6))
 
         def on_confirm_position(e):
             close_dlg(e)
@@ -552,50 +402,55 @@ class CartesianView(flet.Container):
         # Trigger W2 warning
         if self.on_error:
             self.on_error("W2")
-        # Target: [0, 50, -70, -90, 0, 0] degrees
-        target_rad = np.radians([0, -50, 70, 90, 0, 0]).tolist()
-        self._animate_move(target_rad)
+        # Target: named pose SAFETY [0, -50, 70, 90, 0, 0] degrees
+        self._animate_move("SAFETY")
 
     def on_standby_click(self, e):
-        # Target: All zeros
-        target_rad = [0.0] * 6
-        self._animate_move(target_rad)
+        # Target: named pose STANDBY (all zeros)
+        self._animate_move("STANDBY")
 
-    def _animate_move(self, target_joints_rad):
-        """Moves robot to target joints smoothly using current velocity."""
+    def _animate_move(self, move_name):
+        """Moves robot to a named pose along its (cached) synchronized S-curve trajectory."""
         if self.is_jogging: return
         self.is_jogging = True
+        self.scheduler.submit(self._move_thread, move_name)
+
+    def _move_thread(self, move_name):
+        # Planned once per start region / tool / speed, sampled by the scheduler
+        try:
+            traj = self.moves.trajectory(move_name, self.state.start_joints(),
+                                         speed_scale=self.jog_speed_percent / 100.0)
+        except PlanningError as e:
+            print(f"[CARTESIAN] Move {move_name}: {e}")
+            if self.on_error:
+                self.on_error(e.code)
+            self.is_jogging = False
+            return
+        self._start_obstacle_check()
+        t_traj = [0.0]
+
+        def step(dt):
+            # Trajectory time advances slower near cell obstacles
+            t_traj[0] = min(traj.duration, t_traj[0] + dt * self._obstacle_speed_scale())
+            q = traj.at(t_traj[0])
+            if not self._is_obstacle_clear(q):
+                return False
+            self.state.set_commanded(q)
+            self.send_current_pose()
+            return t_traj[0] < traj.duration
         
-        def run():
-            # Standard movement speed: 1.5 rad/s at 100% velocity
-            # USE COPIES to avoid race conditions during iteration
-            current_local = np.array(list(self.commanded_joints))
-            target = np.array(target_joints_rad)
-            
-            try:
-                while self.is_jogging and self.alive:
-                    diff = target - current_local
-                    dist = np.linalg.norm(diff)
-                    
-                    if dist < 0.005:
-                        self.commanded_joints = target.tolist()
-                        self.send_current_pose()
-                        break
-                    
-                    # Respect current velocity slider
-                    factor = self.jog_speed_percent / 100.0
-                    # Max step per 0.05s frame (~1.5 rad/s max speed / 20Hz = 0.075)
-                    step_size = min(dist, 0.075 * factor)
-                    
-                    current_local = current_local + (diff / dist) * step_size
-                    self.commanded_joints = current_local.tolist()
-                    self.send_current_pose()
-                    time.sleep(0.08)
-            finally:
-                self.is_jogging = False
-                self.last_jog_time = time.time()
-            
-        threading.Thread(target=run, daemon=True).start()
+        self._run_motion(step, keep_running=lambda: self.is_jogging and self.alive)
+
+    def _run_motion(self, step, keep_running):
+        # Blocking setpoint loop on the calling (motion) thread
+        self.state.update(moving=True)
+        try:
+            self.scheduler.run(step, keep_running=keep_running)
+        except Exception as e:
+            print(f"[CARTESIAN] Motion loop error: {e}")
+        finally:
+            self.is_jogging = False
+            self.state.update(moving=False)
 
     def on_stop_click(self, e):
         # Trigger W1 warning
@@ -604,6 +459,145 @@ class CartesianView(flet.Container):
         self.is_jogging = False
         if self.uart: self.uart.send_message("EGRIP_STOP")
 
+    # --- PROGRAM (TEACH & PLAYBACK) ---
+    def _on_program_sample(self, q):
+        self.state.set_commanded(q)
+
+    def _send_script_command(self, message):
+        if self.uart: self.uart.send_message(message)
+
+    def on_program_click(self, e):
+        """Shows the teach/playback dialog."""
+        if not self.page: return
+        
+        self.program_dialog = None
+        lbl_info = flet.Text("", size=16, color="cyan", weight="bold")
+        name_field = flet.TextField(label="Program name", value=self.program.name, width=300, dense=True)
+        
+        def close_dlg(e=None):
+            if self.program_dialog:
+                self.program_dialog.open = False
+                self.page.update()
+        
+        def info_text():
+            cycle = estimate_cycle_time(self.program, self.state.start_joints())
+            return f"{len(self.program)} waypoints, ~{cycle:.1f} s"
+        
+        def refresh():
+            lbl_info.value = info_text()
+            self.page.update()
+        
+        def notify(text, color=flet.colors.GREEN):
+            self.page.snack_bar = flet.SnackBar(flet.Text(text), bgcolor=color)
+            self.page.snack_bar.open = True
+            self.page.update()
+        
+        def teach(move_type):
+            n = self.program.teach(self.ik, self.state.start_joints(), move_type, speed=self.jog_speed_percent / 100.0)
+            print(f"[PROGRAM] Taught {move_type} #{n}")
+            refresh()
+        
+        def clear(e):
+            self.program.clear()
+            refresh()
+        
+        def save(e):
+            self.program.name = name_field.value.strip() or "program"
+            notify(f"Saved: {self.program.save()}")
+        
+        def load(e):
+            try:
+                self.program = Program.load(name_field.value.strip() or "program")
+                refresh()
+            except ProgramError as err:
+                print(f"[PROGRAM] {err}")
+                if self.on_error: self.on_error("E3")
+        
+        def run(e):
+            if not self.is_robot_homed:
+                close_dlg()
+                self.show_homing_required_dialog()
+                return
+            if self.is_jogging or self.program_runner.running or self.script_runner.running: return
+            self.is_jogging = True
+            self._start_obstacle_check()
+            
+            def done(completed):
+                self.is_jogging = False
+                self.state.update(moving=False)
+            
+            self.state.update(moving=True)
+            self.program_runner.start(self.program, self.state.start_joints(),
+                                      keep_running=lambda: self.is_jogging and self.alive,
+                                      check=self._is_obstacle_clear, on_done=done)
+            close_dlg()
+        
+        def run_script(e):
+            if not self.is_robot_homed:
+                close_dlg()
+                self.show_homing_required_dialog()
+                return
+            if self.is_jogging or self.program_runner.running or self.script_runner.running: return
+            name = name_field.value.strip() or "program"
+            try:
+                source = load_script(name)
+            except ProgramError as err:
+                print(f"[SCRIPT] {err}")
+                if self.on_error: self.on_error("E3")
+                return
+            self.is_jogging = True
+            self._start_obstacle_check()
+            
+            def done(completed):
+                self.is_jogging = False
+                self.state.update(moving=False)
+            
+            self.state.update(moving=True)
+            self.script_runner.start(source, self.state.start_joints(), name=name,
+                                     keep_running=lambda: self.is_jogging and self.alive,
+                                     check=self._is_obstacle_clear, on_done=done)
+            close_dlg()
+        
+        def btn(text, icon, color, handler):
+            return flet.ElevatedButton(text, icon=icon, on_click=handler, height=50, width=190,
+                                       style=flet.ButtonStyle(bgcolor=color, color="white", shape=flet.RoundedRectangleBorder(radius=8)))
+        
+        lbl_info.value = info_text()
+        dialog_content = flet.Column([
+            lbl_info,
+            name_field,
+            flet.Row([
+                btn("TEACH MOVEJ", flet.icons.ADD_LOCATION, flet.colors.BLUE_GREY_700, lambda e: teach("MOVEJ")),
+                btn("TEACH MOVEL", flet.icons.TIMELINE, flet.colors.BLUE_GREY_700, lambda e: teach("MOVEL")),
+            ], spacing=10, alignment=flet.MainAxisAlignment.CENTER),
+            flet.Row([
+                btn("SAVE", flet.icons.SAVE, flet.colors.TEAL_700, save),
+                btn("LOAD", flet.icons.FOLDER_OPEN, flet.colors.TEAL_700, load),
+            ], spacing=10, alignment=flet.MainAxisAlignment.CENTER),
+            flet.Row([
+                btn("CLEAR", flet.icons.DELETE, flet.colors.RED_700, clear),
+                btn("RUN", flet.icons.PLAY_ARROW, flet.colors.GREEN_700, run),
+            ], spacing=10, alignment=flet.MainAxisAlignment.CENTER),
+            flet.Row([
+                btn("RUN SCRIPT", flet.icons.CODE, flet.colors.GREEN_900, run_script),
+            ], spacing=10, alignment=flet.MainAxisAlignment.CENTER),
+        ], horizontal_alignment=flet.CrossAxisAlignment.CENTER, spacing=15, tight=True)
+        
+        title_row = flet.Row([
+            flet.Text("PROGRAM", size=22, weight="bold", color="white"),
+            flet.IconButton(icon=flet.icons.CLOSE, icon_size=28, on_click=close_dlg)
+        ], alignment=flet.MainAxisAlignment.SPACE_BETWEEN)
+        
+        self.program_dialog = flet.AlertDialog(
+            title=title_row,
+            content=dialog_content,
+            modal=True,
+            bgcolor="#2D2D2D",
+        )
+        self.page.dialog = self.program_dialog
+        self.program_dialog.open = True
+        self.page.update()
+
     def on_change_tool_click(self, e):
         """Shows tool selection dialog with images."""
         if not self.page: return
@@ -727,15 +721,6 @@ class CartesianView(flet.Container):
         self.tool_change_dialog.open = True
         self.page.update()
 
-    def _ui_updater_loop(self):
-        while self.alive:
-            try:
-                if self.page:
-                    self._update_labels_logic()
-                    self.page.update()
-            except: pass 
-            time.sleep(0.15) 
-
     def _update_labels_logic(self):
         """
         Use URDF-based FK from KinematicsEngine for display.
@@ -745,61 +730,55 @@ class CartesianView(flet.Container):
             return
         
         try:
-            # Get TCP matrix from URDF-based FK
-            tcp_matrix = self.ik.forward_kinematics(self.commanded_joints)
-            pos = tcp_matrix[:3, 3]  # [x, y, z] in meters
-            rot = tcp_matrix[:3, :3]
-            
-            # Calculate Euler angles (A=Roll, B=Pitch, C=Yaw for xyz convention)
-            euler = R.from_matrix(rot).as_euler('xyz', degrees=True)
+            # TCP from URDF-based FK (one consistent snapshot for all labels);
+            # display_pose() skips FK + Euler while the joints / tool are unchanged
+            commanded = self.state.snapshot.commanded
+            pos, euler = self.ik.display_pose(commanded)  # [mm], xyz Euler [deg]
             
             # UPDATE UI - position in mm
-            self.lbl_cart["X"].value = f"{pos[0]*1000:.2f} mm"
-            self.lbl_cart["Y"].value = f"{pos[1]*1000:.2f} mm"
-            self.lbl_cart["Z"].value = f"{pos[2]*1000:.2f} mm"
+            self.labels.set("X", f"{pos[0]:.2f} mm")
+            self.labels.set("Y", f"{pos[1]:.2f} mm")
+            self.labels.set("Z", f"{pos[2]:.2f} mm")
             
             # Rotation in degrees (A=Roll, B=Yaw, C=Pitch - swapped to match buttons)
-            self.lbl_cart["A"].value = f"{euler[0]:.2f}°"
-            self.lbl_cart["B"].value = f"{euler[1]:.2f}°"
-            self.lbl_cart["C"].value = f"{euler[2]:.2f}°"
+            self.labels.set("A", f"{euler[0]:.2f}°")
+            self.labels.set("B", f"{euler[1]:.2f}°")
+            self.labels.set("C", f"{euler[2]:.2f}°")
 
             # Update Joint displays - use commanded values
-            for i, rad_val in enumerate(self.commanded_joints):
-                if i < len(self.lbl_joints):
-                    deg_val = np.degrees(rad_val)
-                    self.lbl_joints[i].value = f"{deg_val:.2f}°"
+            for i, deg_val in enumerate(np.degrees(commanded)):
+                self.labels.set(f"J{i+1}", f"{deg_val:.2f}°")
                     
         except Exception as e:
             print(f"[CARTESIAN] FK error: {e}")
+        # Only changed labels go to the render coordinator
+        return self.labels.commit()
 
     # --- LOGIKA RUCHU (AGGRESSIVE STABILITY) ---
     def _jog_thread(self, axis, direction):
         # Parametry "Ultra-Responsive":
-        # Mały krok (2.0mm) + Mało iteracji (5) = Płynność
-        # 2.0mm * 20Hz = 40mm/s (nieco wolniej, ale stabilnie)
-        BASE_STEP_MM = 2.0
-        BASE_STEP_RAD = 0.006  # Smaller step for rotation stability near singularities
-        
-        # Workspace limits (Expanded for pure URDF exploration)
-        WORKSPACE_LIMITS = {
-            'x': (-0.700, 0.700),
-            'y': (-0.700, 0.700),
-            'z': (-0.300, 0.900)
-        }
+        # Prędkość zamiast kroku: 40mm/s (= 2.0mm * 20Hz), krok zależy od częstotliwości schedulera
+        BASE_SPEED_MM_S = 40.0
+        BASE_SPEED_RAD_S = 0.12  # Slower rotation for stability near singularities
         
-        sign = 1 if direction == "plus" else -1
+        # Workspace limits: WORKSPACE_LIMITS (shared with the trajectory validator)
         
-        while self.is_jogging:
-            loop_start = time.time()
-            
-            # 1. Skalowanie prędkości
-            factor = self.jog_speed_percent / 100.0
-            step_mm = max(0.2, BASE_STEP_MM * factor)
-            step_rad = max(0.002, BASE_STEP_RAD * factor)  # Lower minimum for rotation
+        sign = 1 if direction == "plus" else -1
+        # A start pose already in contact must stay jog-able
+        self.collision_reported = False
+        self.check_collision = bool(self.collision) and not self.collision.in_collision(self.state.snapshot.commanded)
+        self._start_obstacle_check()
+        outside_map = [False]
+        
+        def step(dt):
+            # 1. Skalowanie prędkości (slower near cell obstacles)
+            factor = self.jog_speed_percent / 100.0 * self._obstacle_speed_scale()
+            step_mm = max(4.0, BASE_SPEED_MM_S * factor) * dt
+            step_rad = max(0.04, BASE_SPEED_RAD_S * factor) * dt  # Lower minimum for rotation
             
             if self.ik.chain:
                 # Use RAW joints for calculation
-                current_raw = list(self.commanded_joints)
+                current_raw = list(self.state.snapshot.commanded)
                 
                 # Get current TCP Pose (4x4)
                 current_tcp_matrix = self.ik.forward_kinematics(current_raw)
@@ -845,9 +824,15 @@ class CartesianView(flet.Container):
                 else:
                     target_rot = current_rot
                 
+                # Voxel map is only a hint (sampled, may have holes): an empty voxel still goes to IK
+                if not self.ik.is_reachable(target_pos) and not outside_map[0]:
+                    print(f"[CARTESIAN] Target {np.round(target_pos * 1000.0, 1).tolist()} mm not in the "
+                          f"reachability map, trying IK")
+                    outside_map[0] = True
+
                 try:
                     # New IK Solver handles tool offset internally!
-                    nj_model = self.ik.inverse_kinematics(target_pos, target_rot, current_raw)
+                    nj_model = self.ik_solver.inverse_kinematics(target_pos, target_rot, current_raw)
                     
                     # Normalize angles
                     nj_model = [(q + np.pi) % (2*np.pi) - np.pi for q in nj_model]
@@ -857,30 +842,66 @@ class CartesianView(flet.Container):
                     max_diff = max(diffs)
                     
                     # Tighter thresholds for rotation stability
+                    candidate = None
                     if max_diff < 0.3:  # ~17 degrees - safe movement
-                        self.commanded_joints = nj_model
+                        candidate = nj_model
                     elif max_diff < 0.6:  # Moderate jump - interpolate to reduce jerk
                         # Blend: 20% new, 80% old - smoother transition near singularity
                         blend_factor = 0.2
-                        blended = [current_raw[i] + blend_factor * (nj_model[i] - current_raw[i]) for i in range(6)]
-                        self.commanded_joints = blended
+                        candidate = [current_raw[i] + blend_factor * (nj_model[i] - current_raw[i]) for i in range(6)]
                     # else: Large jump - reject completely (singularity protection)
+
+                    if candidate is not None and self._is_collision_free(candidate) and self._is_obstacle_clear(candidate):
+                        self.state.set_commanded(candidate)
                         
                 except:
                     pass  # IK error - silently skip
 
             self.send_current_pose()
-            
-            # Target: 20Hz (50ms)
-            elapsed = time.time() - loop_start
-            sleep_time = max(0.01, 0.05 - elapsed)
-            time.sleep(sleep_time)
+
+        self._run_motion(step, keep_running=lambda: self.is_jogging)
+
+    def _is_collision_free(self, joints_rad):
+        if not self.check_collision:
+            return True
+        hits = self.collision.colliding_pairs(joints_rad)
+        if hits:
+            if not self.collision_reported:
+                print(f"[CARTESIAN] Self-collision: {hits}")
+                if self.on_error:
+                    self.on_error("SCL")
+                self.collision_reported = True
+            return False
+        return True
+
+    def _start_obstacle_check(self):
+        self.obstacle_reported = False
+        self.obstacle_distance = np.inf
+        if self.obstacles and self.obstacles.active:
+            self.obstacle_distance = self.obstacles.clearance(self.state.snapshot.commanded)[0]
+
+    def _obstacle_speed_scale(self):
+        if not self.obstacles or not self.obstacles.active:
+            return 1.0
+        return self.obstacles.speed_scale(self.obstacle_distance)
+
+    def _is_obstacle_clear(self, joints_rad):
+        if not self.obstacles or not self.obstacles.active:
+            return True
+        distance, name = self.obstacles.clearance(joints_rad)
+        if not self.obstacles.allows(self.obstacle_distance, distance):
+            if not self.obstacle_reported:
+                print(f"[CARTESIAN] Obstacle '{name}' at {distance * 1000:.1f} mm - holding")
+                if self.on_error:
+                    self.on_error("OBS")
+                self.obstacle_reported = True
+            return False
+        self.obstacle_distance = distance
+        return True
 
     def send_current_pose(self):
         if self.uart and self.uart.is_open():
-            vals_deg = [np.degrees(r) for r in self.commanded_joints]
-            data_str = ",".join([f"{v:.2f}" for v in vals_deg])
-            self.uart.send_message(f"J_{data_str}")
+            self.uart.send_message(format_joint_command(self.state.snapshot.commanded))
 
     def on_gripper_toggle_click(self, e):
         g_type = e.control.data 
@@ -2,8 +2,11 @@ import flet
 from flet import Column, Row, Container, Text, Icon, colors, ElevatedButton, ListView, padding, border
 from flet import icons
 from datetime import datetime
+from parol6.state import get_robot_state
+from gui.lifecycle import ViewLifecycle
+from gui.render import get_render_coordinator
 
-class ErrorsView(flet.Container):
+class ErrorsView(ViewLifecycle, flet.Container):
     # Error codes dictionary (E = Error, W = Warning, OT = Overtemperature, CT = Critical Temperature)
     ERROR_CODES = {
         "E1": ("ERROR", "Not Homed - Robot requires homing before movement"),
@@ -55,6 +58,8 @@ class ErrorsView(flet.Container):
         "CFG": ("WARNING", "Config Mismatch - PC and controller config differ"),
         "GRW": ("WARNING", "Gripper Warning - Object not detected"),
         "SPD": ("WARNING", "Speed Limited - Speed automatically reduced"),
+        "SCL": ("WARNING", "Self Collision - Move stopped before links collide"),
+        "OBS": ("WARNING", "Obstacle - Move stopped before contact with cell obstacle"),
         # Stall detection (motors 1-6)
         "STL1": ("WARNING", "Stall Detected Motor 1 - Motor blocked"),
         "STL2": ("WARNING", "Stall Detected Motor 2 - Motor blocked"),
@@ -74,6 +79,9 @@ class ErrorsView(flet.Container):
         super().__init__()
         self.uart = uart_communicator
         self.on_status_change = on_status_change # Callback: function(is_error: bool)
+        # Log entries from error bursts are sent in one update per frame; while the view is
+        # hidden they are only collected (switching to it sends the whole view)
+        self.render = get_render_coordinator()
         
         # Track active alarms: {code: (container, timestamp_text)}
         self.active_alarms = {}
@@ -205,16 +213,16 @@ class ErrorsView(flet.Container):
         self.logs_list_view.controls.append(log_row)
         
         # 2. Update view only if visible
-        if self.logs_list_view.page:
-            self.logs_list_view.update()
+        if self.is_active and self.logs_list_view.page:
+            self.render.invalidate(self.logs_list_view)
 
     def _clear_logs(self, e):
         # NOTE: User requested this button SHOULD NOT reset error state, only clear text.
         self.logs_list_view.controls.clear()
         self.active_alarms.clear()  
         
-        if self.logs_list_view.page:
-            self.logs_list_view.update()
+        if self.is_active and self.logs_list_view.page:
+            self.render.invalidate(self.logs_list_view)
             
         self.add_log("INFO", "Log cleared.")
 
@@ -262,8 +270,8 @@ class ErrorsView(flet.Container):
             self.status_text.color = colors.RED_500
             self.header_panel.border = border.all(1, colors.RED_500)
 
-        if self.header_panel.page:
-            self.header_panel.update()
+        if self.is_active and self.header_panel.page:
+            self.render.invalidate(self.header_panel)
 
         if self.on_status_change:
             self.on_status_change(level)
@@ -272,11 +280,12 @@ class ErrorsView(flet.Container):
     # ======================================================================
     # === ERROR CODE HANDLING ===
     # ======================================================================
-    def handle_error_code(self, code: str):
+    def handle_error_code(self, code: str, detail: str = None):
         """
         Handle incoming error code from UART (e.g., 'E1', 'W2').
         If alarm is already active, just update the timestamp.
         Otherwise, create a new log entry.
+        detail: optional context (e.g. script line of an E3), logged with the alarm.
         """
         code = code.strip().upper()
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -285,13 +294,17 @@ class ErrorsView(flet.Container):
         if code in self.active_alarms:
             timestamp_text = self.active_alarms[code]
             timestamp_text.value = f"[{timestamp}]"
-            if timestamp_text.page:
-                timestamp_text.update()
+            if self.is_active and timestamp_text.page:
+                self.render.invalidate(timestamp_text)
+            if detail and code in self.ERROR_CODES:
+                self.add_log(self.ERROR_CODES[code][0], f"[{code}] {detail}")
             return
         
         # New alarm - create entry
         if code in self.ERROR_CODES:
             level, message = self.ERROR_CODES[code]
+            if detail:
+                message = f"{message} ({detail})"
             self._add_alarm_log(code, level, f"[{code}] {message}")
         else:
             # Unknown code - still log it
@@ -347,10 +360,10 @@ class ErrorsView(flet.Container):
         # Add to list
         self.logs_list_view.controls.append(log_row)
         
-        if self.logs_list_view.page:
-            self.logs_list_view.update()
+        if self.is_active and self.logs_list_view.page:
+            self.render.invalidate(self.logs_list_view)
 
-    def send_error_code(self, code: str):
+    def send_error_code(self, code: str, detail: str = None):
         """
         Send an error code via UART and also display it locally.
         Use this when the application triggers an error/warning.
@@ -358,7 +371,7 @@ class ErrorsView(flet.Container):
         code = code.strip().upper()
         
         # Display locally
-        self.handle_error_code(code)
+        self.handle_error_code(code, detail)
         
         # Send via UART if connected
         if self.uart and self.uart.is_open():
@@ -370,6 +383,7 @@ class ErrorsView(flet.Container):
         # 1. Clear local error state
         self._update_alert_status("NONE")
         self.active_alarms.clear()
+        get_robot_state().clear_alarms()
         
         # 2. Add log entry
         self.add_log("INFO", "Resetting robot errors...")
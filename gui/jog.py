@@ -1,20 +1,30 @@
 import flet
-import threading
-import time
 import math
 import numpy as np
-from scipy.spatial.transform import Rotation as R
-
-# Import KinematicsEngine from cartesian module
+from parol6.moves import PlanningError
+from parol6.scheduler import get_setpoint_scheduler
+from parol6.drives import get_drive_model
+from parol6.protocol import JOINT_KEYS, format_joint_command
+from parol6.state import get_robot_state
+from gui.lifecycle import ViewLifecycle
+from gui.render import BoundLabels, get_render_coordinator
+
+# Shared kinematics service (same engine instance as CartesianView)
 try:
-    from gui.cartesian import KinematicsEngine
+    from parol6.kinematics import get_kinematics_engine
+    from parol6.collision import get_collision_checker
+    from parol6.obstacles import get_obstacle_monitor
+    from parol6.poses import get_move_library
 except ImportError:
-    KinematicsEngine = None
+    get_kinematics_engine = None
 
-class JogView(flet.Container):
+class JogView(ViewLifecycle, flet.Container):
     """
     JOG View - Uses URDF-based kinematics (same as CartesianView)
     """
+    UI_PERIOD = 0.05  # s, label / FK refresh while jogging
+    # A_ feedback is inverted for display to match the URDF model (display only, never commanded)
+    FEEDBACK_DISPLAY_SIGNS = -1.0
 
     def __init__(self, uart_communicator, on_status_update=None, on_error=None):
         super().__init__()
@@ -23,26 +33,55 @@ class JogView(flet.Container):
         self.on_status_update = on_status_update
         self.on_error = on_error  # Callback do wysyłania błędów 
         
-        # Initialize URDF-based kinematics engine
-        if KinematicsEngine:
-            self.ik = KinematicsEngine("resources/PAROL6.urdf")
+        # Shared URDF-based kinematics engine
+        if get_kinematics_engine:
+            self.ik = get_kinematics_engine("resources/PAROL6.urdf")
         else:
             self.ik = None
+
+        # Mesh-based self-collision check of every jog target
+        self.collision = None
+        if self.ik and self.ik.chain:
+            try:
+                self.collision = get_collision_checker(self.ik)
+            except Exception as e:
+                print(f"[JOG] Collision checker unavailable: {e}")
+        self.check_collision = False
+        self.collision_reported = False
+
+        # Cell obstacles (cell_obstacles.json): slow down near them, hold before contact
+        self.obstacles = None
+        if self.ik and self.ik.chain:
+            try:
+                self.obstacles = get_obstacle_monitor(self.ik)
+            except Exception as e:
+                print(f"[JOG] Obstacle monitor unavailable: {e}")
+        self.obstacle_distance = float("inf")
+        self.obstacle_reported = False
+
+        # Named poses (SAFETY, STANDBY, ...) with cached trajectories
+        self.moves = get_move_library(self.ik) if self.ik else None
+
+        # Jog / move loops tick on the shared drift-free scheduler (its motion thread)
+        self.scheduler = get_setpoint_scheduler()
+        self._ui_elapsed = 0.0
         
         # --- ZMIENNE STANU ---
         self.is_jogging = False
+        self.render = get_render_coordinator()
+        self.jog_held = False  # Button pressed; after release the jog thread decelerates to a stop
         self.active_jog_btn = None
         self.speed_percent = 50 
-        self.is_robot_homed = False 
+        self.jog_speed_deg_s = 10
+        # Jog ramp limits per joint: drive VMAX/AMAX (motor_settings.json) in deg/s, deg/s^2
+        self.drives = get_drive_model()
         
         self.homing_loading_dialog = None
 
         self.gripper_states = {"pneumatic": False, "electric": False}
-        self.current_raw_values = { f"J{i}": 0.0 for i in range(1, 7) }
         
-        # Wewnętrzne cele (to co chcemy osiągnąć)
-        self.internal_target_values = { f"J{i}": 0.0 for i in range(1, 7) }
-        self.initial_sync_done = False
+        # Zadane / zmierzone pozycje osi: wspólny magazyn stanu (parol6.state), w radianach
+        self.state = get_robot_state()
 
         # Limity
         self.joint_limits = {
@@ -84,9 +123,23 @@ class JogView(flet.Container):
             bgcolor="#2D2D2D", border_radius=10, border=flet.border.all(1, "#555555"), padding=5, height=80
         )
 
+        self.lbl_jog_speed = flet.Text(f"{self.jog_speed_deg_s}°/s", size=18, weight="bold", color="cyan", text_align="center")
+        jog_speed_panel = flet.Container(
+            content=flet.Column([
+                flet.Text("JOG SPEED", color="white", weight="bold", size=12),
+                flet.Row([
+                    flet.IconButton(flet.icons.REMOVE, icon_color="white", bgcolor="#444", icon_size=18, on_click=lambda e: self.change_jog_speed(-5), width=35, height=35),
+                    flet.Container(content=self.lbl_jog_speed, alignment=flet.alignment.center, width=60, bgcolor="#222", border_radius=5, height=35),
+                    flet.IconButton(flet.icons.ADD, icon_color="white", bgcolor="#444", icon_size=18, on_click=lambda e: self.change_jog_speed(5), width=35, height=35)
+                ], alignment=flet.MainAxisAlignment.CENTER, spacing=5)
+            ], horizontal_alignment="center", spacing=2, alignment=flet.MainAxisAlignment.CENTER),
+            bgcolor="#2D2D2D", border_radius=10, border=flet.border.all(1, "#555555"), padding=5, height=80
+        )
+
         TOOL_BTN_H = 40 
         tools_column = flet.Column([
             speed_panel, flet.Container(height=5),
+            jog_speed_panel, flet.Container(height=5),
             flet.ElevatedButton("HOME", icon=flet.icons.HOME, style=flet.ButtonStyle(bgcolor=flet.colors.BLUE_GREY_700, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_home_click, expand=True, width=10000),
             flet.ElevatedButton("SAFETY", icon=flet.icons.SHIELD, style=flet.ButtonStyle(bgcolor=flet.colors.TEAL_700, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_safety_click, expand=True, width=10000),
             flet.ElevatedButton("GRIPPER CHANGE", icon=flet.icons.HANDYMAN, style=flet.ButtonStyle(bgcolor=flet.colors.PURPLE_700, color="white", shape=flet.RoundedRectangleBorder(radius=8)), on_click=self.on_change_tool_click, expand=True, width=10000),
@@ -115,9 +168,16 @@ class JogView(flet.Container):
             self.tcp_labels[name] = lbl
             pos_list.controls.append(flet.Row([flet.Text(f"{name}:", weight="bold"), lbl], alignment="spaceBetween", expand=True))
 
+        # Readouts keep their last text: only labels whose text changed are sent (gui.render)
+        self.labels = BoundLabels(self.render, {**self.position_value_labels, **self.tcp_labels})
+
         position_frame = flet.Container(content=pos_list, **panel_style, expand=4)
         self.content = flet.Row([motors_container, tools_container, position_frame], spacing=10, vertical_alignment=flet.CrossAxisAlignment.STRETCH)
 
+    @property
+    def is_robot_homed(self):
+        return self.state.snapshot.homed
+
     # --- LIFECYCLE METHODS ---
     def did_mount(self):
         # Force UI update when view is mounted
@@ -132,68 +192,154 @@ class JogView(flet.Container):
     def send_all_joints(self):
         """
         Wysyła zbiorczą ramkę: J_v1,v2,v3,v4,v5,v6
-        Pobiera wartości z self.internal_target_values.
+        Pobiera zadane pozycje z magazynu stanu.
         """
         if self.uart and self.uart.is_open():
             try:
-                # Pobierz wartości w kolejności J1...J6
-                vals = [self.internal_target_values.get(f"J{i}", 0.0) for i in range(1, 7)]
-                
-                # Zbuduj string: "J_10.0,20.0,-5.0,..."
-                # Używamy .2f dla precyzji
-                data_str = ",".join([f"{v:.2f}" for v in vals])
-                cmd = f"J_{data_str}"
-                
-                # Wyślij (biblioteka communication dodaje \r\n zazwyczaj, 
-                # ale jeśli nie, upewnij się w communication.py)
-                self.uart.send_message(cmd)
+                self.uart.send_message(format_joint_command(self.state.snapshot.commanded))
             except Exception as e:
                 print(f"[JOG] Błąd wysyłania: {e}")
 
-    def update_joints_and_fk(self, joint_values: dict):
-        for k, v in joint_values.items():
-            # Invert feedback to match URDF model
-            corrected_val = -v
-            self.current_raw_values[k] = corrected_val 
-            
-            # Only sync on INITIAL startup (before first jog) to avoid feedback overwriting user targets
-            if not self.initial_sync_done:
-                self.internal_target_values[k] = corrected_val
-            
-            # Display normalized value
-            if k in self.position_value_labels:
-                self.position_value_labels[k].value = f"{corrected_val:.2f}°"
-        
-        if joint_values:
-            self.initial_sync_done = True
-        self._calculate_forward_kinematics()
-        if self.page: self.page.update()
+    def on_activate(self):
+        # Catch up from the latest snapshot in one refresh
+        self.refresh_from_state()
 
-    def _jog_thread(self, joint_code, button_type):
-        STEP_INCREMENT = 0.5
-        # No direction inversion needed with URDF-based kinematics
-        # + button = positive direction, - button = negative direction
-
-        while self.is_jogging:
-            current_target = self.internal_target_values.get(joint_code, 0.0)
-            button_dir = 1 if button_type == "plus" else -1
-            delta = STEP_INCREMENT * button_dir
-            new_target = current_target + delta
-            
-            if joint_code in self.joint_limits:
-                min_limit, max_limit = self.joint_limits[joint_code]
-                if new_target < min_limit: new_target = min_limit
-                elif new_target > max_limit: new_target = max_limit
+    def refresh_from_state(self, snapshot=None):
+        """
+        Shows the measured joints (feedback, inverted for display) and their TCP pose from a
+        state snapshot (only while shown). Commanded joints are for planning only.
+        """
+        if not self.is_active:
+            return
+        snapshot = snapshot or self.state.snapshot
+        for k, v in zip(JOINT_KEYS, self.FEEDBACK_DISPLAY_SIGNS * snapshot.measured_deg):
+            self.labels.set(k, f"{v:.2f}°")
+        self._calculate_forward_kinematics(self.FEEDBACK_DISPLAY_SIGNS * snapshot.measured)
+        # Only changed labels go to the render coordinator
+        self.labels.commit()
+
+    def _refresh_ui(self, dt):
+        # The setpoint loop may run at up to 250 Hz; the display does not need to
+        self._ui_elapsed += dt
+        if self._ui_elapsed >= self.UI_PERIOD:
+            self._ui_elapsed = 0.0
+            self.refresh_from_state()
+
+    def _start_collision_check(self):
+        # A start pose already in contact (hull approximation) must stay jog-able
+        self.collision_reported = False
+        self.check_collision = bool(self.collision) and \
+            not self.collision.in_collision(self.state.snapshot.commanded)
+
+    def _is_collision_free(self, targets):
+        if not self.check_collision:
+            return True
+        try:
+            hits = self.collision.colliding_pairs(targets)
+        except Exception as e:
+            print(f"[JOG] Collision check error: {e}")
+            return True
+        if hits:
+            if not self.collision_reported:
+                print(f"[JOG] Self-collision: {hits}")
+                if self.on_error:
+                    self.on_error("SCL")
+                self.collision_reported = True
+            return False
+        return True
+
+    def _start_obstacle_check(self):
+        self.obstacle_reported = False
+        self.obstacle_distance = float("inf")
+        if self.obstacles and self.obstacles.active:
+            self.obstacle_distance = self.obstacles.clearance(self.state.snapshot.commanded)[0]
+
+    def _obstacle_speed_scale(self):
+        if not self.obstacles or not self.obstacles.active:
+            return 1.0
+        return self.obstacles.speed_scale(self.obstacle_distance)
+
+    def _is_obstacle_clear(self, targets):
+        if not self.obstacles or not self.obstacles.active:
+            return True
+        distance, name = self.obstacles.clearance(targets)
+        if not self.obstacles.allows(self.obstacle_distance, distance):
+            if not self.obstacle_reported:
+                print(f"[JOG] Obstacle '{name}' at {distance * 1000:.1f} mm - holding")
+                if self.on_error:
+                    self.on_error("OBS")
+                self.obstacle_reported = True
+            return False
+        self.obstacle_distance = distance
+        return True
+
+    def set_gear_ratios(self, gear_ratios):
+        """Gear ratios used to convert the drive VMAX/AMAX to joint jog limits."""
+        self.drives.set_gear_ratios(gear_ratios)
+        vel, acc = self.drives.joint_limits()
+        print(f"[JOG] Jog limits [deg/s]: {np.round(vel, 1).tolist()}, [deg/s^2]: {np.round(acc, 1).tolist()}")
 
-            self.internal_target_values[joint_code] = new_target
+    def _jog_thread(self, joint_code, button_type):
+        # Velocity ramp: accelerate with AMAX up to the jog speed (capped by VMAX), brake
+        # in time before the joint limit, and after release decelerate to the predicted stop.
+        # + button = positive direction, - button = negative direction (URDF convention)
+        idx = int(joint_code[1:]) - 1
+        direction = 1 if button_type == "plus" else -1
+        vel_limits, acc_limits = self.drives.joint_limits()
+        v_max = min(float(self.jog_speed_deg_s), float(vel_limits[idx]))
+        a_max = float(acc_limits[idx])
+        min_limit, max_limit = self.joint_limits.get(joint_code, (-math.inf, math.inf))
+        self._start_collision_check()
+        self._start_obstacle_check()
+        ramp = {"v": 0.0, "stop": None}
+
+        def step(dt):
+            q = self.state.snapshot.commanded
+            pos = float(np.degrees(q[idx]))
+            v = ramp["v"]
+            if self.jog_held:
+                room = max(0.0, (max_limit - pos) if direction > 0 else (pos - min_limit))
+                v_cmd = direction * min(v_max * self._obstacle_speed_scale(), math.sqrt(2.0 * a_max * room))
+                v_new = v + float(np.clip(v_cmd - v, -a_max * dt, a_max * dt))
+                new_pos = float(np.clip(pos + 0.5 * (v + v_new) * dt, min_limit, max_limit))
+            else:
+                if ramp["stop"] is None:
+                    ramp["stop"] = float(np.clip(pos + v * abs(v) / (2.0 * a_max), min_limit, max_limit))
+                    print(f"[JOG] {joint_code} release at {pos:.2f}° ({v:.1f}°/s), stop at {ramp['stop']:.2f}°")
+                v_new = math.copysign(max(0.0, abs(v) - a_max * dt), v)
+                new_pos = pos + 0.5 * (v + v_new) * dt
+                if v_new == 0.0 or (ramp["stop"] - new_pos) * v <= 0.0:
+                    v_new, new_pos = 0.0, ramp["stop"]
+
+            candidate = q.copy()
+            candidate[idx] = np.radians(new_pos)
+            if not self._is_collision_free(candidate) or not self._is_obstacle_clear(candidate):
+                ramp["v"] = 0.0  # Blocked: hold position
+                return self.jog_held
+
+            ramp["v"] = v_new
+            self.state.set_commanded(candidate)
             
             # >>> ZMIANA: Zamiast wysyłać J1_..., wysyłamy wszystko <<<
             self.send_all_joints()
             
-            # Update local UI immediately (FK + displayed angles)
-            self.update_joints_and_fk(self.internal_target_values)
-            
-            time.sleep(0.05)
+            # Update local UI (FK + displayed angles), at most every UI_PERIOD
+            self._refresh_ui(dt)
+            return self.jog_held or v_new != 0.0
+
+        self._run_motion(step)
+
+    def _run_motion(self, step):
+        # Blocking setpoint loop on the calling (motion) thread
+        self.state.update(moving=True)
+        try:
+            self.scheduler.run(step, keep_running=lambda: self.is_jogging)
+        except Exception as e:
+            print(f"[JOG] Motion loop error: {e}")
+        finally:
+            self.state.update(moving=False)
+            self.is_jogging = False
+            self.refresh_from_state()
 
     def on_jog_start(self, e, joint_code, direction, btn):
         if not self.is_robot_homed:
@@ -202,13 +348,15 @@ class JogView(flet.Container):
         if self.is_jogging: return
         self.active_jog_btn = btn
         self.is_jogging = True
+        self.jog_held = True
         btn.content.bgcolor = "#111111"
         btn.content.border = flet.border.all(1, "cyan")
         btn.content.update()
-        threading.Thread(target=self._jog_thread, args=(joint_code, direction), daemon=True).start()
+        self.scheduler.submit(self._jog_thread, joint_code, direction)
 
     def on_jog_stop(self, e, joint_code, direction, btn):
-        self.is_jogging = False
+        # The jog thread ramps down and clears is_jogging itself (STOP still halts at once)
+        self.jog_held = False
         self.active_jog_btn = None
         btn.content.bgcolor = "#444444"
         btn.content.border = flet.border.all(1, "#666")
@@ -216,15 +364,13 @@ class JogView(flet.Container):
 
     def set_homed_status(self, is_homed: bool):
         print(f"[JOG] set_homed_status wywołane: {is_homed}") 
-        self.is_robot_homed = is_homed
-        if is_homed:
-            self.internal_target_values = { f"J{i}": 0.0 for i in range(1, 7) }
-            self.initial_sync_done = True 
+        # Po bazowaniu zadane pozycje startują od zera (RobotState.set_homed)
+        if self.state.snapshot.homed != bool(is_homed):
+            self.state.set_homed(bool(is_homed))
 
         if self.page:
             if self.homing_loading_dialog:
                 self.homing_loading_dialog.open = False
-                self.page.update()
                 # self.page.close(self.homing_loading_dialog)
                 self.homing_loading_dialog = None
             
@@ -232,7 +378,8 @@ class JogView(flet.Container):
             color = flet.colors.GREEN if is_homed else flet.colors.RED
             self.page.snack_bar = flet.SnackBar(flet.Text(msg), bgcolor=color)
             self.page.snack_bar.open = True
-            self.page.update()
+            # Dialog + snackbar in one update (gui.render)
+            self.render.invalidate()
 
     def on_home_click(self, e):
         self._show_homing_choice_dialog()
@@ -463,54 +610,55 @@ class JogView(flet.Container):
         self.page.update()
                 
     def on_standby_click(self, e):
-        # Target: All zeros
-        target_deg = [0.0] * 6
-        self._animate_move(target_deg)
+        # Target: named pose STANDBY (all zeros, named_poses.json)
+        self._animate_move("STANDBY")
                 
     def on_safety_click(self, e):
         # Trigger W2 warning
         if self.on_error:
             self.on_error("W2")
-        # Target: [0, 50, -70, -90, 0, 0] degrees (Harmonized with CartesianView)
-        target_deg = [0, -50, 70, 90, 0, 0]
-        self._animate_move(target_deg)
+        # Target: named pose SAFETY [0, -50, 70, 90, 0, 0] (shared with CartesianView)
+        self._animate_move("SAFETY")
 
-    def _animate_move(self, target_joints_deg):
-        """Moves robot to target joints smoothly using current velocity."""
-        if self.is_jogging: return
+    def _animate_move(self, move_name):
+        """Moves robot to a named pose along its (cached) synchronized S-curve trajectory."""
+        if self.is_jogging or not self.moves: return
         self.is_jogging = True
-        
-        def run():
-            # Standard movement speed: 90 deg/s at 100% velocity
-            # Loop runs at 20Hz (0.05s), so max step is 4.5 deg
-            while self.is_jogging:
-                current = np.array([self.internal_target_values[f"J{i}"] for i in range(1, 7)])
-                target = np.array(target_joints_deg)
-                diff = target - current
-                dist = np.linalg.norm(diff)
-                
-                if dist < 0.1:
-                    for i, val in enumerate(target_joints_deg):
-                        self.internal_target_values[f"J{i+1}"] = val
-                    self.send_all_joints()
-                    self.update_joints_and_fk(self.internal_target_values)
-                    break
-                
-                factor = self.speed_percent / 100.0
-                step_size = min(dist, 4.5 * factor)
-                
-                new_pos = current + (diff / dist) * step_size
-                for i, val in enumerate(new_pos):
-                    self.internal_target_values[f"J{i+1}"] = val
-                
-                self.send_all_joints()
-                self.update_joints_and_fk(self.internal_target_values)
-                time.sleep(0.05)
-            
+        self.scheduler.submit(self._move_thread, move_name)
+
+    def _move_thread(self, move_name):
+        # Planned once per start region / tool / speed (90 deg/s at 100% velocity), sampled by the scheduler
+        start = self.state.start_joints()
+        try:
+            traj = self.moves.trajectory(move_name, start, speed_scale=self.speed_percent / 100.0)
+        except PlanningError as e:
+            print(f"[JOG] Move {move_name}: {e}")
+            if self.on_error:
+                self.on_error(e.code)
             self.is_jogging = False
+            return
+        self._start_obstacle_check()
+        t_traj = [0.0]
+
+        def step(dt):
+            # Trajectory time advances slower near cell obstacles
+            t_traj[0] = min(traj.duration, t_traj[0] + dt * self._obstacle_speed_scale())
+            q = traj.at(t_traj[0])
+            if not self._is_obstacle_clear(q):
+                return False
+            self.state.set_commanded(q)
             
-        threading.Thread(target=run, daemon=True).start()
+            self.send_all_joints()
+            self._refresh_ui(dt)
+            return t_traj[0] < traj.duration
+
+        self._run_motion(step)
     
+    def change_jog_speed(self, delta):
+        self.jog_speed_deg_s = max(1, min(90, self.jog_speed_deg_s + delta))
+        self.lbl_jog_speed.value = f"{self.jog_speed_deg_s}°/s"
+        self.lbl_jog_speed.update()
+
     def change_speed(self, delta):
         self.speed_percent = max(10, min(100, self.speed_percent + delta))
         self.lbl_speed.value = f"{self.speed_percent}%"
@@ -582,7 +730,7 @@ class JogView(flet.Container):
                 **container_style
             )
 
-    def _calculate_forward_kinematics(self):
+    def _calculate_forward_kinematics(self, joints_rad=None):
         """
         Use URDF-based FK from KinematicsEngine (same as CartesianView).
         This ensures X,Y,Z,A,B,C values are identical in both tabs.
@@ -591,26 +739,22 @@ class JogView(flet.Container):
             return
             
         try:
-            # Convert current_raw_values (degrees) to radians for FK
-            joints_rad = [np.radians(self.current_raw_values.get(f"J{i+1}", 0.0)) for i in range(6)]
-            
-            # Get TCP matrix from URDF-based FK
-            tcp_matrix = self.ik.forward_kinematics(joints_rad)
-            pos = tcp_matrix[:3, 3]  # [x, y, z] in meters
-            rot = tcp_matrix[:3, :3]
+            if joints_rad is None:
+                joints_rad = self.FEEDBACK_DISPLAY_SIGNS * self.state.snapshot.measured
             
-            # Calculate Euler angles (same as CartesianView)
-            euler = R.from_matrix(rot).as_euler('xyz', degrees=True)
+            # TCP from URDF-based FK + Euler angles (same as CartesianView, shared engine cache:
+            # unchanged joints / tool skip both)
+            pos, euler = self.ik.display_pose(joints_rad)  # [mm], xyz Euler [deg]
             
             # UPDATE UI - position in mm
-            if "X" in self.tcp_labels: self.tcp_labels["X"].value = f"{pos[0]*1000:.2f} mm"
-            if "Y" in self.tcp_labels: self.tcp_labels["Y"].value = f"{pos[1]*1000:.2f} mm"
-            if "Z" in self.tcp_labels: self.tcp_labels["Z"].value = f"{pos[2]*1000:.2f} mm"
+            self.labels.set("X", f"{pos[0]:.2f} mm")
+            self.labels.set("Y", f"{pos[1]:.2f} mm")
+            self.labels.set("Z", f"{pos[2]:.2f} mm")
             
             # Rotation in degrees
-            if "A" in self.tcp_labels: self.tcp_labels["A"].value = f"{euler[0]:.2f}°"
-            if "B" in self.tcp_labels: self.tcp_labels["B"].value = f"{euler[1]:.2f}°"
-            if "C" in self.tcp_labels: self.tcp_labels["C"].value = f"{euler[2]:.2f}°"
+            self.labels.set("A", f"{euler[0]:.2f}°")
+            self.labels.set("B", f"{euler[1]:.2f}°")
+            self.labels.set("C", f"{euler[2]:.2f}°")
             
         except Exception as e:
             print(f"[JOG] FK error: {e}")
\ No newline at end of file
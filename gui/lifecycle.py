@@ -0,0 +1,46 @@
+"""
+View lifecycle. main.py shows one view at a time in frame_middle; switch_view() calls
+deactivate() on the view being hidden and activate() on the one being shown.
+
+A hidden view stops its rendering work (refresh tasks, FK, label and log updates) and
+only keeps the state it needs; activate() catches up from the latest state snapshot in a
+single refresh. Views override on_activate() / on_deactivate().
+"""
+
+
+class ViewLifecycle:
+    is_active = False
+
+    def activate(self):
+        if self.is_active:
+            return
+        self.is_active = True
+        try:
+            self.on_activate()
+        except Exception as e:
+            print(f"[VIEW] {type(self).__name__} activate error: {e}")
+
+    def deactivate(self):
+        if not self.is_active:
+            return
+        self.is_active = False
+        try:
+            self.on_deactivate()
+        except Exception as e:
+            print(f"[VIEW] {type(self).__name__} deactivate error: {e}")
+
+    def on_activate(self):
+        pass
+
+    def on_deactivate(self):
+        pass
+
+
+def switch_view(previous, view):
+    """Deactivates previous and activates view (either may be a control without the lifecycle)."""
+    if previous is view:
+        return
+    if isinstance(previous, ViewLifecycle):
+        previous.deactivate()
+    if isinstance(view, ViewLifecycle):
+        view.activate()
@@ -0,0 +1,159 @@
+"""
+Coalesced, frame-rate-limited UI updates.
+
+Every page.update() / control.update() builds the diff of the changed controls and sends
+it to the Flutter client. Data-driven code (UART frames, the jog and refresh loops, the
+clock) marks controls dirty with invalidate(*controls) instead, or invalidate() for the
+whole page; a single flush on the coordinator's own UI thread sends everything that
+accumulated, at most once per frame (DISPLAY_RATE_HZ, "ui_rate_hz" in global_settings.json).
+The flush never runs on the task loop (parol6.tasks) or on a setpoint thread.
+
+User actions (button handlers, dialogs) may still update directly.
+
+stats(): requested = invalidate() calls, sent = page updates actually issued.
+
+BoundLabels sits in front of it for the numeric readouts: it remembers the text shown
+by every Text control and only assigns and marks the controls whose text changed.
+"""
+import json
+import threading
+import time
+
+DISPLAY_RATE_HZ = 30
+MIN_RATE_HZ = 5
+MAX_RATE_HZ = 60
+
+
+class RenderCoordinator:
+    def __init__(self, page=None, rate_hz=DISPLAY_RATE_HZ):
+        self.page = page
+        self.rate_hz = int(min(MAX_RATE_HZ, max(MIN_RATE_HZ, rate_hz)))
+        self.period = 1.0 / self.rate_hz
+        self._lock = threading.Condition()
+        self._thread = None
+        self._controls = {}             # id -> control waiting for the next flush
+        self._full = False              # Whole page requested
+        self._pending = False           # Flush already scheduled
+        self._last_flush = 0.0
+        self.requested = 0
+        self.sent = 0
+
+    def attach(self, page):
+        self.page = page
+
+    def invalidate(self, *controls):
+        """Marks controls (none = the whole page) for the next flush."""
+        with self._lock:
+            self.requested += 1
+            if controls:
+                for control in controls:
+                    if control is not None:
+                        self._controls[id(control)] = control
+            else:
+                self._full = True
+            if self._pending:
+                return
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="render-flush", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def _run(self):
+        # UI thread: waits for invalidate(), keeps the frame period, flushes
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._lock.wait()
+                delay = self._last_flush + self.period - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            controls = list(self._controls.values())
+            full = self._full
+            self._controls.clear()
+            self._full = False
+            self._pending = False
+            self._last_flush = time.monotonic()
+        page = self.page
+        if page is None:
+            return
+        try:
+            if full:
+                page.update()
+            else:
+                # Controls of a view that is not on the page right now cannot be updated
+                mounted = [c for c in controls if c.page is not None]
+                if not mounted:
+                    return
+                page.update(*mounted)
+            with self._lock:
+                self.sent += 1
+        except Exception as e:
+            print(f"[RENDER] Update failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            saved = 1.0 - self.sent / self.requested if self.requested else 0.0
+            return {"rate_hz": self.rate_hz, "requested": self.requested, "sent": self.sent, "saved": saved}
+
+    def summary(self):
+        s = self.stats()
+        return f"{s['rate_hz']} Hz requested={s['requested']} sent={s['sent']} saved={100.0 * s['saved']:.0f}%"
+
+
+class BoundLabels:
+    def __init__(self, render, controls=None):
+        self.render = render
+        self.controls = {}
+        self._shown = {}
+        self._changed = []
+        for key, control in (controls or {}).items():
+            self.bind(key, control)
+
+    def bind(self, key, control):
+        self.controls[key] = control
+        self._shown[key] = control.value
+
+    def set(self, key, text):
+        """Shows text on the control bound to key; True when it differs from what is shown."""
+        if self._shown.get(key) == text:
+            return False
+        control = self.controls.get(key)
+        if control is None:
+            return False
+        control.value = text
+        self._shown[key] = text
+        self._changed.append(control)
+        return True
+
+    def commit(self):
+        """Marks the changed controls for the next flush. Returns how many changed."""
+        changed, self._changed = self._changed, []
+        if changed:
+            self.render.invalidate(*changed)
+        return len(changed)
+
+
+# ==============================================================================
+# SHARED COORDINATOR (ONE PER PROCESS)
+# ==============================================================================
+_shared_render = None
+_shared_lock = threading.Lock()
+
+def get_render_coordinator(settings_path="global_settings.json"):
+    global _shared_render
+    with _shared_lock:
+        if _shared_render is None:
+            rate = DISPLAY_RATE_HZ
+            try:
+                with open(settings_path, "r") as f:
+                    rate = json.load(f).get("ui_rate_hz", DISPLAY_RATE_HZ)
+            except Exception:
+                pass
+            _shared_render = RenderCoordinator(rate_hz=rate)
+            print(f"[RENDER] UI updates flushed at most {_shared_render.rate_hz} Hz")
+        return _shared_render
@@ -4,8 +4,14 @@ from flet import Column, Row, Container, ElevatedButton, Slider, Text, Image, al
 import json
 import time
 import threading
-
-class SettingsView(flet.Container):
+import numpy as np
+from parol6.drives import GEAR_RATIOS
+from parol6.state import get_robot_state
+from parol6.tasks import get_task_loop
+from gui.lifecycle import ViewLifecycle
+from gui.render import get_render_coordinator
+
+class SettingsView(ViewLifecycle, flet.Container):
     """
     Settings View - FINAL FIXED VERSION
     - Fixed 'homing_event' AttributeError.
@@ -25,11 +31,8 @@ class SettingsView(flet.Container):
         self.alignment = alignment.center
         self.comm = uart_communicator
         
-        # --- GEAR RATIOS (J1 to J6) ---
-        self.gear_ratios = {
-            1: 6.4, 2: 20.0, 3: 18.0952381, 
-            4: 4.0, 5: 4.0, 6: 10.0
-        }
+        # --- GEAR RATIOS (J1 to J6, shared with the host-side drive model) ---
+        self.gear_ratios = dict(GEAR_RATIOS)
 
         # --- STATE VARIABLES ---
         self.selected_motor_index = 1 
@@ -41,7 +44,11 @@ class SettingsView(flet.Container):
         
         # --- KLUCZOWE ZMIENNE (To naprawia Twój błąd) ---
         self.homing_event = threading.Event()  # <--- TEGO BRAKOWAŁO
-        self.current_test_pos = 0.0            # Do śledzenia pozycji w teście
+        # Pozycja w teście = zmierzona pozycja wybranej osi ze wspólnego magazynu stanu
+        self.state = get_robot_state()
+        self.test_task = None  # Sekwencja testowa silnika (zadanie parol6.tasks)
+        # Dane z UART (DBG, SGRESULT, EGRIP) odświeżają kontrolki zbiorczo (gui.render)
+        self.render = get_render_coordinator()
 
         # Tuning variables
         self.tuning_dialog = None
@@ -137,12 +144,12 @@ class SettingsView(flet.Container):
                     val = part.split("=")[1].strip()
                     if self.sg_value_text.page:
                         self.sg_value_text.value = val
-                        self.sg_value_text.update()
+                        self.render.invalidate(self.sg_value_text)
                 elif "V=" in part:
                     val = part.split("=")[1].strip()
                     if self.vel_value_text.page:
                         self.vel_value_text.value = f"{val} st/s"
-                        self.vel_value_text.update()
+                        self.render.invalidate(self.vel_value_text)
                 elif "Mode=" in part:
                     mode_str = part.split("=")[1].strip()
                     if self.mode_value_text.page:
@@ -151,7 +158,7 @@ class SettingsView(flet.Container):
                             self.mode_value_text.color = colors.RED_ACCENT
                         else:
                             self.mode_value_text.color = colors.GREEN_ACCENT
-                        self.mode_value_text.update()
+                        self.render.invalidate(self.mode_value_text)
         except Exception as e:
             print(f"Error in parse_debug_line: {e}")
 
@@ -185,7 +192,7 @@ class SettingsView(flet.Container):
                             val_str = parts[i+1]
                             try:
                                 val = float(val_str)
-                                self.current_test_pos = val
+                                self.state.set_measured_joint(self.selected_motor_index - 1, np.radians(val))
                                 # print(f"[POS UPDATED] {current_motor_tag} = {val}") # Sukces
                                 break
                             except: pass
@@ -207,7 +214,7 @@ class SettingsView(flet.Container):
                             for i in range(len(self.chart_data_points) - 1):
                                 self.chart_data_points[i].y = self.chart_data_points[i+1].y
                             self.chart_data_points[-1].y = val
-                            self.sg_chart.update()
+                            self.render.invalidate(self.sg_chart)
             except: pass
             return
 
@@ -216,11 +223,11 @@ class SettingsView(flet.Container):
             if hasattr(self, 'stall_status_text') and self.stall_status_text.page:
                 self.stall_status_text.value = f"⚠️ KOLIZJA!"
                 self.stall_status_text.color = "white"
-                self.stall_status_text.update()
+                self.render.invalidate(self.stall_status_text)
             if hasattr(self, 'stall_status_container') and self.stall_status_container.page:
                 self.stall_status_container.bgcolor = ft.colors.RED_900
                 self.stall_status_container.border = ft.border.all(2, ft.colors.RED_400)
-                self.stall_status_container.update()
+                self.render.invalidate(self.stall_status_container)
             return
 
         # 4. CHWYTAK (EGRIP) - format: EGRIP_SR_wartość
@@ -234,11 +241,11 @@ class SettingsView(flet.Container):
                     for i in range(len(self.egrip_chart_data_points) - 1):
                         self.egrip_chart_data_points[i].y = self.egrip_chart_data_points[i+1].y
                     self.egrip_chart_data_points[-1].y = val
-                    self.egrip_chart.update()
+                    self.render.invalidate(self.egrip_chart)
                 # Aktualizuj tekst
                 if self.egrip_sg_result_text.page:
                     self.egrip_sg_result_text.value = str(val)
-                    self.egrip_sg_result_text.update()
+                    self.render.invalidate(self.egrip_sg_result_text)
             except: pass
             return
 
@@ -362,7 +369,7 @@ class SettingsView(flet.Container):
             print(f"[TEST] Sending J{motor}_{target_angle}")
             if self.comm: self.comm.send_message(f"J{motor}_{target_angle}\r\n")
             
-            time.sleep(0.5) # Czekaj na start
+            yield 0.5 # Czekaj na start
             
             strict_tolerance = 0.5  # Tolerancja 0.5 stopnia
             last_position = -9999.0
@@ -399,7 +406,7 @@ class SettingsView(flet.Container):
                         self.page.update()
                     return False # Przerwij test
                 
-                time.sleep(0.1)
+                yield 0.1
 
         def motion_sequence():
             motor = self.selected_motor_index
@@ -407,13 +414,13 @@ class SettingsView(flet.Container):
             
             print("--- START STRICT SEQUENCE ---")
             
-            if not move_and_wait_strict(motor, 30): return
-            time.sleep(1.0)
+            if not (yield from move_and_wait_strict(motor, 30)): return
+            yield 1.0
             
-            if not move_and_wait_strict(motor, -30): return
-            time.sleep(1.0)
+            if not (yield from move_and_wait_strict(motor, -30)): return
+            yield 1.0
             
-            if not move_and_wait_strict(motor, 0): return
+            if not (yield from move_and_wait_strict(motor, 0)): return
             
             print("--- END STRICT SEQUENCE: OK ---")
             if self.page: 
@@ -421,10 +428,17 @@ class SettingsView(flet.Container):
                 self.page.snack_bar.open = True
                 self.page.update()
 
-        threading.Thread(target=motion_sequence, daemon=True).start()
+        # Generator na wspólnej pętli zadań (parol6.tasks): yield = czekanie bez blokowania
+        if self.test_task and self.test_task.active: self.test_task.cancel()
+        self.test_task = get_task_loop().spawn(motion_sequence(), name="SETTINGS test motion")
 
     # --- Wklej to wewnątrz klasy SettingsView w pliku gui/settings.py ---
     
+    @property
+    def current_test_pos(self):
+        """Measured position [deg] of the selected motor (as reported by the controller)."""
+        return float(self.state.snapshot.measured_deg[self.selected_motor_index - 1])
+
     def set_homed_status(self, is_homed: bool):
         """
         Obsługa sygnału z main.py o zakończeniu bazowania.
@@ -572,6 +586,7 @@ class SettingsView(flet.Container):
         if self.comm: self.comm.send_message(f"{command_str}\r\n")
 
     def upload_configuration(self, page_from_main=None):
+        # Generator dla wspólnej pętli zadań (parol6.tasks): każdy yield to przerwa między komendami
         if not self.comm or not self.comm.is_open(): return
         target_page = self.page if self.page else page_from_main
         loading_dialog = None
@@ -583,31 +598,31 @@ class SettingsView(flet.Container):
             target_page.update()
 
         try:
-            time.sleep(0.5)
+            yield 0.5
             for motor_id in range(1, 7):
                 settings = self.motor_settings_data.get(motor_id, {})
                 vals = settings.get(1, [1000, 5000, 5000, 50000, 5000])
-                self.comm.send_message(f"OT,ramp,J{motor_id},{vals[0]},{vals[1]},{vals[2]},{vals[3]},{vals[4]}\r\n"); time.sleep(0.15)
+                self.comm.send_message(f"OT,ramp,J{motor_id},{vals[0]},{vals[1]},{vals[2]},{vals[3]},{vals[4]}\r\n"); yield 0.15
                 vals = settings.get(2, [5, 10, 10])
-                self.comm.send_message(f"OT,current,J{motor_id},{vals[0]},{vals[1]},{vals[2]}\r\n"); time.sleep(0.15)
+                self.comm.send_message(f"OT,current,J{motor_id},{vals[0]},{vals[1]},{vals[2]}\r\n"); yield 0.15
                 vals = settings.get(3, [50000, 2000, 0])
-                self.comm.send_message(f"OT,homing,J{motor_id},{vals[0]},{vals[1]},{vals[2]}\r\n"); time.sleep(0.15)
+                self.comm.send_message(f"OT,homing,J{motor_id},{vals[0]},{vals[1]},{vals[2]}\r\n"); yield 0.15
                 vals = settings.get(4, [0, 5])
-                self.comm.send_message(f"OT,stall,J{motor_id},{vals[0]},{vals[1]}\r\n"); time.sleep(0.15)
+                self.comm.send_message(f"OT,stall,J{motor_id},{vals[0]},{vals[1]}\r\n"); yield 0.15
             
             # Send Gripper Settings
             v_vals = self.gripper_settings_data.get("VGrip", [-40, -20, 1])
-            self.comm.send_message(f"OT,VGrip,{','.join(map(str, v_vals))}\r\n"); time.sleep(0.15)
+            self.comm.send_message(f"OT,VGrip,{','.join(map(str, v_vals))}\r\n"); yield 0.15
             s_vals = self.gripper_settings_data.get("SGrip", [10, 20, 5000, 0])
-            self.comm.send_message(f"OT,SGrip,{','.join(map(str, s_vals))}\r\n"); time.sleep(0.15)
+            self.comm.send_message(f"OT,SGrip,{','.join(map(str, s_vals))}\r\n"); yield 0.15
             
             # Send Global Settings
             self._send_global_settings()
             
-            time.sleep(1.5) 
+            yield 1.5 
             for _ in range(3):
                 if self.comm: self.comm.send_message("CONFIG_DONE\r\n")
-                time.sleep(0.5)
+                yield 0.5
         except Exception as e: print(f"Error: {e}")
         finally:
             if target_page and loading_dialog:
@@ -896,6 +911,10 @@ class SettingsView(flet.Container):
         self.content = self._create_main_view()
         if self.page: self.page.update()
 
+    def on_activate(self):
+        # Każde wejście w zakładkę zaczyna od widoku głównego (wysyła go update przełączenia widoku)
+        self.content = self._create_main_view()
+
     def on_image_click(self, e, image_path: str):
         self.content = self._create_detail_view(image_path)
         if self.page: self.update()
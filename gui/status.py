@@ -1,7 +1,9 @@
 import flet
 from flet import Column, Row, Container, Text, alignment, colors, MainAxisAlignment, ScrollMode, padding, border
+from gui.lifecycle import ViewLifecycle
+from gui.render import get_render_coordinator
 
-class StatusView(flet.Container):
+class StatusView(ViewLifecycle, flet.Container):
     def __init__(self): 
         super().__init__()
         
@@ -14,6 +16,7 @@ class StatusView(flet.Container):
         self.bgcolor = "#2D2D2D"
         
         self.value_controls = {}
+        self.render = get_render_coordinator()
 
         # ======================================================================
         # === LEFT COLUMN (Power, Temperatures, Pneumatics) ===
@@ -44,6 +47,19 @@ class StatusView(flet.Container):
                 self._create_header("SYSTEM STATUS"),
                 self._create_status_row("Connection", "Disconnected", color=colors.GREY_400, key="CONN_STAT"),
                 self._create_status_row("Port", "--", color=colors.BLUE_400, key="PORT_NAME"),
+
+                # --- 5. MOTION LOOP (setpoint scheduler) ---
+                self._create_header("MOTION LOOP"),
+                self._create_status_row("Loop Rate", "--", color=colors.BLUE_400, key="LOOP_RATE"),
+                self._create_status_row("Jitter", "--", key="LOOP_JITTER"),
+                self._create_status_row("Max Latency", "--", key="LOOP_MAX_LATE"),
+                self._create_status_row("Missed Deadlines", "0", color=colors.GREEN_400, key="LOOP_MISSED"),
+
+                # --- 6. UI UPDATES (gui.render) ---
+                self._create_header("UI UPDATES"),
+                self._create_status_row("Requested", "0", key="UI_REQUESTED"),
+                self._create_status_row("Sent", "0", color=colors.BLUE_400, key="UI_SENT"),
+                self._create_status_row("Saved", "--", color=colors.GREEN_400, key="UI_SAVED"),
             ],
             scroll=ScrollMode.ADAPTIVE,
             spacing=5,
@@ -112,9 +128,28 @@ class StatusView(flet.Container):
             if new_color:
                 control.color = new_color
             
-            # Refresh only this element
-            if control.page:
-                control.update()
+            # Refresh only this element (coalesced per frame, gui.render); a hidden view
+            # only keeps the value - switching to it sends the whole view
+            if self.is_active and control.page:
+                self.render.invalidate(control)
+
+    def update_loop_stats(self, stats):
+        """
+        Called by the setpoint scheduler (about once per second while a loop runs).
+        """
+        self.update_status("LOOP_RATE", f"{stats['rate_hz']} Hz")
+        self.update_status("LOOP_JITTER", f"{stats['jitter_ms']:.2f} ms")
+        self.update_status("LOOP_MAX_LATE", f"{stats['max_late_ms']:.2f} ms")
+        missed_color = colors.RED_400 if stats["missed"] else colors.GREEN_400
+        self.update_status("LOOP_MISSED", f"{stats['missed']} / {stats['ticks']}", missed_color)
+
+    def update_render_stats(self, stats):
+        """
+        Called from main.py every few seconds: UI updates requested by the views vs sent.
+        """
+        self.update_status("UI_REQUESTED", stats["requested"])
+        self.update_status("UI_SENT", stats["sent"])
+        self.update_status("UI_SAVED", f"{100.0 * stats['saved']:.0f} %")
 
     # ======================================================================
     # === UI HELPER METHODS ===
@@ -1,9 +1,12 @@
 import flet as ft
 import time
 import os
-import threading
+import json
 import serial.tools.list_ports 
-import screeninfo
+try:
+    import screeninfo
+except ImportError:
+    screeninfo = None
 # --- Import widoków ---
 try:
     from gui.cartesian import CartesianView
@@ -11,24 +14,54 @@ try:
     from gui.settings import SettingsView 
     from gui.status import StatusView 
     from gui.errors import ErrorsView
-    from gui.communication import UARTCommunicator
+    from parol6.transport import UARTCommunicator
+    from parol6.kinematics import get_kinematics_engine
+    from parol6.robot import Robot
+    from parol6.scheduler import get_setpoint_scheduler
+    from parol6 import protocol
 except ImportError as e:
     print(f"Błąd importu modułów GUI: {e}")
     # Fallback dla testów
     CartesianView = JogView = SettingsView = StatusView = ErrorsView = UARTCommunicator = None
+    get_kinematics_engine = None
+    Robot = None
+    get_setpoint_scheduler = None
+    protocol = None
 
 from PIL import Image
+from parol6.tasks import get_task_loop
+from gui.lifecycle import switch_view
+from gui.render import get_render_coordinator
+
+DEFAULT_WINDOW_SIZE = (1280, 800)
+TASK_REPORT_INTERVAL = 60.0     # s between [TASKS] / [RENDER] reports in the log
+RENDER_STATS_INTERVAL = 2.0     # s between UI update counters in the STATUS view
+
+def get_screen_size():
+    """Size of the first monitor; DEFAULT_WINDOW_SIZE when screeninfo / a display is missing."""
+    if screeninfo:
+        try:
+            screen = screeninfo.get_monitors()[0]
+            return screen.width, screen.height
+        except Exception as e:
+            print(f"[MAIN] Brak informacji o monitorze: {e}")
+    return DEFAULT_WINDOW_SIZE
 
 def main(page: ft.Page):
-    screen = screeninfo.get_monitors()[0]
+    screen_width, screen_height = get_screen_size()
+    # Jeden wątek dla zegara, animacji, pętli jog/ruchu i sekwencji opóźnionych (parol6.tasks)
+    task_loop = get_task_loop()
+    # Zbiorcze odświeżanie UI: widoki zgłaszają zmiany, jedno page.update() na klatkę
+    render = get_render_coordinator()
+    render.attach(page)
     # --- Ustawienia strony ---
     page.title = "PAROL6 Operator Panel by Jakub Grzebień"
     page.theme_mode = ft.ThemeMode.DARK 
     
     # Ustawienia rozmiaru okna
 
-    page.window_width = screen.width
-    page.window_height = screen.height
+    page.window_width = screen_width
+    page.window_height = screen_height
     page.window_resizable = False 
     page.window_maximizable = False 
     page.window_frameless = True 
@@ -159,13 +192,13 @@ def main(page: ft.Page):
 
                     def delayed_sync():
                         print("Czekam na start STM32...")
-                        time.sleep(2.0) 
+                        yield 2.0
                         if "SETTINGS" in views and views["SETTINGS"]:
                             print("Uruchamiam synchronizację...")
-                            views["SETTINGS"].upload_configuration(page)
+                            yield from views["SETTINGS"].upload_configuration(page)
                         
                         # Pokaż dialog wyboru narzędzia po synchronizacji
-                        time.sleep(0.5)
+                        yield 0.5
                         if "JOG" in views and views["JOG"]:
                             try:
                                 # Wywołaj dialog zmiany narzędzia
@@ -173,7 +206,7 @@ def main(page: ft.Page):
                             except Exception as ex:
                                 print(f"[MAIN] Error showing tool dialog: {ex}")
 
-                    threading.Thread(target=delayed_sync, daemon=True).start()
+                    task_loop.spawn(delayed_sync(), name="delayed sync")
 
             else:
                 print("Nie wybrano portu!")
@@ -217,9 +250,20 @@ def main(page: ft.Page):
     )
 
     # --- Przycisk Zamknij ---
+    def shutdown():
+        # Zatrzymanie procesu roboczego IK i zwolnienie pamięci współdzielonej
+        if "CARTESIAN" in views and views["CARTESIAN"]:
+            try:
+                views["CARTESIAN"].close()
+            except Exception as ex:
+                print(f"[MAIN] IK worker shutdown failed: {ex}")
+
     def close_app(e):
+        shutdown()
         page.window_close()
 
+    page.on_disconnect = lambda e: shutdown()
+
     btn_close_app = ft.IconButton(
         icon=ft.icons.CLOSE,
         icon_color="red",
@@ -302,54 +346,46 @@ def main(page: ft.Page):
     footer_buttons_map = {} 
     current_alert_level = "NONE"
 
-    # Zmienne globalne do animacji
-    animation_thread = None
-    stop_animation = False
+    # Pulsowanie przycisku błędów: zadanie okresowe na wspólnej pętli zadań (parol6.tasks)
+    animation_task = None
+    animation_toggle = False
 
-    def animate_button_loop():
-        nonlocal stop_animation
+    def animate_button_tick(dt):
+        nonlocal animation_toggle
         error_btn = footer_buttons_map.get("ERRORS")
-        if not error_btn: return
-
-        print("[MAIN DEBUG] Starting animation loop")
-        state_toggle = False
+        if not error_btn: return False
+
+        # Wybór koloru bazowego
+        if current_alert_level == "ERROR":
+            color_on = ft.colors.RED_500
+            color_off = ft.colors.RED_900 if page.theme_mode == ft.ThemeMode.DARK else ft.colors.RED_100
+            width = 4
+        elif current_alert_level == "WARNING":
+            color_on = ft.colors.YELLOW_500
+            color_off = ft.colors.YELLOW_900 if page.theme_mode == ft.ThemeMode.DARK else ft.colors.YELLOW_100
+            width = 4
+        else:
+            return False
         
-        while not stop_animation and current_alert_level != "NONE":
-            # Wybór koloru bazowego
-            if current_alert_level == "ERROR":
-                color_on = ft.colors.RED_500
-                color_off = ft.colors.RED_900 if page.theme_mode == ft.ThemeMode.DARK else ft.colors.RED_100
-                width = 4
-            elif current_alert_level == "WARNING":
-                color_on = ft.colors.YELLOW_500
-                color_off = ft.colors.YELLOW_900 if page.theme_mode == ft.ThemeMode.DARK else ft.colors.YELLOW_100
-                width = 4
-            else:
-                break
-            
-            # Animacja pulsowania (zmiana koloru ramki)
-            current_color = color_on if state_toggle else color_off
-            
-            error_btn.style.side = ft.BorderSide(width, current_color)
-            
-            try:
-                error_btn.update()
-            except:
-                break # Wyjście jeśli np. okno zamknięte
-                
-            state_toggle = not state_toggle
-            time.sleep(0.5) # Częstotliwość pulsowania
+        # Animacja pulsowania (zmiana koloru ramki)
+        current_color = color_on if animation_toggle else color_off
+        
+        error_btn.style.side = ft.BorderSide(width, current_color)
+        render.invalidate(error_btn)
             
-        # Po zakończeniu pętli - czyścimy styl
+        animation_toggle = not animation_toggle
+
+    def clear_button_animation(task):
+        # Po zakończeniu (lub anulowaniu) zadania - czyścimy styl
         print("[MAIN DEBUG] Stopping animation loop")
+        error_btn = footer_buttons_map.get("ERRORS")
+        if not error_btn: return
         error_btn.style.side = ft.BorderSide(0, ft.colors.TRANSPARENT)
-        try:
-            error_btn.update()
-        except: pass
+        render.invalidate(error_btn)
 
     def update_error_button_style(level):
-        # Ta funkcja teraz tylko zarządza wątkiem animacji
-        nonlocal animation_thread, stop_animation
+        # Ta funkcja teraz tylko zarządza zadaniem animacji
+        nonlocal animation_task, animation_toggle
         
         # Pobieramy przycisk dynamicznie ze mapy
         error_btn = footer_buttons_map.get("ERRORS")
@@ -358,10 +394,9 @@ def main(page: ft.Page):
             return
 
         if level == "NONE":
-            # Zatrzymujemy animację
-            stop_animation = True
-            if animation_thread and animation_thread.is_alive():
-                animation_thread.join(timeout=1.0)
+            # Zatrzymujemy animację (clear_button_animation wyczyści ramkę na pętli zadań)
+            if animation_task and animation_task.active:
+                animation_task.cancel()
             
             # Resetujemy styl "na sztywno" na wszelki wypadek
             error_btn.style.side = ft.BorderSide(0, ft.colors.TRANSPARENT)
@@ -369,12 +404,13 @@ def main(page: ft.Page):
             
         else:
             # Uruchamiamy animację jeśli nie działa
-            if animation_thread is None or not animation_thread.is_alive():
-                stop_animation = False
-                animation_thread = threading.Thread(target=animate_button_loop, daemon=True)
-                animation_thread.start()
+            if animation_task is None or not animation_task.active:
+                print("[MAIN DEBUG] Starting animation loop")
+                animation_toggle = False
+                animation_task = task_loop.call_every(0.5, animate_button_tick, name="error pulse",
+                                                      on_done=clear_button_animation)
             else:
-                # Jeśli wątek już działa, to pętla sama zaktualizuje kolor 
+                # Jeśli zadanie już działa, to samo zaktualizuje kolor 
                 # na podstawie zmiennej globalnej current_alert_level
                 pass
 
@@ -425,10 +461,10 @@ def main(page: ft.Page):
         if "STATUS" in views and views["STATUS"]:
             views["STATUS"].update_status(key, value, color)
 
-    def global_error_handler(error_code):
-        """Funkcja obsługująca błędy z widoków JOG/CARTESIAN"""
+    def global_error_handler(error_code, detail=None):
+        """Funkcja obsługująca błędy z widoków JOG/CARTESIAN (detail: np. linia skryptu dla E3)"""
         if "ERRORS" in views and views["ERRORS"]:
-            views["ERRORS"].send_error_code(error_code)
+            views["ERRORS"].send_error_code(error_code, detail)
 
     # --- SHARED STATE CALLBACKS ---
     def global_set_homed(is_homed):
@@ -441,24 +477,17 @@ def main(page: ft.Page):
         if "SETTINGS" in views and views["SETTINGS"]:
             views["SETTINGS"].set_homed_status(is_homed)
 
-    def global_sync_joints():
-        """Sync joint positions from JOG to CARTESIAN and vice versa"""
-        # Get current joints from JOG (in degrees, internal_target_values)
-        if "JOG" in views and views["JOG"] and "CARTESIAN" in views and views["CARTESIAN"]:
-            jog_joints = views["JOG"].internal_target_values
-            # Convert to radians and set to CARTESIAN
-            import numpy as np
-            cartesian_joints = [np.radians(jog_joints.get(f"J{i+1}", 0.0)) for i in range(6)]
-            views["CARTESIAN"].commanded_joints = cartesian_joints
-
     def global_set_tool(tool_name):
         """Set tool for ALL views at once"""
         print(f"[MAIN] global_set_tool called: {tool_name}")
+        # Views share one KinematicsEngine - set the tool once (engine + state store), then refresh both displays
+        if robot:
+            robot.set_tool(tool_name)
+        elif get_kinematics_engine:
+            get_kinematics_engine().set_tool(tool_name)
         if "JOG" in views and views["JOG"] and views["JOG"].ik:
-            views["JOG"].ik.set_tool(tool_name)
             views["JOG"]._calculate_forward_kinematics()
         if "CARTESIAN" in views and views["CARTESIAN"] and views["CARTESIAN"].ik:
-            views["CARTESIAN"].ik.set_tool(tool_name)
             views["CARTESIAN"]._update_labels_logic()
 
     # Inicjalizujemy widoki - ERRORS najpierw, żeby był dostępny dla innych
@@ -469,19 +498,39 @@ def main(page: ft.Page):
         views["JOG"] = JogView(uart_communicator=communicator, on_status_update=global_status_updater, on_error=global_error_handler)
         views["JOG"].on_global_set_homed = global_set_homed  # Add callback
         views["JOG"].on_global_set_tool = global_set_tool    # Add tool callback
+    # Opcjonalny proces roboczy IK ("ik_worker": 1) i tryb strumieniowania ("stream_mode": "legacy"/"buffered")
+    try:
+        with open("global_settings.json", "r") as f:
+            startup_settings = json.load(f)
+    except Exception:
+        startup_settings = {}
+    # Rdzeń ruchu (parol6) - planowanie, walidacja i strumieniowanie trajektorii; GUI jest jego klientem
+    robot = None
+    streamer = None
+    if Robot:
+        robot = Robot(communicator, stream_mode=startup_settings.get("stream_mode", "legacy"))
+        streamer = robot.streamer
     if CartesianView:
         views["CARTESIAN"] = CartesianView(
             urdf_path="resources/PAROL6.urdf",
             active_links_mask=[False, True, True, True, True, True, True, False],
             uart_communicator=communicator,
-            on_error=global_error_handler
+            on_error=global_error_handler,
+            use_ik_worker=bool(startup_settings.get("ik_worker", 0)),
+            streamer=streamer
         )
         views["CARTESIAN"].on_global_set_homed = global_set_homed  # Add callback
         views["CARTESIAN"].on_global_set_tool = global_set_tool    # Add tool callback
     if SettingsView:
         views["SETTINGS"] = SettingsView(uart_communicator=communicator)
+        # Jog ramp limits come from the drive VMAX/AMAX converted with the gear ratios
+        if "JOG" in views and views["JOG"]:
+            views["JOG"].set_gear_ratios(views["SETTINGS"].gear_ratios)
     if StatusView:
         views["STATUS"] = StatusView()
+        # Jitter / missed-deadline statistics of the jog and move loops
+        if get_setpoint_scheduler:
+            get_setpoint_scheduler().on_stats = views["STATUS"].update_loop_stats
 
     def handle_uart_data(data_string):
             """
@@ -490,6 +539,9 @@ def main(page: ft.Page):
             
             data_string = data_string.strip()
             if not data_string: return
+            # Core state (feedback, ESTOP, homing) and buffered streaming flow control (TB_*)
+            if robot and robot.handle_message(data_string):
+                return
             # ==========================================================
             # 0. OBSŁUGA ESTOP
             # ==========================================================
@@ -521,7 +573,7 @@ def main(page: ft.Page):
 
                 # 3. Pokaż czerwoną nakładkę ESTOP
                 estop_overlay.visible = True
-                page.update()
+                render.invalidate()
                 
                 # 4. Log E2 error for ESTOP
                 if "ERRORS" in views and views["ERRORS"]:
@@ -533,7 +585,7 @@ def main(page: ft.Page):
             if "ESTOP_RELEASE" in data_string or "ESTOP_OFF" in data_string:
                 print("[MAIN] ESTOP ZWOLNIONY - Ukrywam czerwony ekran")
                 estop_overlay.visible = False
-                page.update()
+                render.invalidate()
                 return
 
             # ==========================================================
@@ -740,37 +792,10 @@ def main(page: ft.Page):
             # 5. POZYCJE OSI (JOG & CARTESIAN - GLOBALNE)
             # ==========================================================
             if data_string.startswith("A_"):
-                try:
-                    content = data_string[2:]
-                    parts = [p for p in content.split('_') if p.strip()]
-                    
-                    if len(parts) == 6:
-                        joint_values = {
-                            "J1": float(parts[0]), "J2": float(parts[1]),
-                            "J3": float(parts[2]), "J4": float(parts[3]),
-                            "J5": float(parts[4]), "J6": float(parts[5])
-                        }
-
-                        if "JOG" in views and views["JOG"]:
-                            views["JOG"].update_joints_and_fk(joint_values)
-                        
-                        if "CARTESIAN" in views and views["CARTESIAN"]:
-                            if hasattr(views["CARTESIAN"], 'update_from_feedback'):
-                                views["CARTESIAN"].update_from_feedback(joint_values)
-
-                        if "SETTINGS" in views and views["SETTINGS"]:
-                            settings = views["SETTINGS"]
-                            idx = settings.selected_motor_index
-                            key = f"J{idx}"
-                            
-                            if key in joint_values:
-                                raw_val = joint_values[key]
-                                if key in ["J1", "J2", "J3", "J4", "J5"]:
-                                    settings.current_test_pos = -raw_val
-                                else:
-                                    settings.current_test_pos = raw_val
-
-                except: pass
+                # Pozycje są już w magazynie stanu (robot.handle_message); JOG odświeża tylko gdy jest widoczny
+                if "JOG" in views and views["JOG"]:
+                    try: views["JOG"].refresh_from_state()
+                    except Exception as e: print(f"[MAIN] Błąd odświeżania JOG: {e}")
                 return
 
             # ==========================================================
@@ -784,12 +809,10 @@ def main(page: ft.Page):
             # ==========================================================
             # 7. KODY BŁĘDÓW (E1, E2, W1, W2, IKE, COM, OOR1, CT1, EMM1, STL1, NRL1, etc.)
             # ==========================================================
-            import re
-            # Match all known error code patterns:
+            # Match all known error code patterns (parol6.protocol.ERROR_CODE_PATTERN):
             # E1-E5, W1-W2, OT1-OT4, CT1-CT4, EMM1-EMM6, IKE, OOR1-OOR6, COM, COL, OVL, GRE
             # NRL1-NRL6, SLW, HMS, CFG, GRW, SPD, STL1-STL6, HMD, CON, DIS, RDY, PRG
-            error_code_pattern = r'^(E\d+|W\d+|OT\d+|CT\d+|EMM\d+|OOR\d+|NRL\d+|STL\d+|IKE|COM|COL|OVL|GRE|SLW|HMS|CFG|GRW|SPD|HMD|CON|DIS|RDY|PRG)$'
-            error_code_match = re.match(error_code_pattern, data_string)
+            error_code_match = protocol and protocol.ERROR_CODE_PATTERN.match(data_string)
             if error_code_match:
                 if "ERRORS" in views and views["ERRORS"]:
                     views["ERRORS"].handle_error_code(data_string)
@@ -868,7 +891,11 @@ def main(page: ft.Page):
     # Aktualizacja logiki kliknięcia w przycisk
     # Musimy nadpisać change_mode_clicked aby obsłużyć reset WARNING
     
+    # Widok pokazany w frame_middle (gui.lifecycle: ukryty widok nie renderuje)
+    active_view = None
+
     def wrapped_change_mode_clicked(e):
+        nonlocal active_view
         mode_name = e.control.data
         
         # Jeśli wchodzimy w ERRORS i mamy WARNING -> Resetujemy do NONE
@@ -878,44 +905,20 @@ def main(page: ft.Page):
                 # Resetujemy stan wizualny, ale ErrorsView nadal ma historię
                 update_global_error_state("NONE")
         
-        # --- SYNC JOINTS WHEN SWITCHING BETWEEN JOG AND CARTESIAN ---
-        # Both views now use URDF-based kinematics - NO sign inversion needed!
-        import numpy as np
-        
-        if mode_name == "CARTESIAN" and "JOG" in views and views["JOG"] and "CARTESIAN" in views and views["CARTESIAN"]:
-            # Sync from JOG to CARTESIAN: direct conversion (degrees to radians)
-            # Only sync if JOG has valid data to avoid overwriting with zeros
-            if views["JOG"].initial_sync_done:
-                jog_joints = views["JOG"].internal_target_values
-                cartesian_joints = [np.radians(jog_joints.get(f"J{i+1}", 0.0)) for i in range(6)]
-                views["CARTESIAN"].commanded_joints = cartesian_joints
-            # print(f"[MAIN] Synced JOG -> CARTESIAN: {cartesian_joints}")
-            
-        elif mode_name == "JOG" and "CARTESIAN" in views and views["CARTESIAN"] and "JOG" in views and views["JOG"]:
-            # Sync from CARTESIAN to JOG: direct conversion (radians to degrees)
-            cartesian_joints = views["CARTESIAN"].commanded_joints
-            for i in range(6):
-                deg_val = np.degrees(cartesian_joints[i])
-                views["JOG"].internal_target_values[f"J{i+1}"] = deg_val
-                views["JOG"].current_raw_values[f"J{i+1}"] = deg_val  # Also update DISPLAY source!
-            views["JOG"].initial_sync_done = True  # Mark as synced
-            # Trigger display update
-            views["JOG"]._calculate_forward_kinematics()
-            if views["JOG"].page:
-                views["JOG"].page.update()
-            # print(f"[MAIN] Synced CARTESIAN -> JOG: {views['JOG'].internal_target_values}")
+        # Poprzedni widok: deactivate() (koniec odświeżania), nowy: activate() - nadrabia
+        # z ostatniej migawki magazynu stanu; wszystko idzie w jednym page.update() poniżej
+        view = views.get(mode_name)
+        switch_view(active_view, view)
+        active_view = view
         
         # Wywołanie oryginalnej logiki zmiany widoku
         # Skopiowana logika change_mode (prościej niż wywoływać funkcję z wrapper)
         # current_mode_text.value = mode_name
         
-        if mode_name in views:
-            frame_middle.content = views[mode_name]
+        if view:
+            frame_middle.content = view
         else:
             frame_middle.content = ft.Text(f"Brak widoku: {mode_name}", size=30, color="red")
-            
-        if mode_name == "SETTINGS" and "SETTINGS" in views:
-            views["SETTINGS"].reset_view()
         
         frame_middle.alignment = ft.alignment.center
         page.update()
@@ -957,29 +960,33 @@ def main(page: ft.Page):
 
     page.add(root_stack)
     
-    # --- Wątek zegara ---
-    def clock_updater():
-        while True:
-            now_time = time.strftime("%H:%M:%S")
-            now_date = time.strftime("%d.%m.%Y")
-            needs_update = False
-            
-            if clock_text.value != now_time:
-                clock_text.value = now_time
-                needs_update = True
-            if date_text.value != now_date:
-                date_text.value = now_date
-                needs_update = True
-            
-            if needs_update:
-                try:
-                    page.update()
-                except:
-                    pass 
-            time.sleep(1)
+    # --- Zegar (zadanie okresowe co 1 s) ---
+    def clock_tick(dt):
+        now_time = time.strftime("%H:%M:%S")
+        now_date = time.strftime("%d.%m.%Y")
+        needs_update = False
+        
+        if clock_text.value != now_time:
+            clock_text.value = now_time
+            needs_update = True
+        if date_text.value != now_date:
+            date_text.value = now_date
+            needs_update = True
+        
+        if needs_update:
+            render.invalidate(clock_text, date_text)
+
+    task_loop.call_every(1.0, clock_tick, name="clock")
+
+    # Czas wykonania zadań (zegar, odświeżanie widoków, jog, ruchy) i oszczędność aktualizacji UI - raport w logu
+    def report_tick(dt):
+        print(f"[TASKS] {task_loop.summary()}")
+        print(f"[RENDER] {render.summary()}")
 
-    t = threading.Thread(target=clock_updater, daemon=True)
-    t.start()
+    task_loop.call_every(TASK_REPORT_INTERVAL, report_tick, name="task report", delay=TASK_REPORT_INTERVAL)
+    if "STATUS" in views and views["STATUS"]:
+        task_loop.call_every(RENDER_STATS_INTERVAL, lambda dt: views["STATUS"].update_render_stats(render.stats()),
+                             name="render stats")
     
     # --- Inicjalizacja domyślnego widoku ---
     class MockControl:
@@ -987,7 +994,7 @@ def main(page: ft.Page):
     class MockEvent:
         control = MockControl()
     
-    change_mode_clicked(MockEvent())
+    wrapped_change_mode_clicked(MockEvent())
     # current_mode_text.value = "JOG"
     if "JOG" in views:
         frame_middle.content = views["JOG"]
@@ -0,0 +1,8 @@
+"""
+PAROL6 motion core: transport, protocol, kinematics, planning, validation and streaming.
+Independent of the Flet GUI (gui/ is a client of this package); see parol6.robot.
+"""
+from parol6.moves import PlanningError
+from parol6.program import Program, ProgramError
+from parol6.robot import Robot
+from parol6.state import RobotState, StateSnapshot, get_robot_state
@@ -0,0 +1,50 @@
+"""
+Headless command line:
+    python -m parol6 [--port PORT] movej J1 J2 J3 J4 J5 J6 [SPEED]
+    python -m parol6 [--port PORT] movel X Y Z [A B C] [--speed SPEED]
+    python -m parol6 [--port PORT] named NAME
+    python -m parol6 [--port PORT] program NAME
+    python -m parol6 [--port PORT] script NAME|FILE    robot script (parol6.script)
+Without --port the moves are planned and validated only (dry run).
+"""
+import argparse
+import sys
+from parol6 import PlanningError, ProgramError, Robot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="parol6")
+    parser.add_argument("--port", help="serial port of the controller (dry run if omitted)")
+    parser.add_argument("--speed", type=float, default=0.5)
+    parser.add_argument("--stream-mode", default="legacy", choices=("legacy", "buffered"))
+    parser.add_argument("command", choices=("movej", "movel", "named", "program", "script"))
+    parser.add_argument("args", nargs="*")
+    options = parser.parse_args(argv)
+
+    robot = Robot(stream_mode=options.stream_mode)
+    if options.port and not robot.connect(options.port):
+        return 1
+    try:
+        if options.command == "movej":
+            values = [float(v) for v in options.args]
+            done = robot.move_j(values[:6], speed=values[6] if len(values) > 6 else options.speed)
+        elif options.command == "movel":
+            values = [float(v) for v in options.args]
+            done = robot.move_l(values[:3], values[3:6] or None, speed=options.speed)
+        elif options.command == "named":
+            done = robot.move_named(options.args[0], speed=options.speed)
+        elif options.command == "script":
+            done = robot.run_script(options.args[0])
+        else:
+            done = robot.run_program(options.args[0])
+    except (PlanningError, ProgramError) as e:
+        print(f"[ROBOT] {e.code}: {e}")
+        return 2
+    finally:
+        robot.disconnect()
+    print(f"[ROBOT] {'Done' if done else 'Stopped'} at {[round(v, 2) for v in robot.joints]}")
+    return 0 if done else 3
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Batch IK for whole cartesian paths (MoveL / multi-waypoint).
+
+1. Warm starts: a coarse subset of the path (every few poses) is solved sequentially,
+   which gives a branch-consistent seed at every segment boundary.
+2. The path is split into segments solved in parallel in a process pool; each segment
+   walks its poses using the previous solution as the next seed.
+3. Stitching: if a segment starts with a jump away from the end of the previous one
+   (branch flip), it is re-solved in-process from that end.
+"""
+import multiprocessing as mp
+import os
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+MIN_POSES_PER_SEGMENT = 16
+COARSE_STEPS_PER_SEGMENT = 4
+BRANCH_JUMP_LIMIT = 0.5         # rad - bigger jump between neighbouring poses = branch change
+
+_worker_engine = None
+
+
+def _init_worker(urdf_path):
+    global _worker_engine
+    from parol6.kinematics import KinematicsEngine
+    _worker_engine = KinematicsEngine(urdf_path)
+
+
+def _solve_sequence(engine, positions, rotations, seed):
+    """Sequential warm-started IK. Returns (N, 6) joints and (N,) converged mask."""
+    n = len(positions)
+    joints = np.zeros((n, 6))
+    ok = np.zeros(n, dtype=bool)
+    q = np.asarray(seed, dtype=float)
+    for i in range(n):
+        try:
+            q_new = engine.inverse_kinematics(positions[i], rotations[i], q, use_cache=False)
+            ok[i] = engine._is_converged(q_new, positions[i], rotations[i])
+            q = q_new
+        except Exception as e:
+            print(f"[BATCH IK] Pose {i}: {e}")
+        joints[i] = q
+    return joints, ok
+
+
+def _solve_segment(tool, positions, rotations, seed):
+    if _worker_engine.current_tool != tool:
+        _worker_engine.set_tool(tool)
+    return _solve_sequence(_worker_engine, positions, rotations, seed)
+
+
+class BatchIKSolver:
+    def __init__(self, engine, max_workers=None):
+        self.engine = engine
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.engine.urdf_path,),
+            )
+        return self._pool
+
+    def solve_path(self, positions, rotations, seed, parallel=True):
+        """
+        positions: (N, 3) TCP positions [m], rotations: (N, 3, 3) TCP orientations
+        seed: joints [rad] of the robot at the start of the path
+        Returns (joints (N, 6), ok (N,) bool).
+        """
+        positions = np.asarray(positions, dtype=float)
+        rotations = np.asarray(rotations, dtype=float)
+        n = len(positions)
+        n_seg = min(self.max_workers, n // MIN_POSES_PER_SEGMENT)
+        if not parallel or n_seg < 2:
+            return _solve_sequence(self.engine, positions, rotations, seed)
+
+        bounds = np.linspace(0, n, n_seg + 1).astype(int)
+
+        # 1. Coarse sequential pass -> branch-consistent seeds at the segment boundaries
+        stride = max(1, (bounds[1] - bounds[0]) // COARSE_STEPS_PER_SEGMENT)
+        coarse_idx = sorted(set(range(0, n, stride)) | set(bounds[:-1].tolist()))
+        coarse, _ = _solve_sequence(self.engine, positions[coarse_idx], rotations[coarse_idx], seed)
+        coarse_by_idx = dict(zip(coarse_idx, coarse))
+        seeds = [coarse_by_idx[int(b)] for b in bounds[:-1]]
+
+        # 2. Segments in parallel
+        try:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_solve_segment, self.engine.current_tool,
+                            positions[a:b], rotations[a:b], seeds[k])
+                for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))
+            ]
+            results = [f.result() for f in futures]
+        except Exception as e:
+            print(f"[BATCH IK] Pool error, solving in-process: {e}")
+            return _solve_sequence(self.engine, positions, rotations, seed)
+
+        # 3. Stitch segments (branch continuity across boundaries)
+        joints = [results[0][0]]
+        ok = [results[0][1]]
+        for k in range(1, n_seg):
+            seg_joints, seg_ok = results[k]
+            prev_end = joints[-1][-1]
+            if np.max(np.abs(seg_joints[0] - prev_end)) > BRANCH_JUMP_LIMIT:
+                a, b = bounds[k], bounds[k + 1]
+                print(f"[BATCH IK] Branch flip at pose {a}, re-solving segment {k}")
+                seg_joints, seg_ok = _solve_sequence(self.engine, positions[a:b], rotations[a:b], prev_end)
+            joints.append(seg_joints)
+            ok.append(seg_ok)
+
+        return np.vstack(joints), np.concatenate(ok)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# ==============================================================================
+# SHARED SOLVER (ONE PER ENGINE)
+# ==============================================================================
+_shared_solvers = {}
+_shared_lock = threading.Lock()
+
+def get_batch_ik_solver(engine):
+    """Process-wide solver; the worker pool is started on the first parallel path."""
+    with _shared_lock:
+        solver = _shared_solvers.get(id(engine))
+        if solver is None:
+            solver = BatchIKSolver(engine)
+            _shared_solvers[id(engine)] = solver
+        return solver
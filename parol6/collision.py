@@ -0,0 +1,380 @@
+"""
+Self-collision checker on the link meshes.
+
+Every link mesh (PLY_FILES, STL fallback) is reduced once to its convex hull; around
+the hull two cheaper bounding volumes are kept, and the mesh surface itself is sampled
+every MESH_SAMPLE_STEP, giving a 4-level hierarchy per pair:
+
+    bounding sphere  ->  capsule (PCA axis)  ->  convex hull (separating facet planes)
+                     ->  mesh surface (samples of one link vs the voxel grid of the other)
+
+The hulls of concave links (L2, L4, ...) overlap long before the meshes do, so only the
+surface test reports a contact. Its voxel grid (SURFACE_VOXEL, link frame) marks every
+cell within margin + MESH_SAMPLE_STEP of the mesh surface, so a sample falling into a
+marked cell means the two surfaces are closer than about that distance.
+
+The tool is modelled as a cylinder hull from the flange to the TCP offset and is rebuilt
+when the engine tool changes. Pairs in the allowed-contact matrix (adjacent links and
+links already touching at the zero pose) are never tested.
+"""
+import os
+import threading
+import numpy as np
+from scipy.ndimage import binary_dilation
+from scipy.spatial import ConvexHull
+from parol6.meshes import load_mesh_cached
+
+LINK_NAMES = ["base_link", "L1", "L2", "L3", "L4", "L5", "L6", "TOOL"]
+
+# First existing file wins (PLY = decimated meshes, STL = URDF meshes)
+MESH_FILES = {
+    "base_link": ["PLY_FILES/base_link_p.ply", "PAROL6_URDF/PAROL6/meshes/base_link.STL"],
+    "L1": ["PLY_FILES/L1_p.ply", "PAROL6_URDF/PAROL6/meshes/L1.STL"],
+    "L2": ["PLY_FILES/L2_p.ply", "PAROL6_URDF/PAROL6/meshes/L2.STL"],
+    "L3": ["PLY_FILES/L3_p.ply", "PAROL6_URDF/PAROL6/meshes/L3.STL"],
+    "L4": ["PLY_FILES/L4_p.ply", "PAROL6_URDF/PAROL6/meshes/L4.STL"],
+    "L5": ["PLY_FILES/L5_p.ply", "PAROL6_URDF/PAROL6/meshes/L5.STL"],
+    "L6": ["PLY_FILES/L6_p.ply", "PAROL6_URDF/PAROL6/meshes/L6.STL"],
+}
+
+COLLISION_MARGIN = 0.002        # 2 mm safety margin on the hull test
+HULL_GRID = 0.004               # Vertices snapped to 4 mm before the hull (~5x fewer facets)
+TOOL_RADIUS = 0.030             # Tool cylinder radius [m]
+MESH_SAMPLE_STEP = 0.004        # Surface sample spacing of the exact test [m]
+SURFACE_VOXEL = 0.002           # Voxel size of the dilated surface grids [m]
+
+
+# ==============================================================================
+# MESH VERTICES
+# ==============================================================================
+def load_link_mesh(link_name):
+    """(vertices, faces) of a link, or (None, None)."""
+    for path in MESH_FILES.get(link_name, []):
+        if os.path.exists(path):
+            vertices, faces = load_mesh_cached(path)
+            return vertices.astype(float), faces
+    return None, None
+
+
+def load_link_vertices(link_name):
+    return load_link_mesh(link_name)[0]
+
+
+def sample_surface(vertices, faces, step=MESH_SAMPLE_STEP):
+    """Vertices plus points on every triangle, no point of the surface farther than ~step from one."""
+    tri = vertices[faces]
+    longest = np.max(np.linalg.norm(tri - np.roll(tri, 1, axis=1), axis=2), axis=1)
+    samples = [vertices]
+    splits = np.ceil(longest / step).astype(int)
+    for n in np.unique(splits[splits > 1]):
+        # Barycentric grid with n subdivisions per edge (corners are already vertices)
+        i, j = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="ij")
+        keep = i + j <= n
+        w = np.stack([i[keep], j[keep], n - i[keep] - j[keep]], axis=1) / n
+        w = w[np.max(w, axis=1) < 1.0]
+        samples.append(np.einsum("kc,tcd->tkd", w, tri[splits == n]).reshape(-1, 3))
+    # One sample per half-step cell (1-D keys: np.unique over rows is slow on ~1M points)
+    samples = np.vstack(samples)
+    cells = np.floor((samples - samples.min(axis=0)) / (0.5 * step)).astype(np.int64)
+    keys = (cells[:, 0] * (cells[:, 1].max() + 1) + cells[:, 1]) * (cells[:, 2].max() + 1) + cells[:, 2]
+    return samples[np.unique(keys, return_index=True)[1]]
+
+
+# ==============================================================================
+# BOUNDING VOLUMES
+# ==============================================================================
+class LinkHull:
+    """Convex hull of one link (link frame) + bounding sphere + capsule + surface samples."""
+
+    def __init__(self, name, points, surface=None, margin=COLLISION_MARGIN):
+        self.surface = np.asarray(points if surface is None else surface, dtype=float)
+        self._build_surface_grid(margin + MESH_SAMPLE_STEP)
+        points = np.unique(np.round(points / HULL_GRID) * HULL_GRID, axis=0)
+        hull = ConvexHull(points)
+        self.name = name
+        self.points = points[hull.vertices]
+        self.equations = hull.equations                # n . x + d <= 0 inside
+
+        self.center = 0.5 * (self.points.min(axis=0) + self.points.max(axis=0))
+        self.radius = float(np.max(np.linalg.norm(self.points - self.center, axis=1)))
+
+        # Capsule along the main axis of the hull points
+        mean = self.points.mean(axis=0)
+        _, _, vt = np.linalg.svd(self.points - mean, full_matrices=False)
+        axis = vt[0]
+        t = (self.points - mean) @ axis
+        radial = np.linalg.norm((self.points - mean) - np.outer(t, axis), axis=1)
+        self.capsule_radius = float(radial.max())
+        self.capsule = np.array([mean + axis * t.min(), mean + axis * t.max()])
+
+    def _build_surface_grid(self, reach):
+        # Cells holding a surface sample, dilated by reach (ball structuring element)
+        r = int(np.ceil(reach / SURFACE_VOXEL))
+        self.grid_origin = self.surface.min(axis=0) - (r + 1) * SURFACE_VOXEL
+        cells = np.floor((self.surface - self.grid_origin) / SURFACE_VOXEL).astype(int)
+        grid = np.zeros(cells.max(axis=0) + r + 2, dtype=bool)
+        grid[tuple(cells.T)] = True
+        k = np.arange(-r, r + 1)
+        ball = (k[:, None, None] ** 2 + k[None, :, None] ** 2 + k[None, None, :] ** 2) <= r * r
+        self.grid = binary_dilation(grid, structure=ball)
+
+    def touches(self, points, rot, trans):
+        """True when a point (rot @ p + trans in this link frame) lies in a marked surface cell."""
+        # Transform, shift and scale in one pass; negative cells wrap to huge unsigned values
+        cells = (points @ (rot.T / SURFACE_VOXEL) + (trans - self.grid_origin) / SURFACE_VOXEL).astype(np.intp)
+        cells = cells.view(np.uintp)
+        inside = (cells[:, 0] < self.grid.shape[0]) & (cells[:, 1] < self.grid.shape[1]) & \
+                 (cells[:, 2] < self.grid.shape[2])
+        cells = cells[inside]
+        return bool(np.any(self.grid[cells[:, 0], cells[:, 1], cells[:, 2]]))
+
+
+def _tool_points(translation, radius=TOOL_RADIUS, n=12, rings=2):
+    """Cylinder point cloud from the flange origin to the tool offset (flange frame)."""
+    a = np.zeros(3)
+    b = np.asarray(translation, dtype=float)
+    axis = b - a
+    length = np.linalg.norm(axis)
+    axis = axis / length if length > 1e-6 else np.array([0.0, 0.0, 1.0])
+    u = np.cross(axis, [1.0, 0.0, 0.0])
+    if np.linalg.norm(u) < 1e-6:
+        u = np.cross(axis, [0.0, 1.0, 0.0])
+    u /= np.linalg.norm(u)
+    v = np.cross(axis, u)
+    ang = np.linspace(0.0, 2 * np.pi, n, endpoint=False)
+    ring = radius * (np.outer(np.cos(ang), u) + np.outer(np.sin(ang), v))
+    return np.vstack([a + t * (b - a) + ring for t in np.linspace(0.0, 1.0, rings)])
+
+
+def _tool_surface(translation, radius=TOOL_RADIUS, step=MESH_SAMPLE_STEP):
+    """Tool cylinder mantle sampled every step (flange frame)."""
+    length = np.linalg.norm(translation)
+    n = max(12, int(np.ceil(2 * np.pi * radius / step)))
+    return _tool_points(translation, radius, n=n, rings=max(2, int(np.ceil(length / step)) + 1))
+
+
+def _segment_distances(p1, q1, p2, q2):
+    """Closest distances between segment batches p1-q1 and p2-q2, all (N, 3)."""
+    d1 = q1 - p1
+    d2 = q2 - p2
+    r = p1 - p2
+    a = np.einsum("ij,ij->i", d1, d1)
+    e = np.einsum("ij,ij->i", d2, d2)
+    f = np.einsum("ij,ij->i", d2, r)
+    c = np.einsum("ij,ij->i", d1, r)
+    b = np.einsum("ij,ij->i", d1, d2)
+    denom = a * e - b * b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(denom > 1e-12, np.clip((b * f - c * e) / denom, 0.0, 1.0), 0.0)
+        t = np.where(e > 1e-12, (b * s + f) / e, 0.0)
+        s = np.where(t < 0.0, np.where(a > 1e-12, np.clip(-c / a, 0.0, 1.0), 0.0), s)
+        s = np.where(t > 1.0, np.where(a > 1e-12, np.clip((b - c) / a, 0.0, 1.0), 0.0), s)
+    t = np.clip(t, 0.0, 1.0)
+    return np.linalg.norm((p1 + d1 * s[:, None]) - (p2 + d2 * t[:, None]), axis=1)
+
+
+# ==============================================================================
+# CHECKER
+# ==============================================================================
+class SelfCollisionChecker:
+    def __init__(self, engine, margin=COLLISION_MARGIN):
+        self.engine = engine
+        self.margin = margin
+        self.hulls = {}
+        for name in LINK_NAMES[:-1]:
+            try:
+                points, faces = load_link_mesh(name)
+                if points is not None:
+                    self.hulls[name] = LinkHull(name, points, sample_surface(points, faces), margin)
+            except Exception as e:
+                print(f"[COLLISION] Mesh error ({name}): {e}")
+        self._tool = None
+        self._update_tool_hull()
+
+        # Allowed-contact matrix: adjacent links always touch
+        n = len(LINK_NAMES)
+        self.allowed = np.eye(n, dtype=bool)
+        for i in range(n - 1):
+            self.allowed[i, i + 1] = self.allowed[i + 1, i] = True
+        idx = {name: i for i, name in enumerate(LINK_NAMES)}
+        self.allowed[idx["L5"], idx["TOOL"]] = self.allowed[idx["TOOL"], idx["L5"]] = True
+        self._build_pairs()
+        # ...and so do links that already touch at the zero pose
+        for a, b in self.colliding_pairs(np.zeros(6)):
+            self.allowed[idx[a], idx[b]] = self.allowed[idx[b], idx[a]] = True
+        self._build_pairs()
+        print(f"[COLLISION] Ready: {len(self.hulls)} links, {len(self._pairs)} checked pairs")
+
+    def _build_pairs(self):
+        self._pairs = [(i, j) for i in range(len(LINK_NAMES)) for j in range(i + 1, len(LINK_NAMES))
+                       if not self.allowed[i, j]]
+
+    def _update_tool_hull(self):
+        tool = self.engine.current_tool
+        if self._tool == tool:
+            return
+        self._tool = tool
+        self._surface = None
+        if np.linalg.norm(self.engine.tool_translation) > 1e-6:
+            self.hulls["TOOL"] = LinkHull("TOOL", _tool_points(self.engine.tool_translation),
+                                          _tool_surface(self.engine.tool_translation), self.margin)
+        else:
+            self.hulls.pop("TOOL", None)
+
+    def link_transforms(self, joints):
+        """World frame of every entry of LINK_NAMES for one configuration."""
+        frames = self.engine.link_frames_batch(np.asarray(joints, dtype=float))[0]
+        # Chain frame 0 = base, 1..6 = L1..L6; the tool hull lives in the flange frame
+        return np.concatenate([frames, frames[-1:]], axis=0)
+
+    def surface_points(self, joints):
+        """World coordinates of the hull vertices of all moving links (base excluded)."""
+        self._update_tool_hull()
+        if self._surface is None:
+            names = [n for n in LINK_NAMES[1:] if n in self.hulls]
+            points = np.vstack([self.hulls[n].points for n in names])
+            link_idx = np.concatenate([np.full(len(self.hulls[n].points), LINK_NAMES.index(n)) for n in names])
+            self._surface = (points, link_idx)
+        points, link_idx = self._surface
+        transforms = self.link_transforms(joints)
+        return np.einsum("nij,nj->ni", transforms[link_idx, :3, :3], points) + transforms[link_idx, :3, 3], link_idx
+
+    def colliding_pairs(self, joints):
+        """Returns [(link_a, link_b), ...] of link pairs whose meshes touch at the given joints [rad]."""
+        self._update_tool_hull()
+        transforms = self.link_transforms(joints)
+        pairs = [(i, j) for i, j in self._pairs if LINK_NAMES[i] in self.hulls and LINK_NAMES[j] in self.hulls]
+        if not pairs:
+            return []
+
+        ia = np.array([p[0] for p in pairs])
+        ib = np.array([p[1] for p in pairs])
+        ha = [self.hulls[LINK_NAMES[i]] for i in ia]
+        hb = [self.hulls[LINK_NAMES[j]] for j in ib]
+
+        def to_world(idx, pts):
+            return np.einsum("nij,nj->ni", transforms[idx, :3, :3], pts) + transforms[idx, :3, 3]
+
+        # Level 1: bounding spheres
+        ca = to_world(ia, np.array([h.center for h in ha]))
+        cb = to_world(ib, np.array([h.center for h in hb]))
+        ra = np.array([h.radius for h in ha])
+        rb = np.array([h.radius for h in hb])
+        near = np.linalg.norm(ca - cb, axis=1) <= ra + rb + self.margin
+
+        # Level 2: capsules
+        if np.any(near):
+            sel = np.nonzero(near)[0]
+            caps_a = np.array([ha[k].capsule for k in sel])
+            caps_b = np.array([hb[k].capsule for k in sel])
+            pa = to_world(ia[sel], caps_a[:, 0]); qa = to_world(ia[sel], caps_a[:, 1])
+            pb = to_world(ib[sel], caps_b[:, 0]); qb = to_world(ib[sel], caps_b[:, 1])
+            dist = _segment_distances(pa, qa, pb, qb)
+            limit = np.array([ha[k].capsule_radius + hb[k].capsule_radius for k in sel]) + self.margin
+            near[sel] = dist <= limit
+
+        # Levels 3 + 4: convex hulls, then the mesh surfaces
+        hits = []
+        for k in np.nonzero(near)[0]:
+            if self._hulls_intersect(ha[k], transforms[ia[k]], hb[k], transforms[ib[k]]):
+                hits.append((LINK_NAMES[ia[k]], LINK_NAMES[ib[k]]))
+        return hits
+
+    def in_collision(self, joints):
+        return len(self.colliding_pairs(joints)) > 0
+
+    def first_collision(self, joints, skip_pairs=()):
+        """
+        First sample of a (N, 6) joint path [rad] with two link meshes in contact.
+        Sphere and capsule levels run on all samples x pairs at once. Returns
+        (index, (link_a, link_b)) or (None, None). skip_pairs: name pairs to ignore.
+        """
+        self._update_tool_hull()
+        joints = np.atleast_2d(np.asarray(joints, dtype=float))
+        skip = {frozenset(p) for p in skip_pairs}
+        pairs = [(i, j) for i, j in self._pairs if LINK_NAMES[i] in self.hulls and LINK_NAMES[j] in self.hulls
+                 and frozenset((LINK_NAMES[i], LINK_NAMES[j])) not in skip]
+        if not pairs or not len(joints):
+            return None, None
+
+        frames = self.engine.link_frames_batch(joints)
+        transforms = np.concatenate([frames, frames[:, -1:]], axis=1)      # (N, links, 4, 4)
+        ia = np.array([p[0] for p in pairs])
+        ib = np.array([p[1] for p in pairs])
+        ha = [self.hulls[LINK_NAMES[i]] for i in ia]
+        hb = [self.hulls[LINK_NAMES[j]] for j in ib]
+
+        def to_world(idx, pts):
+            # idx (P,), pts (P, 3) -> (N, P, 3)
+            tf = transforms[:, idx]
+            return np.einsum("npij,pj->npi", tf[..., :3, :3], pts) + tf[..., :3, 3]
+
+        # Level 1: bounding spheres (N x P)
+        ca = to_world(ia, np.array([h.center for h in ha]))
+        cb = to_world(ib, np.array([h.center for h in hb]))
+        rr = np.array([h.radius + g.radius for h, g in zip(ha, hb)]) + self.margin
+        near = np.linalg.norm(ca - cb, axis=2) <= rr
+
+        # Level 2: capsules, only for the (sample, pair) entries still near
+        n_idx, k_idx = np.nonzero(near)
+        if len(n_idx):
+            caps_a = np.array([h.capsule for h in ha])
+            caps_b = np.array([h.capsule for h in hb])
+            tf_a = transforms[n_idx, ia[k_idx]]
+            tf_b = transforms[n_idx, ib[k_idx]]
+
+            def seg_world(tf, pts):
+                return np.einsum("mij,mj->mi", tf[:, :3, :3], pts) + tf[:, :3, 3]
+
+            dist = _segment_distances(seg_world(tf_a, caps_a[k_idx, 0]), seg_world(tf_a, caps_a[k_idx, 1]),
+                                      seg_world(tf_b, caps_b[k_idx, 0]), seg_world(tf_b, caps_b[k_idx, 1]))
+            radii = np.array([h.capsule_radius + g.capsule_radius for h, g in zip(ha, hb)]) + self.margin
+            keep = dist <= radii[k_idx]
+            n_idx, k_idx = n_idx[keep], k_idx[keep]
+
+        # Levels 3 + 4: hulls, then mesh surfaces, in sample order; stop at the first contact
+        for n, k in zip(n_idx, k_idx):
+            if self._hulls_intersect(ha[k], transforms[n, ia[k]], hb[k], transforms[n, ib[k]]):
+                return int(n), (LINK_NAMES[ia[k]], LINK_NAMES[ib[k]])
+        return None, None
+
+    def surface_points_batch(self, joints):
+        """(N, P, 3) hull vertices of all moving links for a (N, 6) joint path [rad]."""
+        self.surface_points(np.zeros(6))  # builds the vertex table for the current tool
+        points, link_idx = self._surface
+        frames = self.engine.link_frames_batch(np.atleast_2d(np.asarray(joints, dtype=float)))
+        transforms = np.concatenate([frames, frames[:, -1:]], axis=1)[:, link_idx]
+        return np.einsum("npij,pj->npi", transforms[..., :3, :3], points) + transforms[..., :3, 3]
+
+    def _hulls_intersect(self, hull_a, tf_a, hull_b, tf_b):
+        """Mesh contact of two links: separating hull facet (cheap reject), then the surface test."""
+        # Frame A expressed in frame B (rigid transforms: inverse = transpose)
+        rot = tf_b[:3, :3].T @ tf_a[:3, :3]
+        trans = tf_b[:3, :3].T @ (tf_a[:3, 3] - tf_b[:3, 3])
+        # A facet plane with the whole other hull beyond it (+ margin) separates the links
+        pts = hull_a.points @ rot.T + trans
+        if np.any(np.all(pts @ hull_b.equations[:, :3].T + hull_b.equations[:, 3] > self.margin, axis=0)):
+            return False
+        pts = (hull_b.points - trans) @ rot
+        if np.any(np.all(pts @ hull_a.equations[:, :3].T + hull_a.equations[:, 3] > self.margin, axis=0)):
+            return False
+        # Samples of the smaller link against the voxel grid of the larger one
+        if len(hull_a.surface) > len(hull_b.surface):
+            return hull_a.touches(hull_b.surface, rot.T, -rot.T @ trans)
+        return hull_b.touches(hull_a.surface, rot, trans)
+
+
+# ==============================================================================
+# SHARED CHECKER (ONE PER ENGINE)
+# ==============================================================================
+_shared_checkers = {}
+_shared_lock = threading.Lock()
+
+def get_collision_checker(engine):
+    """Process-wide checker for a (shared) KinematicsEngine; meshes are loaded once."""
+    with _shared_lock:
+        checker = _shared_checkers.get(id(engine))
+        if checker is None:
+            checker = SelfCollisionChecker(engine)
+            _shared_checkers[id(engine)] = checker
+        return checker
@@ -0,0 +1,178 @@
+"""
+Drive (TMC5160 ramp generator) units <-> joint units.
+
+The ramp parameters in motor_settings.json (slider set 1: A1, V1, AMAX, VMAX, D1) are
+raw register values:
+    v [usteps/s]   = V * fCLK / 2^24                      (V1, VMAX)
+    a [usteps/s^2] = A * fCLK^2 / (512 * 256) / 2^24      (A1, AMAX, D1; DMAX = AMAX)
+A joint turns 360 deg per FULL_STEPS * microsteps * gear_ratio microsteps.
+
+DriveModel converts whole arrays (N, 6) at once and estimates move times with the
+driver's own two-stage ramp (A1 up to V1, AMAX up to VMAX, then DMAX / D1 down).
+"""
+import json
+import os
+import threading
+import numpy as np
+
+DRIVER_FCLK = 12.0e6            # TMC5160 internal clock [Hz]
+FULL_STEPS = 200                # 1.8 deg stepper
+MICROSTEPS = 256
+MOTOR_SETTINGS_FILE = "motor_settings.json"
+RAMP_SET = "1"                  # Slider set with A1, V1, AMAX, VMAX, D1
+RAMP_KEYS = ("A1", "V1", "AMAX", "VMAX", "D1")
+
+# Motor revolutions per joint revolution (J1..J6)
+GEAR_RATIOS = {
+    1: 6.4, 2: 20.0, 3: 18.0952381,
+    4: 4.0, 5: 4.0, 6: 10.0
+}
+
+# Used when motor_settings.json is missing (same as the trajectory defaults)
+FALLBACK_VEL_DEG = np.full(6, 90.0)
+FALLBACK_ACC_DEG = np.full(6, 180.0)
+
+VEL_FACTOR = DRIVER_FCLK / 2 ** 24
+ACC_FACTOR = DRIVER_FCLK ** 2 / (512 * 256) / 2 ** 24
+
+
+def usteps_per_deg(gear_ratios=GEAR_RATIOS, microsteps=MICROSTEPS):
+    """(6,) motor microsteps per joint degree from {1: ratio, ..., 6: ratio}."""
+    gears = np.array([float(gear_ratios[i]) for i in range(1, 7)])
+    return FULL_STEPS * microsteps * gears / 360.0
+
+
+def vmax_to_deg_s(vmax, gear_ratios=GEAR_RATIOS, microsteps=MICROSTEPS):
+    return np.asarray(vmax, dtype=float) * VEL_FACTOR / usteps_per_deg(gear_ratios, microsteps)
+
+
+def amax_to_deg_s2(amax, gear_ratios=GEAR_RATIOS, microsteps=MICROSTEPS):
+    return np.asarray(amax, dtype=float) * ACC_FACTOR / usteps_per_deg(gear_ratios, microsteps)
+
+
+class DriveModel:
+    def __init__(self, gear_ratios=GEAR_RATIOS, path=MOTOR_SETTINGS_FILE, microsteps=MICROSTEPS):
+        self.gear_ratios = dict(gear_ratios)
+        self.path = path
+        self.microsteps = microsteps
+        self.registers = None       # (6, 5) A1, V1, AMAX, VMAX, D1
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Reads the ramp registers; joints without settings keep the fallback limits."""
+        with self._lock:
+            self._mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                self.registers = np.array([data[str(i)][RAMP_SET][:len(RAMP_KEYS)] for i in range(1, 7)],
+                                          dtype=float)
+            except Exception as e:
+                print(f"[DRIVES] Cannot read drive settings from {self.path}: {e}")
+                self.registers = None
+
+    def refresh(self):
+        """Reloads after motor_settings.json was saved (SettingsView)."""
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime != self._mtime:
+            self.load()
+
+    def set_gear_ratios(self, gear_ratios):
+        with self._lock:
+            self.gear_ratios = dict(gear_ratios)
+
+    # ================= UNIT CONVERSION (ARRAYS) =================
+
+    @property
+    def steps_per_deg(self):
+        return usteps_per_deg(self.gear_ratios, self.microsteps)
+
+    def deg_to_steps(self, joints_deg):
+        """Joint angles [deg] (..., 6) -> motor microsteps."""
+        return np.rint(np.asarray(joints_deg, dtype=float) * self.steps_per_deg).astype(np.int64)
+
+    def steps_to_deg(self, steps):
+        return np.asarray(steps, dtype=float) / self.steps_per_deg
+
+    def velocity_to_deg(self, registers):
+        """V1 / VMAX register values (..., 6) -> deg/s."""
+        return np.asarray(registers, dtype=float) * VEL_FACTOR / self.steps_per_deg
+
+    def acceleration_to_deg(self, registers):
+        """A1 / AMAX / D1 register values (..., 6) -> deg/s^2."""
+        return np.asarray(registers, dtype=float) * ACC_FACTOR / self.steps_per_deg
+
+    def deg_to_velocity(self, deg_s):
+        return np.rint(np.asarray(deg_s, dtype=float) * self.steps_per_deg / VEL_FACTOR).astype(np.int64)
+
+    def deg_to_acceleration(self, deg_s2):
+        return np.rint(np.asarray(deg_s2, dtype=float) * self.steps_per_deg / ACC_FACTOR).astype(np.int64)
+
+    # ================= JOINT LIMITS =================
+
+    def ramp(self):
+        """Ramp parameters in joint units: dict of (6,) arrays a1, v1, amax, vmax, d1 [deg]."""
+        self.refresh()
+        if self.registers is None:
+            return {"a1": FALLBACK_ACC_DEG.copy(), "v1": np.zeros(6), "amax": FALLBACK_ACC_DEG.copy(),
+                    "vmax": FALLBACK_VEL_DEG.copy(), "d1": FALLBACK_ACC_DEG.copy()}
+        a1, v1, amax, vmax, d1 = self.registers.T
+        vmax_deg = self.velocity_to_deg(vmax)
+        return {
+            "a1": self.acceleration_to_deg(a1),
+            "v1": np.minimum(self.velocity_to_deg(v1), vmax_deg),
+            "amax": self.acceleration_to_deg(amax),
+            "vmax": vmax_deg,
+            "d1": self.acceleration_to_deg(d1),
+        }
+
+    def joint_limits(self):
+        """(max velocity [deg/s], max acceleration [deg/s^2]) per joint; AMAX is the ramp ceiling."""
+        r = self.ramp()
+        return r["vmax"], r["amax"]
+
+    # ================= CYCLE TIME =================
+
+    def move_time(self, distance_deg):
+        """
+        Time [s] the drives need for joint distances (..., 6) [deg] with their own ramp
+        (rest to rest). The slowest joint of a row is the move time of a synchronized move.
+        """
+        r = self.ramp()
+        d = np.abs(np.asarray(distance_deg, dtype=float))
+        v1, a1, amax, vmax, d1 = r["v1"], r["a1"], r["amax"], r["vmax"], r["d1"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Distance of the A1/D1 stages up to V1, and of a full ramp up to VMAX
+            s_v1 = v1 ** 2 / (2.0 * a1) + v1 ** 2 / (2.0 * d1)
+            t_v1 = v1 / a1 + v1 / d1
+            s_full = s_v1 + (vmax ** 2 - v1 ** 2) / amax
+            t_full = t_v1 + 2.0 * (vmax - v1) / amax
+
+            cruise = t_full + (d - s_full) / vmax
+            vp = np.sqrt(v1 ** 2 + amax * np.maximum(d - s_v1, 0.0))
+            partial = t_v1 + 2.0 * (vp - v1) / amax
+            vp1 = np.sqrt(d / (1.0 / (2.0 * a1) + 1.0 / (2.0 * d1)))
+            short = vp1 / a1 + vp1 / d1
+        t = np.where(d >= s_full, cruise, np.where(d >= s_v1, partial, short))
+        return np.where(d > 0.0, t, 0.0)
+
+
+# ==============================================================================
+# SHARED MODEL
+# ==============================================================================
+_shared_model = None
+_shared_lock = threading.Lock()
+
+def get_drive_model():
+    global _shared_model
+    with _shared_lock:
+        if _shared_model is None:
+            _shared_model = DriveModel()
+        return _shared_model
+
+
+def load_joint_limits(gear_ratios, path=MOTOR_SETTINGS_FILE):
+    """Per-joint (max velocity [deg/s], max acceleration [deg/s^2]) from the drive settings."""
+    return DriveModel(gear_ratios, path).joint_limits()
@@ -0,0 +1,152 @@
+"""
+Kinematics worker process.
+
+Runs its own KinematicsEngine in a separate process so IK iterations do not
+compete for the GIL with Flet event handling, the UART reader and UI threads.
+Requests and responses go through one shared-memory slot (plain float64 arrays)
+signalled with two events - nothing is pickled per call.
+
+Slot layout (float64):
+    request : seq | tool index | seed flag | position[3] | rotation[9] | seed[6]
+    response: seq | ok flag    | joints[6]
+"""
+import multiprocessing as mp
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from parol6.kinematics import DEFAULT_URDF_PATH, ROBOT_TOOLS
+
+TOOL_NAMES = list(ROBOT_TOOLS.keys())
+
+_REQ_SIZE = 21
+_RESP_SIZE = 8
+
+
+def _worker_main(shm_name, urdf_path, request_event, response_event, stop_event):
+    from parol6.kinematics import KinematicsEngine
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((_REQ_SIZE + _RESP_SIZE,), dtype=np.float64, buffer=shm.buf)
+    req = slots[:_REQ_SIZE]
+    resp = slots[_REQ_SIZE:]
+
+    engine = KinematicsEngine(urdf_path)
+    response_event.set()  # ready
+
+    try:
+        while not stop_event.is_set():
+            if not request_event.wait(0.2):
+                continue
+            request_event.clear()
+
+            seq = req[0]
+            tool_idx = int(req[1])
+            if 0 <= tool_idx < len(TOOL_NAMES) and engine.current_tool != TOOL_NAMES[tool_idx]:
+                engine.set_tool(TOOL_NAMES[tool_idx])
+            # No seed flag: the engine picks its own initial guess (same as initial_guess=None)
+            seed = req[15:21].copy() if req[2] > 0.5 else None
+            try:
+                sol = engine.inverse_kinematics(req[3:6].copy(), req[6:15].reshape(3, 3).copy(), seed)
+                resp[2:8] = sol
+                resp[1] = 1.0
+            except Exception as e:
+                print(f"[IK WORKER] Error: {e}")
+                resp[1] = 0.0
+            resp[0] = seq
+            response_event.set()
+    finally:
+        del slots, req, resp
+        shm.close()
+
+
+class KinematicsWorker:
+    """
+    IK proxy with the same inverse_kinematics() signature as KinematicsEngine.
+    The active tool is taken from the local (shared) engine on every call, so
+    global_set_tool() needs no extra synchronization. Until the worker has loaded
+    its engine, or if it does not answer in time, the call falls back to the local
+    engine. close() stops the process and unlinks the shared memory.
+    """
+
+    def __init__(self, engine, urdf_path=DEFAULT_URDF_PATH, timeout=0.2):
+        self.engine = engine
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._seq = 0
+
+        ctx = mp.get_context("spawn")  # no fork of the threaded UI process
+        self._shm = shared_memory.SharedMemory(create=True, size=(_REQ_SIZE + _RESP_SIZE) * 8)
+        self._slots = np.ndarray((_REQ_SIZE + _RESP_SIZE,), dtype=np.float64, buffer=self._shm.buf)
+        self._slots[:] = 0.0
+        self._req = self._slots[:_REQ_SIZE]
+        self._resp = self._slots[_REQ_SIZE:]
+
+        self._request_event = ctx.Event()
+        self._response_event = ctx.Event()
+        self._stop_event = ctx.Event()
+        self._process = ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, urdf_path, self._request_event, self._response_event, self._stop_event),
+            daemon=True,
+        )
+        self.ready = False
+        self._process.start()
+        # Loading the URDF takes a while in the new process - wait for it off the UI thread
+        threading.Thread(target=self._wait_ready, name="ik-worker-start", daemon=True).start()
+
+    def _wait_ready(self, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            if self._response_event.wait(0.2):
+                self.ready = not self._stop_event.is_set()
+                print(f"[IK WORKER] Started (pid {self._process.pid})")
+                return
+        if not self._stop_event.is_set():
+            print(f"[IK WORKER] Not ready after {timeout:.0f} s - using in-process IK")
+
+    def is_alive(self):
+        return self.ready and self._process.is_alive()
+
+    def inverse_kinematics(self, target_position, target_orientation, initial_guess=None):
+        if not self.is_alive():
+            return self.engine.inverse_kinematics(target_position, target_orientation, initial_guess)
+
+        with self._lock:
+            if self._shm is None:  # closed meanwhile
+                return self.engine.inverse_kinematics(target_position, target_orientation, initial_guess)
+            self._seq += 1
+            tool = self.engine.current_tool
+            self._req[1] = TOOL_NAMES.index(tool) if tool in TOOL_NAMES else -1
+            self._req[2] = 0.0 if initial_guess is None else 1.0
+            self._req[3:6] = np.asarray(target_position, dtype=float)
+            self._req[6:15] = np.asarray(target_orientation, dtype=float).reshape(9)
+            if initial_guess is not None:
+                self._req[15:21] = np.resize(np.asarray(initial_guess, dtype=float), 6)
+            self._req[0] = self._seq
+
+            self._response_event.clear()
+            self._request_event.set()
+            if self._response_event.wait(self.timeout) and int(self._resp[0]) == self._seq:
+                if self._resp[1] > 0.5:
+                    return self._resp[2:8].copy()
+                raise RuntimeError("IK worker failed to solve")
+
+        print("[IK WORKER] Timeout - solving in-process")
+        return self.engine.inverse_kinematics(target_position, target_orientation, initial_guess)
+
+    def close(self):
+        """Stops the worker process and unlinks the shared memory (safe to call twice)."""
+        with self._lock:
+            if self._shm is None:
+                return
+            self.ready = False
+            self._stop_event.set()
+            self._process.join(timeout=1.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._req = self._resp = self._slots = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        print("[IK WORKER] Closed")
@@ -0,0 +1,518 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import warnings
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from ikpy.chain import Chain
+from ikpy.link import OriginLink, URDFLink
+from scipy.spatial.transform import Rotation as R
+from parol6.reachability import ReachabilityMap
+
+DEFAULT_URDF_PATH = "resources/PAROL6.urdf"
+
+# Parsed URDF model cache (link parameters + visual origins), keyed by URDF hash
+MODEL_CACHE_DIR = os.path.join("resources", "cache")
+
+# === TOOL DICTIONARY ===
+# UPDATED WITH USER OFFSET: Z(-90) -> RY(-180) -> X(-100)
+ROBOT_TOOLS = {
+    "CHWYTAK_MALY": {
+        "translation": [0.100, 0.0, -0.090],  # 100mm Forward (due to RY flip), 90mm down
+        "orientation": [0.0, -180.0, 0.0]
+    },
+    
+    "CHWYTAK_DUZY": {
+        "translation": [0.0, 0.0, -0.18831],  # Z: -188.31mm
+        "orientation": [0.0, -90.0, 0.0]       # Rotation around Y: -90 degrees
+    }
+}
+
+# === IK SOLUTION CACHE ===
+IK_CACHE_SIZE = 256             # Max number of cached poses (LRU)
+IK_CACHE_POS_STEP = 0.0001      # Position quantum: 0.1 mm
+IK_CACHE_ROT_STEP = 0.001       # Quaternion component quantum (~0.1 deg)
+IK_CACHE_POS_TOL = 0.001        # Only converged solutions (< 1 mm) are cached
+IK_CACHE_ROT_TOL = np.radians(1.0)
+
+def _axis_rotation_batch(axis, angles):
+    """(N, 4, 4) homogeneous rotations about a unit axis (Rodrigues)."""
+    k = np.array([[0.0, -axis[2], axis[1]], [axis[2], 0.0, -axis[0]], [-axis[1], axis[0], 0.0]])
+    s = np.sin(angles)[:, None, None]
+    c = np.cos(angles)[:, None, None]
+    out = np.broadcast_to(np.eye(4), (len(angles), 4, 4)).copy()
+    out[:, :3, :3] = np.eye(3) + s * k + (1.0 - c) * (k @ k)
+    return out
+
+# ==============================================================================
+# 0. URDF MODEL CACHE
+# ==============================================================================
+def _urdf_hash(urdf_path):
+    with open(urdf_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _model_cache_path(urdf_path):
+    return os.path.join(MODEL_CACHE_DIR, f"urdf_{_urdf_hash(urdf_path)[:16]}.json")
+
+def _load_model_cache(urdf_path):
+    try:
+        path = _model_cache_path(urdf_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[IK] Model cache read error: {e}")
+        return None
+
+def _save_model_cache(urdf_path, chain, visual_origins):
+    """
+    Stores link parameters instead of pickling the Chain
+    (ikpy links hold lambdified sympy matrices that cannot be pickled).
+    """
+    try:
+        links = []
+        for link in chain.links[1:]:
+            links.append({
+                "name": link.name,
+                "origin_translation": np.asarray(link.origin_translation, dtype=float).tolist(),
+                "origin_orientation": np.asarray(link.origin_orientation, dtype=float).tolist(),
+                "rotation": None if link.rotation is None else np.asarray(link.rotation, dtype=float).tolist(),
+                "bounds": [float(b) for b in link.bounds],
+                "joint_type": link.joint_type,
+            })
+        model = {"name": chain.name, "links": links, "visual_origins": visual_origins}
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        with open(_model_cache_path(urdf_path), "w") as f:
+            json.dump(model, f, indent=4)
+    except Exception as e:
+        print(f"[IK] Model cache write error: {e}")
+
+def _chain_from_model(model):
+    links = [OriginLink()]
+    for data in model["links"]:
+        links.append(URDFLink(
+            name=data["name"],
+            origin_translation=np.array(data["origin_translation"]),
+            origin_orientation=np.array(data["origin_orientation"]),
+            rotation=None if data["rotation"] is None else np.array(data["rotation"]),
+            bounds=tuple(data["bounds"]),
+            joint_type=data["joint_type"],
+        ))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return Chain(links, name=model.get("name", "chain"))
+
+# ==============================================================================
+# 1. KINEMATICS ENGINE (UPDATED FROM USER REQUEST)
+# ==============================================================================
+class KinematicsEngine:
+    def __init__(self, urdf_path, active_links_mask=None):
+        self.chain = None
+        self.urdf_path = urdf_path
+        self.n_active_joints = 6
+        self.visual_origins = {}
+        self.joint_limits_rad = [(-np.pi, np.pi)] * 6
+        
+        self.tool_translation = np.zeros(3) 
+        self.tool_rotation_matrix = np.eye(3) 
+        self.current_tool = "NONE"
+        
+        # Zero World Offset - using pure tool calibration instead
+        self.world_offset = np.array([0.0, 0.0, 0.0]) 
+
+        # IK cache (LRU): key = (tool, quantized TCP pose, solution branch)
+        # Shared by the GUI, jog and program threads: every access goes through _ik_cache_lock
+        self.ik_cache = OrderedDict()
+        self._ik_cache_lock = threading.Lock()
+        self.ik_cache_size = IK_CACHE_SIZE
+        self.ik_cache_stats = {"hits": 0, "misses": 0, "seeded": 0}
+
+        # Last display_pose() result: (joints bytes, tool) -> TCP [mm], Euler xyz [deg]
+        self._display_pose = None
+        self.display_pose_stats = {"hits": 0, "misses": 0}
+
+        # Batched FK model (per-link origin frames + joint axes) and reachability map
+        self._batch_origins = []
+        self._batch_axes = []
+        self.reachability = None
+
+        try:
+            # Parsed model from cache (keyed by URDF hash) - skips ikpy/ElementTree parsing
+            model = _load_model_cache(urdf_path)
+            if model:
+                print(f"[IK] Loading cached model: {urdf_path}")
+                self.chain = _chain_from_model(model)
+                self.visual_origins = {k: tuple(v) for k, v in model["visual_origins"].items()}
+            else:
+                print(f"[IK] Loading URDF: {urdf_path}")
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", UserWarning)
+                    self.chain = Chain.from_urdf_file(urdf_path)
+                self.visual_origins = self._load_visual_origins(urdf_path)
+                _save_model_cache(urdf_path, self.chain, self.visual_origins)
+            
+            # Automatyczna maska (fallback logic matching User's code)
+            mask = []
+            for link in self.chain.links:
+                if link.joint_type == 'fixed':
+                    mask.append(False)
+                else:
+                    mask.append(True)
+            
+            self.chain.active_links_mask = mask
+            self.active_links_mask = mask # Store strictly for reference if needed
+            
+            # === ZWIĘKSZONA PRECYZJA (ZOPTYMALIZOWANA DLA LINUX/RPI) ===
+            self.chain.max_iterations = 20
+            self.chain.convergence_limit = 1e-3
+            
+            self.joint_limits_rad = self._load_active_joint_limits()
+            self._build_batch_model()
+            
+            # Default to Small Gripper as per previous behavior/logic
+            self.set_tool("CHWYTAK_MALY")
+            
+            print(f"[IK] Ready. Mask: {mask}")
+
+        except Exception as e:
+            print(f"[IK ERROR] {e}")
+            self._setup_mock_chain()
+
+    def set_tool(self, tool_name):
+        if tool_name not in ROBOT_TOOLS:
+            print(f"[IK] Unknown tool: {tool_name}")
+            return
+
+        tool_data = ROBOT_TOOLS[tool_name]
+        self.tool_translation = np.array(tool_data["translation"])
+        rpy = tool_data.get("orientation", [0,0,0])
+        self.tool_rotation_matrix = R.from_euler('xyz', rpy, degrees=True).as_matrix()
+        
+        self.current_tool = tool_name
+        # Cached solutions are only valid for the tool they were solved with
+        self.clear_ik_cache()
+        self.reachability = ReachabilityMap.load(tool_name)
+        print(f"[IK] Tool Set: {tool_name} -> Offset: {self.tool_translation}")
+
+    def fork(self):
+        """
+        Private engine on the same (read-only) chain with its own tool and an empty IK cache.
+        For work such as script compilation that must not change the shared engine.
+        """
+        engine = copy.copy(self)
+        engine.ik_cache = OrderedDict()
+        engine._ik_cache_lock = threading.Lock()
+        engine.ik_cache_stats = {"hits": 0, "misses": 0, "seeded": 0}
+        engine._display_pose = None
+        engine.display_pose_stats = {"hits": 0, "misses": 0}
+        return engine
+
+    # ================= KINEMATYKA =================
+
+    def forward_kinematics(self, active_angles):
+        """Returns 4x4 TCP Matrix (including tool offset)."""
+        full_joints = self._active_to_full(active_angles)
+        flange_matrix = self.chain.forward_kinematics(full_joints)
+        
+        R_flange = flange_matrix[:3, :3]
+        P_flange = flange_matrix[:3, 3]
+        
+        # P_tcp = P_flange + (R_flange * Offset) + WorldOffset
+        offset_global = R_flange @ self.tool_translation
+        P_tcp = P_flange + offset_global + self.world_offset
+        
+        tcp_matrix = np.eye(4)
+        tcp_matrix[:3, 3] = P_tcp
+        tcp_matrix[:3, :3] = R_flange @ self.tool_rotation_matrix
+        
+        return tcp_matrix
+
+    def display_pose(self, active_angles):
+        """
+        TCP position [mm] and XYZ Euler angles [deg] as shown by the views (read-only arrays).
+        The last result is kept: the same joints and tool skip FK and the Euler conversion.
+        """
+        q = np.asarray(active_angles, dtype=float)
+        key = (q.tobytes(), self.current_tool)
+        cached = self._display_pose
+        if cached is not None and cached[0] == key:
+            self.display_pose_stats["hits"] += 1
+            return cached[1], cached[2]
+        self.display_pose_stats["misses"] += 1
+        tcp = self.forward_kinematics(q)
+        pos_mm = tcp[:3, 3] * 1000.0
+        euler = R.from_matrix(tcp[:3, :3]).as_euler('xyz', degrees=True)
+        pos_mm.flags.writeable = False
+        euler.flags.writeable = False
+        self._display_pose = (key, pos_mm, euler)
+        return pos_mm, euler
+
+    def link_frames_batch(self, joints):
+        """
+        Vectorized FK for many configurations at once.
+        joints: (N, 6) active joint angles [rad]
+        Returns (N, n_links, 4, 4) frames of every chain link (flange = last).
+        """
+        q = np.atleast_2d(np.asarray(joints, dtype=float))
+        n = q.shape[0]
+        frame = np.broadcast_to(np.eye(4), (n, 4, 4)).copy()
+        frames = np.empty((n, len(self._batch_origins), 4, 4))
+        curr = 0
+        for i, (origin, axis) in enumerate(zip(self._batch_origins, self._batch_axes)):
+            frame = frame @ origin
+            if axis is not None:
+                frame = frame @ _axis_rotation_batch(axis, q[:, curr])
+                curr += 1
+            frames[:, i] = frame
+        return frames
+
+    def forward_kinematics_batch(self, joints):
+        """Returns (N, 4, 4) TCP matrices (including tool offset) for (N, 6) joints."""
+        flange = self.link_frames_batch(joints)[:, -1]
+        tcp = np.empty_like(flange)
+        tcp[:] = np.eye(4)
+        tcp[:, :3, :3] = flange[:, :3, :3] @ self.tool_rotation_matrix
+        tcp[:, :3, 3] = flange[:, :3, 3] + flange[:, :3, :3] @ self.tool_translation + self.world_offset
+        return tcp
+
+    def is_reachable(self, position):
+        """
+        O(1) hint from the precomputed voxel map (True when no map is available). The map is
+        sampled, so an empty voxel may still be reachable: never use it instead of IK.
+        """
+        if self.reachability is None:
+            return True
+        return self.reachability.is_reachable(position)
+
+    def inverse_kinematics(self, target_position, target_orientation, initial_guess=None, use_cache=True):
+        """
+        Solves IK for a target TCP position and orientation.
+        target_position: [x, y, z] of TCP
+        target_orientation: 3x3 rotation matrix of TCP
+        initial_guess: seed joints; also selects the solution branch used as cache key.
+                       If None, the nearest cached solution is used as seed.
+        """
+        target_position = np.asarray(target_position, dtype=float)
+        target_orientation = np.asarray(target_orientation, dtype=float)
+
+        branch = self._solution_branch(initial_guess) if initial_guess is not None else None
+        key = self._ik_cache_key(target_position, target_orientation, branch) if use_cache else None
+
+        # 0. Cache lookup (taught points, SAFETY/STANDBY, repeated targets)
+        if key is not None:
+            with self._ik_cache_lock:
+                cached = self.ik_cache.get(key)
+                if cached is not None:
+                    self.ik_cache.move_to_end(key)
+                    self.ik_cache_stats["hits"] += 1
+                    return cached[2].copy()
+                self.ik_cache_stats["misses"] += 1
+
+        if initial_guess is None:
+            initial_guess = self._nearest_cached_seed(target_position, target_orientation)
+            if initial_guess is not None:
+                with self._ik_cache_lock:
+                    self.ik_cache_stats["seeded"] += 1
+            else:
+                initial_guess = np.zeros(6)
+        
+        # Revert World Offset before solving in URDF frame
+        target_raw = target_position - self.world_offset
+        
+        # 1. Determine Flange Orientation
+        # R_tcp = R_flange * R_tool  =>  R_flange = R_tcp * inv(R_tool)
+        target_rot_matrix = target_orientation 
+        flange_rot_matrix = target_rot_matrix @ np.linalg.inv(self.tool_rotation_matrix)
+        
+        # 2. Determine Flange Position
+        # P_tcp = P_flange + (R_flange * Offset)  =>  P_flange = P_tcp - (R_flange * Offset)
+        offset_global = flange_rot_matrix @ self.tool_translation
+        target_pos_flange = target_raw - offset_global
+        
+        full_guess = self._active_to_full(initial_guess)
+        
+        # 3. Solver IKPy
+        full_sol = self.chain.inverse_kinematics(
+            target_position=target_pos_flange,
+            target_orientation=flange_rot_matrix, 
+            orientation_mode='all', 
+            initial_position=full_guess
+        )
+        
+        solution = self._full_to_active(full_sol)
+
+        # 4. Store only converged solutions
+        if key is not None and self._is_converged(solution, target_position, target_orientation):
+            self._ik_cache_store(key, target_position, target_orientation, solution)
+
+        return solution
+
+    # ================= IK CACHE =================
+
+    def clear_ik_cache(self):
+        """Drops all cached IK solutions (statistics are kept)."""
+        with self._ik_cache_lock:
+            self.ik_cache.clear()
+
+    def ik_cache_info(self):
+        """Returns cache statistics: hits, misses, seeded, size, hit_rate."""
+        with self._ik_cache_lock:
+            hits = self.ik_cache_stats["hits"]
+            misses = self.ik_cache_stats["misses"]
+            seeded = self.ik_cache_stats["seeded"]
+            size = len(self.ik_cache)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "seeded": seeded,
+            "size": size,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def _solution_branch(self, joints):
+        # Elbow (J3) and wrist flip (J5) sign of the seed select the IK branch
+        arr = np.resize(np.array(joints, dtype=float).flatten(), 6)
+        return (bool(arr[2] >= 0.0), bool(arr[4] >= 0.0))
+
+    def _ik_cache_key(self, position, rotation, branch):
+        quat = R.from_matrix(rotation).as_quat()
+        if quat[3] < 0: quat = -quat  # q and -q are the same rotation
+        pos_q = tuple(np.round(position / IK_CACHE_POS_STEP).astype(int).tolist())
+        rot_q = tuple(np.round(quat / IK_CACHE_ROT_STEP).astype(int).tolist())
+        return (self.current_tool, pos_q, rot_q, branch)
+
+    def _ik_cache_store(self, key, position, rotation, solution):
+        entry = (position.copy(), rotation.copy(), np.array(solution, dtype=float))
+        with self._ik_cache_lock:
+            self.ik_cache[key] = entry
+            self.ik_cache.move_to_end(key)
+            while len(self.ik_cache) > self.ik_cache_size:
+                self.ik_cache.popitem(last=False)
+
+    def _nearest_cached_seed(self, position, rotation):
+        """Solution of the closest cached pose (position + weighted orientation distance)."""
+        with self._ik_cache_lock:
+            entries = list(self.ik_cache.values())
+        if not entries:
+            return None
+        positions = np.array([e[0] for e in entries])
+        rotations = np.array([e[1] for e in entries])
+        pos_dist = np.linalg.norm(positions - position, axis=1)
+        # cos(angle) from trace(R_a^T R_b); 0.1 m per radian weighting
+        cos_a = np.clip((np.einsum('nij,ij->n', rotations, rotation) - 1.0) / 2.0, -1.0, 1.0)
+        dist = pos_dist + 0.1 * np.arccos(cos_a)
+        return entries[int(np.argmin(dist))][2].copy()
+
+    def _is_converged(self, solution, target_position, target_orientation):
+        try:
+            tcp = self.forward_kinematics(solution)
+        except Exception:
+            return False
+        pos_err = np.linalg.norm(tcp[:3, 3] - target_position)
+        cos_a = np.clip((np.trace(tcp[:3, :3].T @ target_orientation) - 1.0) / 2.0, -1.0, 1.0)
+        return pos_err < IK_CACHE_POS_TOL and np.arccos(cos_a) < IK_CACHE_ROT_TOL
+
+    # ================= HELPERS (Updated to match User's logic) =================
+
+    def _active_to_full(self, active_joints):
+        arr = np.array(active_joints, dtype=float).flatten()
+        # Handle cases where input might be [0, J1, J2...] or just [J1, J2...]
+        if len(arr) == 7: arr = arr[1:] 
+        if len(arr) != 6: arr = np.resize(arr, 6)
+        
+        full = np.zeros(len(self.chain.links))
+        curr = 0
+        for i, act in enumerate(self.active_links_mask):
+            if act and curr < 6:
+                full[i] = arr[curr]
+                curr += 1
+        return full
+
+    def _full_to_active(self, full_vector):
+        if self.active_links_mask: return np.compress(self.active_links_mask, full_vector)
+        return np.zeros(6)
+    
+    def _load_active_joint_limits(self):
+        # Specific Parol6 limits
+        deg = [
+            (-90, 90),  # J1
+            (-50, 140), # J2
+            (-100, 70), # J3
+            (-100, 180),# J4
+            (-120, 110),# J5
+            (-110, 180) # J6
+        ]
+        return [(np.deg2rad(mn), np.deg2rad(mx)) for mn, mx in deg]
+
+    def ik_joint_bounds(self):
+        """(6, 2) joint bounds [rad] IK can return: joint_limits_rad within the URDF link bounds."""
+        limits = np.array(self.joint_limits_rad, dtype=float)
+        mask = getattr(self, "active_links_mask", None) or []
+        links = [link for link, active in zip(self.chain.links, mask) if active][:6]
+        for i, link in enumerate(links):
+            lo, hi = getattr(link, "bounds", (None, None)) or (None, None)
+            if lo is not None and np.isfinite(lo):
+                limits[i, 0] = max(limits[i, 0], lo)
+            if hi is not None and np.isfinite(hi):
+                limits[i, 1] = min(limits[i, 1], hi)
+        return limits
+
+    def _build_batch_model(self):
+        # Origin frame of each link (joint at 0) + rotation axis of active joints
+        self._batch_origins = []
+        self._batch_axes = []
+        for link, active in zip(self.chain.links, self.active_links_mask):
+            self._batch_origins.append(np.array(link.get_link_frame_matrix(0.0), dtype=float))
+            axis = getattr(link, 'rotation', None)
+            if active and axis is not None:
+                self._batch_axes.append(np.asarray(axis, dtype=float) / np.linalg.norm(axis))
+            else:
+                self._batch_axes.append(None)
+
+    def _load_visual_origins(self, urdf_path):
+        origins = {}
+        try:
+            tree = ET.parse(urdf_path); root = tree.getroot()
+            for link in root.findall('link'):
+                vis = link.find('visual')
+                if vis:
+                    o = vis.find('origin')
+                    if o is not None:
+                        xyz = [float(x) for x in o.attrib.get('xyz','0 0 0').split()]
+                        rpy = [float(r) for r in o.attrib.get('rpy','0 0 0').split()]
+                        origins[link.attrib.get('name')] = (xyz, rpy)
+        except: pass
+        return origins
+
+    def _setup_mock_chain(self):
+        self.chain = type('Mock', (object,), {
+            'links': [], 
+            'active_links_mask': [], 
+            'forward_kinematics': lambda *a, **k: np.eye(4), 
+            'inverse_kinematics': lambda *a, **k: np.zeros(8)
+        })()
+
+
+# ==============================================================================
+# 2. SHARED ENGINE (ONE PER PROCESS)
+# ==============================================================================
+_shared_engines = {}
+_shared_lock = threading.Lock()
+
+def get_kinematics_engine(urdf_path=DEFAULT_URDF_PATH):
+    """
+    Process-wide KinematicsEngine. All views share one chain, tool state and IK cache,
+    so the URDF is loaded once and set_tool() applies everywhere.
+    """
+    key = os.path.abspath(urdf_path)
+    with _shared_lock:
+        engine = _shared_engines.get(key)
+        if engine is None:
+            engine = KinematicsEngine(urdf_path)
+            _shared_engines[key] = engine
+        return engine
@@ -0,0 +1,146 @@
+"""
+Binary PLY / STL mesh loader.
+
+Files are memory-mapped and decoded with structured dtypes (no per-vertex Python loops).
+load_mesh_cached() additionally keeps a decimated, deduplicated copy as .npz in
+resources/cache, keyed by the SHA-256 of the source file, so repeated loads only
+read two small arrays.
+"""
+import hashlib
+import os
+import numpy as np
+
+MESH_CACHE_DIR = os.path.join("resources", "cache")
+DEFAULT_DECIMATION = 0.001      # Vertex clustering grid [m] (1 mm)
+
+_PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "<i2", "int16": "<i2", "ushort": "<u2", "uint16": "<u2",
+    "int": "<i4", "int32": "<i4", "uint": "<u4", "uint32": "<u4",
+    "float": "<f4", "float32": "<f4", "double": "<f8", "float64": "<f8",
+}
+
+_STL_FACET = np.dtype([("normal", "<f4", 3), ("v", "<f4", (3, 3)), ("attr", "<u2")])
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _parse_ply_header(data):
+    end = bytes(data[:4096]).index(b"end_header")
+    header = bytes(data[:end]).decode("ascii").splitlines()
+    offset = end + len(b"end_header")
+    offset += 2 if bytes(data[offset:offset + 2]) == b"\r\n" else 1
+
+    if "format binary_little_endian 1.0" not in header:
+        raise ValueError("Only binary_little_endian PLY files are supported")
+
+    elements = []
+    for line in header:
+        parts = line.split()
+        if parts[:1] == ["element"]:
+            elements.append({"name": parts[1], "count": int(parts[2]), "props": []})
+        elif parts[:1] == ["property"]:
+            elements[-1]["props"].append(parts[1:])
+    return elements, offset
+
+
+def load_ply(path):
+    """Returns (vertices (N, 3) float32, faces (M, 3) int32, colors (N, 4) uint8 or None)."""
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    elements, offset = _parse_ply_header(data)
+    vertices = faces = colors = None
+
+    for element in elements:
+        if element["name"] == "vertex":
+            dtype = np.dtype([(p[1], _PLY_TYPES[p[0]]) for p in element["props"]])
+            rec = np.frombuffer(data, dtype=dtype, count=element["count"], offset=offset)
+            vertices = np.stack([rec["x"], rec["y"], rec["z"]], axis=1).astype(np.float32)
+            if all(c in dtype.names for c in ("red", "green", "blue")):
+                alpha = rec["alpha"] if "alpha" in dtype.names else np.full(len(rec), 255, np.uint8)
+                colors = np.stack([rec["red"], rec["green"], rec["blue"], alpha], axis=1).astype(np.uint8)
+            offset += dtype.itemsize * element["count"]
+        elif element["name"] == "face":
+            # "property list <count type> <index type> vertex_indices" - triangles only
+            _, count_type, index_type, _ = element["props"][0]
+            dtype = np.dtype([("n", _PLY_TYPES[count_type]), ("v", _PLY_TYPES[index_type], 3)])
+            rec = np.frombuffer(data, dtype=dtype, count=element["count"], offset=offset)
+            if np.any(rec["n"] != 3):
+                raise ValueError(f"{path}: only triangle faces are supported")
+            faces = rec["v"].astype(np.int32)
+            offset += dtype.itemsize * element["count"]
+        else:
+            raise ValueError(f"{path}: unsupported PLY element '{element['name']}'")
+
+    return vertices, faces, colors
+
+
+def load_stl(path):
+    """Binary STL -> (vertices (N, 3) float32, faces (M, 3) int32), shared vertices merged."""
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    n_facets = int(np.frombuffer(data, dtype="<u4", count=1, offset=80)[0])
+    if 84 + n_facets * _STL_FACET.itemsize != len(data):
+        raise ValueError(f"{path}: not a binary STL")
+    facets = np.frombuffer(data, dtype=_STL_FACET, count=n_facets, offset=84)
+    corners = facets["v"].reshape(-1, 3)
+    vertices, inverse = np.unique(corners, axis=0, return_inverse=True)
+    return vertices.astype(np.float32), inverse.reshape(-1, 3).astype(np.int32)
+
+
+def load_mesh(path):
+    """Raw (vertices, faces) of a .ply or .stl file."""
+    if path.lower().endswith(".ply"):
+        vertices, faces, _ = load_ply(path)
+        return vertices, faces
+    return load_stl(path)
+
+
+def decimate_mesh(vertices, faces, grid=DEFAULT_DECIMATION):
+    """
+    Vertex clustering: vertices in the same grid cell are merged into their mean,
+    collapsed and duplicate triangles are dropped.
+    """
+    cells = np.floor(vertices / grid).astype(np.int64)
+    _, cluster, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.reshape(-1)
+    merged = np.zeros((len(counts), 3))
+    np.add.at(merged, cluster, vertices)
+    merged /= counts[:, None]
+
+    tri = cluster[faces]
+    keep = (tri[:, 0] != tri[:, 1]) & (tri[:, 1] != tri[:, 2]) & (tri[:, 0] != tri[:, 2])
+    tri = tri[keep]
+    # Same triangle regardless of winding start -> keep once
+    rolled = np.take_along_axis(tri, (np.argmin(tri, axis=1)[:, None] + np.arange(3)) % 3, axis=1)
+    _, first = np.unique(rolled, axis=0, return_index=True)
+    tri = tri[np.sort(first)]
+
+    # Drop vertices no longer referenced
+    used, remap = np.unique(tri, return_inverse=True)
+    return merged[used].astype(np.float32), remap.reshape(-1, 3).astype(np.int32)
+
+
+def load_mesh_cached(path, grid=DEFAULT_DECIMATION, cache_dir=MESH_CACHE_DIR):
+    """Decimated (vertices, faces); served from the .npz cache when the file is unchanged."""
+    digest = _file_hash(path)[:16]
+    cache_path = os.path.join(cache_dir, f"mesh_{digest}_{int(round(grid * 1e6))}um.npz")
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                return cached["vertices"], cached["faces"]
+        except Exception as e:
+            print(f"[MESH] Cache read error ({path}): {e}")
+
+    vertices, faces = load_mesh(path)
+    vertices, faces = decimate_mesh(vertices, faces, grid)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, vertices=vertices, faces=faces)
+    except Exception as e:
+        print(f"[MESH] Cache write error ({path}): {e}")
+    return vertices, faces
@@ -0,0 +1,119 @@
+"""
+Cartesian motion primitives.
+
+MoveL: straight TCP line, position interpolated linearly, orientation with SLERP.
+The path parameter follows a jerk-limited profile (TCP speed / acceleration limits),
+is sampled at the trajectory time step, solved with batch IK (branch continuity) and
+finally retimed to the joint velocity and acceleration limits. The result is a
+JointTrajectory that can be streamed sample by sample.
+
+MoveC: circular arc from the start pose through a via point to the end point, sampled
+with the same TCP speed profile (constant speed along the arc) and the same retiming.
+"""
+import numpy as np
+from scipy.spatial.transform import Rotation as R, Slerp
+from parol6.batch_ik import get_batch_ik_solver
+from parol6.trajectory import DEFAULT_DT, JOINT_MAX_VEL, MotionProfile, time_scale_path
+
+# TCP limits at 100 % speed
+TCP_MAX_SPEED = 0.050           # m/s (jog: 40 mm/s)
+TCP_MAX_ACC = 0.200             # m/s^2
+TCP_MAX_JERK = 1.000            # m/s^3
+TCP_MAX_ROT_SPEED = np.radians(30.0)
+TCP_MAX_ROT_ACC = np.radians(90.0)
+TCP_MAX_ROT_JERK = np.radians(450.0)
+
+
+class PlanningError(Exception):
+    """Move cannot be planned; 'code' is an ErrorsView code (IKE, OORn, COL, ...)."""
+
+    def __init__(self, code, message, index=None):
+        super().__init__(message)
+        self.code = code
+        self.index = index
+
+
+def _path_profile(length, angle, speed_scale):
+    """Profile of the path parameter s in [0, 1] limited by both TCP speed and rotation speed."""
+    scale = max(1e-3, float(speed_scale))
+    limits = []
+    if length > 1e-6:
+        limits.append(np.array([TCP_MAX_SPEED, TCP_MAX_ACC, TCP_MAX_JERK]) * scale / length)
+    if angle > 1e-6:
+        limits.append(np.array([TCP_MAX_ROT_SPEED, TCP_MAX_ROT_ACC, TCP_MAX_ROT_JERK]) * scale / angle)
+    if not limits:
+        return None
+    v, a, j = np.min(limits, axis=0)
+    return MotionProfile(1.0, v, a, j)
+
+
+def _solve_and_retime(engine, positions, rotations, start_joints, dt, max_vel, speed_scale):
+    joints, ok = get_batch_ik_solver(engine).solve_path(positions, rotations, start_joints)
+    if not np.all(ok):
+        index = int(np.argmin(ok))
+        raise PlanningError("IKE", f"IK failed at path sample {index}", index)
+    return time_scale_path(np.vstack([np.asarray(start_joints, dtype=float), joints]), dt, max_vel, speed_scale)
+
+
+def plan_move_l(engine, start_joints, target_position, target_rotation, speed_scale=1.0,
+                dt=DEFAULT_DT, max_vel=JOINT_MAX_VEL):
+    """
+    Straight-line move of the TCP from the FK pose of start_joints [rad]
+    to target_position [m] / target_rotation (3x3). Returns a JointTrajectory.
+    """
+    start = engine.forward_kinematics(start_joints)
+    p0, p1 = start[:3, 3], np.asarray(target_position, dtype=float)
+    r0, r1 = R.from_matrix(start[:3, :3]), R.from_matrix(np.asarray(target_rotation, dtype=float))
+
+    length = float(np.linalg.norm(p1 - p0))
+    angle = float((r0.inv() * r1).magnitude())
+    profile = _path_profile(length, angle, speed_scale)
+    if profile is None:
+        return time_scale_path(np.asarray(start_joints, dtype=float)[None, :], dt, max_vel, speed_scale)
+
+    n = int(np.ceil(profile.duration / dt)) + 1
+    s, _ = profile.sample(np.arange(1, n) * dt)
+    positions = p0 + s[:, None] * (p1 - p0)
+    rotations = Slerp([0.0, 1.0], R.concatenate([r0, r1]))(s).as_matrix()
+    return _solve_and_retime(engine, positions, rotations, start_joints, dt, max_vel, speed_scale)
+
+
+def _arc_geometry(p0, p1, p2):
+    """Center, radius, in-plane basis (e1, e2) and sweep angle of the arc p0 -> p1 -> p2."""
+    u, v = p1 - p0, p2 - p0
+    w = np.cross(u, v)
+    ww = float(w @ w)
+    if ww < 1e-12:
+        raise PlanningError("E3", "MoveC points are collinear or coincident")
+    center = p0 + (np.cross(v, w) * (u @ u) + np.cross(w, u) * (v @ v)) / (2.0 * ww)
+    radius = float(np.linalg.norm(p0 - center))
+    e1 = (p0 - center) / radius
+    e2 = np.cross(w / np.sqrt(ww), e1)
+    d = p2 - center
+    sweep = np.arctan2(d @ e2, d @ e1) % (2.0 * np.pi)
+    return center, radius, e1, e2, sweep
+
+
+def plan_move_c(engine, start_joints, via_position, target_position, target_rotation, speed_scale=1.0,
+                dt=DEFAULT_DT, max_vel=JOINT_MAX_VEL):
+    """
+    Circular move of the TCP from the FK pose of start_joints [rad] through via_position
+    to target_position [m]; orientation is SLERPed to target_rotation along the arc.
+    Returns a JointTrajectory.
+    """
+    start = engine.forward_kinematics(start_joints)
+    p0 = start[:3, 3]
+    p1 = np.asarray(via_position, dtype=float)
+    p2 = np.asarray(target_position, dtype=float)
+    r0, r1 = R.from_matrix(start[:3, :3]), R.from_matrix(np.asarray(target_rotation, dtype=float))
+
+    center, radius, e1, e2, sweep = _arc_geometry(p0, p1, p2)
+    angle = float((r0.inv() * r1).magnitude())
+    profile = _path_profile(radius * sweep, angle, speed_scale)
+
+    n = int(np.ceil(profile.duration / dt)) + 1
+    s, _ = profile.sample(np.arange(1, n) * dt)
+    phi = s * sweep
+    positions = center + radius * (np.outer(np.cos(phi), e1) + np.outer(np.sin(phi), e2))
+    rotations = Slerp([0.0, 1.0], R.concatenate([r0, r1]))(s).as_matrix()
+    return _solve_and_retime(engine, positions, rotations, start_joints, dt, max_vel, speed_scale)
@@ -0,0 +1,157 @@
+"""
+Cell obstacles (tables, fixtures, walls) as keep-out zones.
+
+Obstacles are read from cell_obstacles.json:
+    plane    : "point", "normal"                 (free side = along the normal)
+    box      : "center", "size" [m], "rpy" [deg]
+    cylinder : "center", "radius", "height", "rpy" [deg]  (axis = local Z)
+Set "enabled": false to keep an entry in the file without using it.
+
+Distances are signed distances from the hull vertices of all moving links (see
+SelfCollisionChecker.surface_points) to every obstacle, evaluated with NumPy over all
+points at once. Below slow_distance the motion is scaled down, below stop_distance it
+may only move away from the obstacle.
+"""
+import json
+import os
+import threading
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+from parol6.collision import get_collision_checker
+
+CELL_FILE = "cell_obstacles.json"
+DEFAULT_SLOW_DISTANCE = 0.050   # Start slowing down 50 mm before contact
+DEFAULT_STOP_DISTANCE = 0.010   # Hold 10 mm before contact
+MIN_SPEED_SCALE = 0.1
+
+
+def _sd_box(local, half):
+    q = np.abs(local) - half
+    return np.linalg.norm(np.maximum(q, 0.0), axis=1) + np.minimum(q.max(axis=1), 0.0)
+
+
+def _sd_cylinder(local, radius, half_height):
+    q = np.stack([np.linalg.norm(local[:, :2], axis=1) - radius, np.abs(local[:, 2]) - half_height], axis=1)
+    return np.linalg.norm(np.maximum(q, 0.0), axis=1) + np.minimum(q.max(axis=1), 0.0)
+
+
+class Obstacle:
+    def __init__(self, data):
+        self.name = data.get("name", data["type"])
+        self.type = data["type"]
+        self.center = np.asarray(data.get("center", data.get("point", [0.0, 0.0, 0.0])), dtype=float)
+        self.rotation = R.from_euler("xyz", data.get("rpy", [0.0, 0.0, 0.0]), degrees=True).as_matrix()
+        if self.type == "plane":
+            normal = np.asarray(data.get("normal", [0.0, 0.0, 1.0]), dtype=float)
+            self.normal = normal / np.linalg.norm(normal)
+        elif self.type == "box":
+            self.half = 0.5 * np.asarray(data["size"], dtype=float)
+        elif self.type == "cylinder":
+            self.radius = float(data["radius"])
+            self.half_height = 0.5 * float(data["height"])
+        else:
+            raise ValueError(f"Unknown obstacle type: {self.type}")
+
+    def signed_distance(self, points):
+        """(N,) signed distances [m] of world points (negative = inside)."""
+        if self.type == "plane":
+            return (points - self.center) @ self.normal
+        local = (points - self.center) @ self.rotation
+        if self.type == "box":
+            return _sd_box(local, self.half)
+        return _sd_cylinder(local, self.radius, self.half_height)
+
+
+class ObstacleModel:
+    def __init__(self, obstacles=None, slow_distance=DEFAULT_SLOW_DISTANCE, stop_distance=DEFAULT_STOP_DISTANCE):
+        self.obstacles = obstacles or []
+        self.slow_distance = slow_distance
+        self.stop_distance = stop_distance
+
+    @classmethod
+    def load(cls, path=CELL_FILE):
+        """Reads the cell file; an empty model is returned if it is missing or invalid."""
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            obstacles = [Obstacle(o) for o in data.get("obstacles", []) if o.get("enabled", True)]
+            model = cls(obstacles,
+                        data.get("slow_distance", DEFAULT_SLOW_DISTANCE),
+                        data.get("stop_distance", DEFAULT_STOP_DISTANCE))
+            print(f"[OBSTACLES] Loaded {len(obstacles)} obstacles from {path}")
+            return model
+        except Exception as e:
+            print(f"[OBSTACLES] Cell file error: {e}")
+            return cls()
+
+    def distance(self, points):
+        """Smallest signed distance of the points to any obstacle + obstacle name."""
+        if not self.obstacles:
+            return np.inf, None
+        best, name = np.inf, None
+        for obstacle in self.obstacles:
+            d = float(np.min(obstacle.signed_distance(points)))
+            if d < best:
+                best, name = d, obstacle.name
+        return best, name
+
+
+class ObstacleMonitor:
+    """Clearance of a robot configuration to the cell + jog/move speed policy."""
+
+    def __init__(self, checker, model):
+        self.checker = checker
+        self.model = model
+
+    @property
+    def active(self):
+        return bool(self.model.obstacles)
+
+    def reload(self, path=CELL_FILE):
+        self.model = ObstacleModel.load(path)
+
+    def clearance(self, joints):
+        """(distance [m], obstacle name) for joints [rad]; (inf, None) without obstacles."""
+        if not self.model.obstacles:
+            return np.inf, None
+        points, _ = self.checker.surface_points(joints)
+        return self.model.distance(points)
+
+    def clearance_batch(self, joints):
+        """(N,) smallest distance [m] and (N,) obstacle names for a (N, 6) joint path [rad]."""
+        joints = np.atleast_2d(np.asarray(joints, dtype=float))
+        if not self.model.obstacles:
+            return np.full(len(joints), np.inf), [None] * len(joints)
+        points = self.checker.surface_points_batch(joints)
+        flat = points.reshape(-1, 3)
+        d = np.stack([o.signed_distance(flat).reshape(points.shape[:2]).min(axis=1) for o in self.model.obstacles])
+        best = np.argmin(d, axis=0)
+        return d[best, np.arange(len(joints))], [self.model.obstacles[i].name for i in best]
+
+    def speed_scale(self, distance):
+        """1.0 when far away, linearly down to MIN_SPEED_SCALE at stop_distance."""
+        slow, stop = self.model.slow_distance, self.model.stop_distance
+        if distance >= slow:
+            return 1.0
+        return float(np.clip((distance - stop) / (slow - stop), MIN_SPEED_SCALE, 1.0))
+
+    def allows(self, current_distance, target_distance):
+        """A target inside the stop zone is only allowed if it increases the clearance."""
+        return target_distance >= self.model.stop_distance or target_distance > current_distance
+
+
+# ==============================================================================
+# SHARED MONITOR (ONE PER ENGINE)
+# ==============================================================================
+_shared_monitors = {}
+_shared_lock = threading.Lock()
+
+def get_obstacle_monitor(engine):
+    with _shared_lock:
+        monitor = _shared_monitors.get(id(engine))
+        if monitor is None:
+            monitor = ObstacleMonitor(get_collision_checker(engine), ObstacleModel.load())
+            _shared_monitors[id(engine)] = monitor
+        return monitor
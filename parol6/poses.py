@@ -0,0 +1,179 @@
+"""
+Named poses and named moves (named_poses.json) with a compiled trajectory cache.
+
+    "poses": {"SAFETY": [j1..j6 deg], ...}
+    "moves": {"SAFETY": {"pose": "SAFETY", "profile": "scurve", "speed": 1.0}, ...}
+
+A move is planned once per start region (start joints quantized to REGION_STEP), tool
+and speed, then reused. A start that is not exactly the cached one is absorbed by a
+correction that fades out along the path, so the robot still ends exactly on the pose.
+Every planned move is validated once (limits, workspace, collisions) before it is
+cached. Entries are dropped when the joint / drive limits, the tool or one of the
+settings files (named_poses.json, motor_settings.json, global_settings.json,
+cell_obstacles.json) change.
+"""
+import json
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from parol6 import trajectory
+from parol6.moves import PlanningError
+from parol6.obstacles import CELL_FILE
+from parol6.trajectory import JointTrajectory, plan_joint_move
+from parol6.validation import TrajectoryValidator
+
+POSES_FILE = "named_poses.json"
+SETTINGS_FILES = (POSES_FILE, "motor_settings.json", "global_settings.json", CELL_FILE)
+REGION_STEP = np.radians(2.0)   # Start joints within 2 deg share one cached plan
+MOVE_CACHE_SIZE = 64
+
+DEFAULT_POSES = {
+    "SAFETY": [0.0, -50.0, 70.0, 90.0, 0.0, 0.0],
+    "STANDBY": [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+}
+
+
+class NamedMoveLibrary:
+    def __init__(self, engine, path=POSES_FILE):
+        self.engine = engine
+        self.path = path
+        self.poses = {}
+        self.moves = {}
+        self.cache = OrderedDict()
+        self.cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._signature = None
+        self._lock = threading.Lock()
+        self.validator = TrajectoryValidator(engine)
+        self.load()
+
+    # ================= STORE =================
+
+    def load(self):
+        """Reads named_poses.json (created with SAFETY / STANDBY if missing)."""
+        data = {"poses": dict(DEFAULT_POSES), "moves": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"[POSES] Cannot read {self.path}: {e}")
+        else:
+            self._write(data)
+        self.poses = {name: [float(v) for v in joints] for name, joints in data.get("poses", {}).items()}
+        self.moves = {name: {"pose": name} for name in self.poses}
+        self.moves.update(data.get("moves", {}))
+
+    def _write(self, data):
+        try:
+            with open(self.path, "w") as f:
+                json.dump(data, f, indent=4)
+        except Exception as e:
+            print(f"[POSES] Cannot write {self.path}: {e}")
+
+    def save_pose(self, name, joints_deg):
+        self.poses[name] = [float(v) for v in joints_deg]
+        self.moves.setdefault(name, {"pose": name})
+        self._write({"poses": self.poses, "moves": self.moves})
+        self.invalidate("pose saved")
+
+    def pose(self, name):
+        """Pose joints [rad]."""
+        if name not in self.poses:
+            raise PlanningError("E3", f"Unknown pose: {name}")
+        return np.radians(self.poses[name])
+
+    # ================= TRAJECTORY CACHE =================
+
+    def _current_signature(self):
+        mtimes = tuple(os.path.getmtime(p) if os.path.exists(p) else 0.0 for p in SETTINGS_FILES)
+        limits = np.concatenate([np.ravel(self.engine.joint_limits_rad), trajectory.JOINT_MAX_VEL,
+                                 trajectory.JOINT_MAX_ACC, trajectory.JOINT_MAX_JERK])
+        return mtimes, limits.tobytes()
+
+    def invalidate(self, reason=None):
+        with self._lock:
+            if self.cache:
+                self.cache_stats["invalidations"] += 1
+                print(f"[POSES] Trajectory cache cleared ({reason or 'manual'}, {len(self.cache)} entries)")
+            self.cache.clear()
+
+    def _check_signature(self):
+        signature = self._current_signature()
+        if signature != self._signature:
+            if self._signature is not None and signature[0] != self._signature[0]:
+                self.load()
+            self.invalidate("limits or settings changed")
+            self._signature = signature
+
+    def _plan(self, name, start, speed_scale):
+        move = self.moves.get(name)
+        if move is None:
+            raise PlanningError("E3", f"Unknown move: {name}")
+        target = self.pose(move.get("pose", name))
+        for i, (q, (lo, hi)) in enumerate(zip(target, self.engine.joint_limits_rad)):
+            if not lo - 1e-6 <= q <= hi + 1e-6:
+                raise PlanningError(f"OOR{i + 1}", f"Pose '{name}' outside joint {i + 1} limits", i)
+        speed = speed_scale * float(move.get("speed", 1.0))
+        traj = plan_joint_move(start, target, speed_scale=speed, profile=move.get("profile", "scurve"))
+        violation = self.validator.validate(traj.q, traj.dt)
+        if violation:
+            raise PlanningError(violation.code, f"Move '{name}': {violation}", violation.index)
+        return traj
+
+    def trajectory(self, name, start_joints, speed_scale=1.0):
+        """JointTrajectory of the named move from start_joints [rad] (cached per start region)."""
+        start = np.asarray(start_joints, dtype=float)
+        self._check_signature()
+        region = tuple(np.round(start / REGION_STEP).astype(int).tolist())
+        key = (name, self.engine.current_tool, region, round(float(speed_scale), 2))
+
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+                self.cache_stats["hits"] += 1
+        if entry is None:
+            entry = self._plan(name, start, speed_scale)
+            with self._lock:
+                self.cache_stats["misses"] += 1
+            if len(entry) < 2:
+                return entry  # Already at the pose: nothing worth caching
+            with self._lock:
+                self.cache[key] = entry
+                while len(self.cache) > MOVE_CACHE_SIZE:
+                    self.cache.popitem(last=False)
+        return self._from_start(entry, start)
+
+    def _from_start(self, traj, start):
+        """Cached trajectory shifted to the actual start; the offset fades out with path progress."""
+        offset = start - traj.q[0]
+        if not np.any(offset):
+            return traj
+        step = np.linalg.norm(np.diff(traj.q, axis=0), axis=1)
+        length = np.concatenate([[0.0], np.cumsum(step)])
+        fade = 1.0 - length / length[-1] if length[-1] > 0 else np.linspace(1.0, 0.0, len(traj))
+        q = traj.q + fade[:, None] * offset
+        qd = np.gradient(q, traj.dt, axis=0) if len(q) > 1 else np.zeros_like(q)
+        return JointTrajectory(traj.t, q, qd, traj.dt)
+
+    def cache_info(self):
+        with self._lock:
+            hits, misses = self.cache_stats["hits"], self.cache_stats["misses"]
+            total = hits + misses
+            return dict(self.cache_stats, size=len(self.cache), hit_rate=hits / total if total else 0.0)
+
+
+# ==============================================================================
+# SHARED LIBRARY (ONE PER ENGINE)
+# ==============================================================================
+_shared_libraries = {}
+_shared_lock = threading.Lock()
+
+def get_move_library(engine):
+    with _shared_lock:
+        library = _shared_libraries.get(id(engine))
+        if library is None:
+            library = NamedMoveLibrary(engine)
+            _shared_libraries[id(engine)] = library
+        return library
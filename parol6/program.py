@@ -0,0 +1,207 @@
+"""
+Teach-and-playback programs.
+
+A program is a list of moves to taught waypoints (joints [rad] + TCP pose):
+    {"type": "MOVEJ" | "MOVEL", "joints": [...], "position": [...], "rotation": [[...]],
+     "speed": 0..1, "zone": m}
+
+The whole program is planned before execution (MoveJ: synchronized S-curve, MoveL:
+SLERP + batch IK). Segments are blended: once the TCP is inside the zone of a waypoint
+the next segment starts while the previous one is still decelerating (the joint
+displacements are superposed), so the robot flows through the point instead of
+stopping. The blended path is retimed to the joint velocity and acceleration limits.
+
+Programs are stored as JSON in programs/.
+"""
+import json
+import os
+import threading
+import numpy as np
+from parol6.drives import get_drive_model
+from parol6.moves import PlanningError, plan_move_l
+from parol6.trajectory import DEFAULT_DT, plan_joint_move, time_scale_path
+from parol6.validation import TrajectoryValidator
+
+PROGRAM_DIR = "programs"
+MOVE_TYPES = ("MOVEJ", "MOVEL")
+DEFAULT_ZONE = 0.010            # 10 mm blend zone
+
+
+class ProgramError(Exception):
+    """Invalid program or move that cannot be planned (reported as E3)."""
+
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.code = "E3"
+        self.index = index
+
+
+class Program:
+    def __init__(self, name="program", moves=None):
+        self.name = name
+        self.moves = moves or []
+
+    def __len__(self):
+        return len(self.moves)
+
+    def teach(self, engine, joints, move_type="MOVEJ", speed=0.5, zone=DEFAULT_ZONE):
+        """Appends a move to the current joints [rad] (TCP pose from FK)."""
+        if move_type not in MOVE_TYPES:
+            raise ProgramError(f"Unknown move type: {move_type}")
+        tcp = engine.forward_kinematics(joints)
+        self.moves.append({
+            "type": move_type,
+            "joints": [float(q) for q in joints],
+            "position": tcp[:3, 3].tolist(),
+            "rotation": tcp[:3, :3].tolist(),
+            "speed": float(speed),
+            "zone": float(zone),
+        })
+        return len(self.moves)
+
+    def clear(self):
+        self.moves = []
+
+    def save(self, directory=PROGRAM_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.json")
+        with open(path, "w") as f:
+            json.dump({"name": self.name, "moves": self.moves}, f, indent=4)
+        return path
+
+    @classmethod
+    def load(cls, name, directory=PROGRAM_DIR):
+        path = os.path.join(directory, f"{name}.json")
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception as e:
+            raise ProgramError(f"Cannot load program '{name}': {e}")
+        return cls(data.get("name", name), data.get("moves", []))
+
+
+# ==============================================================================
+# PLANNING
+# ==============================================================================
+def _plan_segment(engine, move, start, index, dt):
+    if move.get("type") not in MOVE_TYPES:
+        raise ProgramError(f"Move {index + 1}: unknown type {move.get('type')}", index)
+    if len(move.get("joints", [])) != 6:
+        raise ProgramError(f"Move {index + 1}: waypoint needs 6 joints", index)
+    speed = float(np.clip(move.get("speed", 0.5), 0.01, 1.0))
+    if move["type"] == "MOVEJ":
+        return plan_joint_move(start, move["joints"], speed_scale=speed, dt=dt)
+    try:
+        return plan_move_l(engine, start, move["position"], move["rotation"], speed_scale=speed, dt=dt)
+    except PlanningError as e:
+        raise ProgramError(f"Move {index + 1}: {e.code} {e}", index)
+
+
+def _blend_overlap(engine, segment, next_segment, zone):
+    """Samples of 'segment' (from its end) whose TCP lies inside the zone of its end point."""
+    if zone <= 0.0 or len(segment) < 3 or len(next_segment) < 3:
+        return 0
+    tcp = engine.forward_kinematics_batch(segment.q)[:, :3, 3]
+    inside = np.linalg.norm(tcp - tcp[-1], axis=1) <= zone
+    trailing = int(np.argmin(inside[::-1])) if not np.all(inside) else len(inside)
+    return max(0, min(trailing - 1, (len(segment) - 1) // 2, (len(next_segment) - 1) // 2))
+
+
+def estimate_cycle_time(program, start_joints):
+    """Quick cycle time [s] from the drive ramps (waypoint to waypoint, without blending)."""
+    if not program.moves:
+        return 0.0
+    joints = np.degrees(np.vstack([np.asarray(start_joints, dtype=float)] + [m["joints"] for m in program.moves]))
+    speeds = np.clip([m.get("speed", 0.5) for m in program.moves], 0.01, 1.0)
+    times = get_drive_model().move_time(np.diff(joints, axis=0)).max(axis=1)
+    return float(np.sum(times / speeds))
+
+
+def plan_program(engine, program, start_joints, dt=DEFAULT_DT):
+    """Plans and blends all moves of the program. Returns one JointTrajectory."""
+    if not program.moves:
+        raise ProgramError("Program is empty")
+
+    start = np.asarray(start_joints, dtype=float)
+    segments = []
+    q = start
+    for i, move in enumerate(program.moves):
+        segment = _plan_segment(engine, move, q, i, dt)
+        segments.append(segment)
+        q = segment.q[-1]
+
+    # Segment start samples on the common grid (overlapping inside blend zones)
+    offsets = [0]
+    for k in range(1, len(segments)):
+        overlap = _blend_overlap(engine, segments[k - 1], segments[k], program.moves[k - 1].get("zone", 0.0))
+        offsets.append(offsets[-1] + len(segments[k - 1]) - 1 - overlap)
+
+    n = offsets[-1] + len(segments[-1])
+    q = np.tile(start, (n, 1))
+    for offset, segment in zip(offsets, segments):
+        delta = segment.q - segment.q[0]
+        q[offset:offset + len(segment)] += delta
+        q[offset + len(segment):] += delta[-1]
+
+    return time_scale_path(q, dt)
+
+
+# ==============================================================================
+# PLAYBACK
+# ==============================================================================
+class ProgramRunner:
+    """
+    Plans the program, then hands the trajectory to a TrajectoryStreamer (J_ or buffered).
+    on_sample(q) follows the playback [rad]; keep_running() / check(q) can stop it early.
+    on_error gets "PRG" on completion, "E3" when planning fails and the validator code
+    (OORn, IKE, COL) when the planned trajectory is rejected before streaming.
+    """
+
+    def __init__(self, engine, streamer, on_sample=None, on_error=None):
+        self.engine = engine
+        self.streamer = streamer
+        self.on_sample = on_sample
+        self.on_error = on_error
+        self.validator = TrajectoryValidator(engine)
+        self.running = False
+        self._thread = None
+
+    def start(self, program, start_joints, keep_running=lambda: True, check=None, on_done=None):
+        if self.running:
+            return False
+        self.running = True
+        self._thread = threading.Thread(target=self._run, args=(program, start_joints, keep_running, check, on_done),
+                                        daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def _run(self, program, start_joints, keep_running, check, on_done):
+        completed = False
+        try:
+            trajectory = plan_program(self.engine, program, start_joints)
+            print(f"[PROGRAM] '{program.name}': {len(program)} moves, {trajectory.duration:.2f} s")
+            violation = self.validator.validate(trajectory.q, trajectory.dt)
+            if violation:
+                print(f"[PROGRAM] Rejected before execution: {violation}")
+                if self.on_error:
+                    self.on_error(violation.code)
+                return
+            completed = self.streamer.stream(trajectory, keep_running=lambda: self.running and keep_running(),
+                                             check=check, on_sample=self.on_sample)
+        except ProgramError as e:
+            print(f"[PROGRAM] Error: {e}")
+            if self.on_error:
+                self.on_error("E3")
+        except Exception as e:
+            print(f"[PROGRAM] Unexpected error: {e}")
+            if self.on_error:
+                self.on_error("E3")
+        finally:
+            self.running = False
+            if completed and self.on_error:
+                self.on_error("PRG")
+            if on_done:
+                on_done(completed)
@@ -0,0 +1,88 @@
+"""
+ASCII line protocol between the host and the PAROL6 controller.
+
+host -> ctrl : J_<j1>,...,<j6>        joint setpoint [deg], 2 decimals
+ctrl -> host : A_<j1>_..._<j6>        joint feedback [deg], as reported by the controller
+               ESTOP_TRIGGER / ESTOP_RELEASE / ESTOP_OFF
+               HOMING_COMPLETE_OK
+               ERROR_<text>           free-text error
+               E1, W2, OOR3, ...      error codes (see ERROR_CODE_PATTERN)
+               TB_*                   buffered streaming flow control (see parol6.streaming)
+"""
+import re
+import numpy as np
+
+JOINT_KEYS = ("J1", "J2", "J3", "J4", "J5", "J6")
+
+# E1-E5, W1-W2, OT1-OT4, CT1-CT4, EMM1-EMM6, IKE, OOR1-OOR6, COM, COL, OVL, GRE
+# NRL1-NRL6, SLW, HMS, CFG, GRW, SPD, STL1-STL6, HMD, CON, DIS, RDY, PRG
+ERROR_CODE_PATTERN = re.compile(
+    r'^(E\d+|W\d+|OT\d+|CT\d+|EMM\d+|OOR\d+|NRL\d+|STL\d+|IKE|COM|COL|OVL|GRE|SLW|HMS|CFG|GRW|SPD|HMD|CON|DIS|RDY|PRG)$')
+
+# Message kinds returned by classify()
+MSG_STREAM = "stream"
+MSG_ESTOP = "estop"
+MSG_ESTOP_RELEASE = "estop_release"
+MSG_HOMED = "homed"
+MSG_POSITION = "position"
+MSG_ERROR = "error"
+MSG_ERROR_CODE = "error_code"
+MSG_OTHER = "other"
+
+
+def format_joint_command(joints_rad):
+    """J_ setpoint line for joints [rad]."""
+    return "J_" + ",".join(f"{v:.2f}" for v in np.degrees(joints_rad))
+
+
+def parse_position(line):
+    """{"J1": deg, ..., "J6": deg} from an A_ feedback line, or None."""
+    if not line.startswith("A_"):
+        return None
+    try:
+        parts = [p for p in line[2:].split('_') if p.strip()]
+        if len(parts) != 6:
+            return None
+        return {key: float(v) for key, v in zip(JOINT_KEYS, parts)}
+    except ValueError:
+        return None
+
+
+def feedback_to_joints(joint_values):
+    """
+    Joints [rad] from parse_position() values, signs as reported. A per-joint sign
+    convention has not been checked on hardware; views that display feedback differently
+    (JOG inverts it) apply their own signs.
+    """
+    return np.radians([joint_values[k] for k in JOINT_KEYS])
+
+
+def classify(line):
+    """Kind of a controller line (MSG_*). Order matches the GUI dispatcher in main.py."""
+    if line.startswith("TB_"):
+        return MSG_STREAM
+    if "ESTOP_TRIGGER" in line:
+        return MSG_ESTOP
+    if "ESTOP_RELEASE" in line or "ESTOP_OFF" in line:
+        return MSG_ESTOP_RELEASE
+    if "HOMING_COMPLETE_OK" in line:
+        return MSG_HOMED
+    if line.startswith("A_"):
+        return MSG_POSITION
+    if line.startswith("ERROR_"):
+        return MSG_ERROR
+    if ERROR_CODE_PATTERN.match(line):
+        return MSG_ERROR_CODE
+    return MSG_OTHER
+
+
+# Tool selection and gripper commands (CHWYTAK_MALY = vacuum, CHWYTAK_DUZY = electric gripper)
+TOOL_COMMANDS = {"CHWYTAK_MALY": "TOOL_VAC", "CHWYTAK_DUZY": "TOOL_EGRIP"}
+ELECTRIC_GRIPPER_TOOLS = ("CHWYTAK_DUZY",)
+
+
+def grip_command(tool_name, close):
+    """EGRIP_CLOSE / EGRIP_OPEN for the electric gripper, VAC_ON / VAC_OFF otherwise."""
+    if tool_name in ELECTRIC_GRIPPER_TOOLS:
+        return "EGRIP_CLOSE" if close else "EGRIP_OPEN"
+    return "VAC_ON" if close else "VAC_OFF"
@@ -0,0 +1,143 @@
+"""
+Reachability voxel map.
+
+Offline: sample the joint space (within the bounds IK accepts, KinematicsEngine.ik_joint_bounds:
+the URDF link bounds clip the wider joint limits, e.g. J2 stops at ~57 deg), run batched FK
+and mark every voxel the TCP can reach, together with a bitmask of TCP Z-axis
+directions seen in that voxel (orientation coverage).
+Online: the .npy grid is opened with mmap, so every query is a single array lookup.
+Random sampling leaves holes, so the map is a hint only; IK has the final say.
+
+Generate (once per tool, after URDF/tool changes):
+    python -m parol6.reachability               # all tools
+    python -m parol6.reachability CHWYTAK_MALY  # single tool
+"""
+import json
+import os
+import numpy as np
+
+REACHABILITY_DIR = os.path.join("resources", "reachability")
+
+# Same box as WORKSPACE_LIMITS in CartesianView._jog_thread
+DEFAULT_BOUNDS = ((-0.700, 0.700), (-0.700, 0.700), (-0.300, 0.900))
+DEFAULT_VOXEL_SIZE = 0.02       # 20 mm
+N_DIRECTION_BINS = 32           # uint32 bitmask per voxel
+
+
+def _direction_bins(n=N_DIRECTION_BINS):
+    """Unit vectors spread evenly on the sphere (Fibonacci lattice)."""
+    i = np.arange(n) + 0.5
+    phi = np.arccos(1.0 - 2.0 * i / n)
+    theta = np.pi * (1.0 + 5 ** 0.5) * i
+    return np.stack([np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), np.cos(phi)], axis=1)
+
+
+def _map_paths(tool, directory):
+    base = os.path.join(directory, f"reach_{tool}")
+    return base + ".npy", base + ".json"
+
+
+class ReachabilityMap:
+    def __init__(self, grid, origin, voxel_size, tool="NONE"):
+        self.grid = grid
+        self.origin = np.asarray(origin, dtype=float)
+        self.voxel_size = float(voxel_size)
+        self.shape = np.array(grid.shape)
+        self.tool = tool
+        self.directions = _direction_bins()
+
+    @classmethod
+    def load(cls, tool, directory=REACHABILITY_DIR):
+        """Opens the map of a tool memory-mapped. Returns None if it was never generated."""
+        npy_path, meta_path = _map_paths(tool, directory)
+        if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            grid = np.load(npy_path, mmap_mode="r")
+            print(f"[REACH] Loaded map for {tool}: {grid.shape} voxels")
+            return cls(grid, meta["origin"], meta["voxel_size"], tool)
+        except Exception as e:
+            print(f"[REACH] Map load error ({tool}): {e}")
+            return None
+
+    def _index(self, position):
+        idx = np.floor((np.asarray(position, dtype=float) - self.origin) / self.voxel_size).astype(int)
+        if np.any(idx < 0) or np.any(idx >= self.shape):
+            return None
+        return tuple(idx)
+
+    def is_reachable(self, position):
+        idx = self._index(position)
+        return idx is not None and self.grid[idx] != 0
+
+    def covers(self, position, approach):
+        """True if the TCP Z axis can point along 'approach' inside this voxel."""
+        idx = self._index(position)
+        if idx is None:
+            return False
+        bin_idx = int(np.argmax(self.directions @ np.asarray(approach, dtype=float)))
+        return bool(int(self.grid[idx]) & (1 << bin_idx))
+
+
+def generate_reachability_map(engine, tool, samples=500000, batch=25000, voxel_size=DEFAULT_VOXEL_SIZE,
+                              bounds=DEFAULT_BOUNDS, directory=REACHABILITY_DIR, seed=0):
+    """
+    Samples the joint space with batched FK and writes reach_<tool>.npy + .json.
+    The engine tool is restored afterwards.
+    """
+    previous_tool = engine.current_tool
+    engine.set_tool(tool)
+    try:
+        lo = np.array([b[0] for b in bounds])
+        hi = np.array([b[1] for b in bounds])
+        shape = tuple(int(d) for d in np.ceil((hi - lo) / voxel_size))
+        grid = np.zeros(shape, dtype=np.uint32)
+        directions = _direction_bins()
+
+        limits = engine.ik_joint_bounds()
+        rng = np.random.default_rng(seed)
+
+        done = 0
+        while done < samples:
+            n = min(batch, samples - done)
+            q = rng.uniform(limits[:, 0], limits[:, 1], size=(n, 6))
+            tcp = engine.forward_kinematics_batch(q)
+            idx = np.floor((tcp[:, :3, 3] - lo) / voxel_size).astype(int)
+            inside = np.all((idx >= 0) & (idx < shape), axis=1)
+            idx = idx[inside]
+            bins = np.argmax(tcp[inside, :3, 2] @ directions.T, axis=1)
+            np.bitwise_or.at(grid, (idx[:, 0], idx[:, 1], idx[:, 2]), (1 << bins).astype(np.uint32))
+            done += n
+
+        # Close sampling holes: one voxel dilation along each axis
+        dilated = grid.copy()
+        for axis in range(3):
+            dilated[tuple(slice(1, None) if a == axis else slice(None) for a in range(3))] |= \
+                grid[tuple(slice(None, -1) if a == axis else slice(None) for a in range(3))]
+            dilated[tuple(slice(None, -1) if a == axis else slice(None) for a in range(3))] |= \
+                grid[tuple(slice(1, None) if a == axis else slice(None) for a in range(3))]
+
+        os.makedirs(directory, exist_ok=True)
+        npy_path, meta_path = _map_paths(tool, directory)
+        np.save(npy_path, dilated)
+        with open(meta_path, "w") as f:
+            json.dump({"tool": tool, "origin": lo.tolist(), "voxel_size": voxel_size,
+                       "shape": [int(d) for d in shape], "samples": samples, "urdf": engine.urdf_path}, f, indent=4)
+
+        reachable = int(np.count_nonzero(dilated))
+        print(f"[REACH] {tool}: {reachable}/{dilated.size} voxels reachable -> {npy_path}")
+        return npy_path
+    finally:
+        engine.set_tool(previous_tool)
+
+
+if __name__ == "__main__":
+    import sys
+    from parol6.kinematics import get_kinematics_engine, ROBOT_TOOLS
+
+    engine = get_kinematics_engine()
+    tools = sys.argv[1:] or list(ROBOT_TOOLS.keys())
+    for tool_name in tools:
+        generate_reachability_map(engine, tool_name)
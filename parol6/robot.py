@@ -0,0 +1,243 @@
+"""
+Headless robot API (no UI required).
+
+    from parol6 import Robot
+    robot = Robot()
+    robot.connect("/dev/ttyACM0")
+    robot.move_j([0, -50, 70, 90, 0, 0], speed=0.5)
+    robot.move_l([250, 0, 200], [180, 0, 0], speed=0.3)
+
+Every move is planned on the host, validated as a whole (limits, workspace, collisions)
+and then streamed with the TrajectoryStreamer (J_ or buffered). A move that cannot be
+planned or is rejected raises PlanningError / ProgramError; 'code' is the ErrorsView code.
+Joints are in degrees, positions in mm, orientations as XYZ Euler angles in degrees
+(the Cartesian view convention).
+"""
+import threading
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+from parol6 import protocol
+from parol6.kinematics import DEFAULT_URDF_PATH, get_kinematics_engine
+from parol6.moves import PlanningError, plan_move_c, plan_move_l
+from parol6.poses import get_move_library
+from parol6.program import Program, ProgramError, plan_program
+from parol6.script import compile_script, execute_script, load_script
+from parol6.state import get_robot_state
+from parol6.streaming import STREAM_LEGACY, TrajectoryStreamer
+from parol6.trajectory import plan_joint_move
+from parol6.validation import TrajectoryValidator
+
+
+class Robot:
+    def __init__(self, transport=None, urdf_path=DEFAULT_URDF_PATH, stream_mode=STREAM_LEGACY, on_error=None,
+                 state=None):
+        self.transport = transport
+        self.engine = get_kinematics_engine(urdf_path)
+        self.streamer = TrajectoryStreamer(transport, mode=stream_mode)
+        self.validator = TrajectoryValidator(self.engine)
+        # Process-wide state store unless one is given (the GUI views read the same one)
+        self.state = state or get_robot_state()
+        self.state.update(tool=self.engine.current_tool)
+        self.on_error = on_error
+        self._motion_thread = None
+        self.completed = False
+        self._motion_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ================= CONNECTION =================
+
+    def connect(self, port=None, baudrate=None):
+        """Opens the serial transport (pyserial is only needed here)."""
+        if self.transport is None:
+            from parol6.transport import UARTCommunicator
+            self.transport = UARTCommunicator()
+            self.streamer.uart = self.transport
+        if self.transport.on_data_received is None:
+            self.transport.on_data_received = self.handle_message
+        return self.transport.connect(port, baudrate)
+
+    def disconnect(self):
+        self.stop()
+        if self.transport:
+            self.transport.disconnect()
+
+    def is_connected(self):
+        return bool(self.transport and self.transport.is_open())
+
+    def send(self, message):
+        return bool(self.transport and self.transport.send_message(message))
+
+    # ================= CONTROLLER MESSAGES =================
+
+    def handle_message(self, line):
+        """
+        Updates the state from one controller line. Returns True when the line was consumed
+        (streaming flow control); other lines are left to the caller's dispatcher as well.
+        """
+        kind = protocol.classify(line)
+        if kind == protocol.MSG_STREAM:
+            return self.streamer.handle_message(line)
+        if kind == protocol.MSG_POSITION:
+            joints = protocol.parse_position(line)
+            if joints:
+                self.state.set_measured(protocol.feedback_to_joints(joints))
+        elif kind == protocol.MSG_ESTOP:
+            self.state.update(estop=True, homed=False)
+            self.stop()
+            self._report("E2")
+        elif kind == protocol.MSG_ESTOP_RELEASE:
+            self.state.update(estop=False)
+        elif kind == protocol.MSG_HOMED:
+            self.state.set_homed(True)
+        elif kind == protocol.MSG_ERROR_CODE:
+            self.state.add_alarm(line)
+        return False
+
+    def _report(self, code, detail=None):
+        if code != "PRG":
+            self.state.add_alarm(code)
+        if self.on_error:
+            try:
+                self.on_error(code, detail)
+            except Exception as e:
+                print(f"[ROBOT] Error callback failed: {e}")
+
+    # ================= STATE =================
+
+    @property
+    def joints(self):
+        """Current joint setpoint [deg]."""
+        return np.degrees(self.state.start_joints())
+
+    @property
+    def tcp(self):
+        """Current TCP position [mm] and XYZ Euler angles [deg]."""
+        position, euler = self.engine.display_pose(self.state.snapshot.commanded)
+        return position.copy(), euler.copy()
+
+    def set_tool(self, tool_name):
+        self.engine.set_tool(tool_name)
+        self.state.update(tool=self.engine.current_tool)
+
+    def is_moving(self):
+        return self._motion_thread is not None and self._motion_thread.is_alive()
+
+    # ================= MOTION =================
+
+    def _target_rotation(self, orientation_deg, start):
+        if orientation_deg is None:
+            return self.engine.forward_kinematics(start)[:3, :3]
+        return R.from_euler('xyz', orientation_deg, degrees=True).as_matrix()
+
+    def move_j(self, joints_deg, speed=0.5, wait=True, profile="scurve"):
+        """Synchronized joint move to joints_deg."""
+        start = self.state.start_joints()
+        traj = self._plan(plan_joint_move, start, np.radians(joints_deg), speed_scale=speed, profile=profile)
+        return self.execute(traj, wait)
+
+    def move_l(self, position_mm, orientation_deg=None, speed=0.5, wait=True):
+        """Straight TCP line; orientation_deg=None keeps the current orientation."""
+        start = self.state.start_joints()
+        traj = self._plan(plan_move_l, self.engine, start, np.asarray(position_mm, dtype=float) / 1000.0,
+                          self._target_rotation(orientation_deg, start), speed_scale=speed)
+        return self.execute(traj, wait)
+
+    def move_c(self, via_mm, position_mm, orientation_deg=None, speed=0.5, wait=True):
+        """Circular TCP move through via_mm to position_mm."""
+        start = self.state.start_joints()
+        traj = self._plan(plan_move_c, self.engine, start, np.asarray(via_mm, dtype=float) / 1000.0,
+                          np.asarray(position_mm, dtype=float) / 1000.0,
+                          self._target_rotation(orientation_deg, start), speed_scale=speed)
+        return self.execute(traj, wait)
+
+    def move_named(self, name, speed=1.0, wait=True):
+        """Named move from named_poses.json (cached trajectory)."""
+        traj = self._plan(get_move_library(self.engine).trajectory, name, self.state.start_joints(), speed)
+        return self.execute(traj, wait, validated=True)
+
+    def run_program(self, program, wait=True):
+        """Plans a Program (or the name of one in programs/) with blending and executes it."""
+        if isinstance(program, str):
+            program = Program.load(program)
+        traj = self._plan(plan_program, self.engine, program, self.state.start_joints())
+        print(f"[ROBOT] Program '{program.name}': {len(program)} moves, {traj.duration:.2f} s")
+        return self.execute(traj, wait)
+
+    def run_script(self, script, wait=True):
+        """
+        Compiles a robot script (source text, a path or the name of programs/<name>.p6,
+        see parol6.script) from the current joints and executes its instruction list.
+        """
+        source = script if "\n" in script else load_script(script)
+        compiled = self._plan(compile_script, self.engine, source, self.state.start_joints(),
+                              poses=get_move_library(self.engine).poses, validator=self.validator)
+        return self._start(self._run_script, compiled, wait)
+
+    def _plan(self, planner, *args, **kwargs):
+        try:
+            return planner(*args, **kwargs)
+        except (PlanningError, ProgramError) as e:
+            self._report(e.code, str(e))
+            raise
+
+    def execute(self, trajectory, wait=True, validated=False):
+        """
+        Validates and streams a JointTrajectory [rad]. wait=True blocks and returns True
+        when the whole trajectory was executed; wait=False returns the motion thread.
+        """
+        if not validated:
+            violation = self.validator.validate(trajectory.q, trajectory.dt)
+            if violation:
+                print(f"[ROBOT] Rejected before execution: {violation}")
+                self._report(violation.code, str(violation))
+                raise PlanningError(violation.code, str(violation), violation.index)
+        return self._start(self._stream, trajectory, wait)
+
+    def _start(self, target, motion, wait):
+        if self.state.snapshot.estop:
+            self._report("E2")
+            raise PlanningError("E2", "Emergency stop is active")
+        with self._motion_lock:
+            if self.is_moving():
+                raise PlanningError("E3", "Robot is already moving")
+            self._stop.clear()
+            self.completed = False
+            self._motion_thread = threading.Thread(target=self._run_motion, args=(target, motion), daemon=True)
+            self.state.update(moving=True)
+            self._motion_thread.start()
+        if not wait:
+            return self._motion_thread
+        return self.wait()
+
+    def _keep_running(self):
+        return not self._stop.is_set() and not self.state.snapshot.estop
+
+    def _run_motion(self, target, motion):
+        try:
+            self.completed = target(motion)
+        except Exception as e:
+            print(f"[ROBOT] Motion error: {e}")
+        finally:
+            self.state.update(moving=False)
+
+    def _stream(self, trajectory):
+        return self.streamer.stream(trajectory, keep_running=self._keep_running, on_sample=self.state.set_commanded)
+
+    def _run_script(self, compiled):
+        return execute_script(compiled, self.engine, self.streamer, self.send, keep_running=self._keep_running,
+                              on_sample=self.state.set_commanded, state=self.state)
+
+    def wait(self, timeout=None):
+        """Blocks until the current move ends. Returns True if it ran to completion."""
+        thread = self._motion_thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return False
+        return self.completed
+
+    def stop(self):
+        """Stops the current move at the last streamed setpoint."""
+        self._stop.set()
+        if self.is_moving():
+            self.streamer.abort()
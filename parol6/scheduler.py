@@ -0,0 +1,164 @@
+"""
+Drift-free setpoint scheduler for the jog and move loops.
+
+Every loop ticks on absolute deadlines (start + k * period, time.monotonic_ns), so a
+slow iteration does not shift the following ones. The thread sleeps until shortly
+before the deadline and spins the rest of the way for sub-millisecond wake-up.
+
+When an iteration overruns, the missed deadlines are counted and the loop continues at
+the next grid point (no burst of catch-up ticks); step(dt) then gets the real elapsed
+time, so velocities stay correct.
+
+run() blocks the calling thread. The GUI hands its jog / move loops to submit(): one
+long-lived motion thread per scheduler takes them from a queue, one after another, and
+never shares the thread with the UI work on the task loop (parol6.tasks).
+
+Rate: "loop_rate_hz" in global_settings.json (50..250 Hz).
+"""
+import json
+import queue
+import threading
+import time
+import numpy as np
+from parol6.timing import LoopTimingHistogram
+
+MIN_RATE_HZ = 50
+MAX_RATE_HZ = 250
+DEFAULT_RATE_HZ = 50
+SPIN_NS = 500_000               # Busy-wait the last 0.5 ms before a deadline
+STATS_INTERVAL_NS = 1_000_000_000
+
+
+class SetpointScheduler:
+    def __init__(self, rate_hz=DEFAULT_RATE_HZ, on_stats=None):
+        self.rate_hz = int(np.clip(rate_hz, MIN_RATE_HZ, MAX_RATE_HZ))
+        self.period_ns = 1_000_000_000 // self.rate_hz
+        self.period = self.period_ns / 1e9
+        self.on_stats = on_stats
+        self.timing = LoopTimingHistogram(self.period, bin_width=self.period / 4)
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.ticks = 0
+            self.missed = 0
+            self.overruns = 0
+            self._late_sum = 0.0
+            self._late_sq = 0.0
+            self.max_late_ms = 0.0
+
+    def _wait_until(self, deadline_ns):
+        remaining = deadline_ns - time.monotonic_ns()
+        if remaining > SPIN_NS:
+            time.sleep((remaining - SPIN_NS) / 1e9)
+        while time.monotonic_ns() < deadline_ns:
+            pass
+        return time.monotonic_ns()
+
+    def _record(self, late_ns, missed):
+        late_ms = late_ns / 1e6
+        with self._lock:
+            self.ticks += 1
+            self._late_sum += late_ms
+            self._late_sq += late_ms * late_ms
+            self.max_late_ms = max(self.max_late_ms, late_ms)
+            if missed:
+                self.overruns += 1
+                self.missed += missed
+
+    def run(self, step, keep_running=lambda: True):
+        """
+        Calls step(dt) once per tick until it returns False or keep_running() is False.
+        dt [s] is the time since the previous tick (a multiple of the period).
+        """
+        timing = LoopTimingHistogram(self.period, bin_width=self.period / 4)
+        self.timing = timing
+        deadline = time.monotonic_ns()
+        last_report = deadline
+        dt = self.period
+        missed = 0
+        while keep_running():
+            now = self._wait_until(deadline)
+            self._record(now - deadline, missed)
+            timing.tick(now / 1e9)
+            if step(dt) is False:
+                break
+
+            # Next deadline on the absolute grid; skip the ones already missed
+            deadline += self.period_ns
+            now = time.monotonic_ns()
+            missed = (now - deadline) // self.period_ns + 1 if now > deadline else 0
+            deadline += missed * self.period_ns
+            dt = (1 + missed) * self.period
+
+            if self.on_stats and now - last_report >= STATS_INTERVAL_NS:
+                last_report = now
+                self._report()
+        self._report()
+
+    def submit(self, job, *args):
+        """Queues job(*args) for the motion thread (started on first use); the job calls run()."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._motion_worker, name="parol6-motion", daemon=True)
+                self._thread.start()
+        self._jobs.put((job, args))
+
+    def _motion_worker(self):
+        while True:
+            job, args = self._jobs.get()
+            try:
+                job(*args)
+            except Exception as e:
+                print(f"[SCHEDULER] Motion job failed: {e}")
+
+    def _report(self):
+        if not self.on_stats:
+            return
+        try:
+            self.on_stats(self.stats())
+        except Exception as e:
+            print(f"[SCHEDULER] Stats callback error: {e}")
+
+    def stats(self):
+        with self._lock:
+            n = max(1, self.ticks)
+            mean = self._late_sum / n
+            jitter = np.sqrt(max(0.0, self._late_sq / n - mean * mean))
+            return {
+                "rate_hz": self.rate_hz,
+                "ticks": self.ticks,
+                "missed": self.missed,
+                "overruns": self.overruns,
+                "jitter_ms": float(jitter),
+                "max_late_ms": float(self.max_late_ms),
+            }
+
+    def summary(self):
+        s = self.stats()
+        return (f"{s['rate_hz']} Hz ticks={s['ticks']} missed={s['missed']} overruns={s['overruns']} "
+                f"jitter={s['jitter_ms']:.2f}ms max_late={s['max_late_ms']:.2f}ms | {self.timing.summary()}")
+
+
+# ==============================================================================
+# SHARED SCHEDULER
+# ==============================================================================
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+def get_setpoint_scheduler(settings_path="global_settings.json"):
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            rate = DEFAULT_RATE_HZ
+            try:
+                with open(settings_path, "r") as f:
+                    rate = json.load(f).get("loop_rate_hz", DEFAULT_RATE_HZ)
+            except Exception:
+                pass
+            _shared_scheduler = SetpointScheduler(rate)
+            print(f"[SCHEDULER] Setpoint loops at {_shared_scheduler.rate_hz} Hz")
+        return _shared_scheduler
@@ -0,0 +1,384 @@
+"""
+Robot script language (text files programs/<name>.p6).
+
+    # comment
+    SET TOOL CHWYTAK_MALY
+    SET SPEED 0.5                       speed (0..1) of the following moves
+    HOME = JOINTS 0 -50 70 90 0 0       joint point [deg]
+    PICK = POSE 250 0 150 180 0 0       TCP point: x y z [mm], A B C [deg] (XYZ Euler)
+    MOVEJ HOME
+    MOVEL PICK SPEED 0.2
+    MOVEJ SAFETY                        named pose from named_poses.json
+    MOVEL POSE 250 0 200 180 0 0        inline point
+    GRIP CLOSE                          CLOSE / OPEN (electric gripper or vacuum, by tool)
+    WAIT 0.5                            seconds
+    LOOP 3
+        MOVEL PICK
+    END
+
+A script is parsed and compiled once: loops are unrolled, every move is planned from
+the end of the previous one and validated (limits, workspace, collisions). Execution
+then only walks the instruction list (MOVE / WAIT / GRIP / TOOL).
+
+Syntax errors raise ScriptError with code E3 and the line number; moves that cannot be
+planned keep their own code (IKE, OORn, COL) and also carry the line.
+"""
+import copy
+import os
+import threading
+import time
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+from parol6 import protocol
+from parol6.kinematics import ROBOT_TOOLS
+from parol6.moves import PlanningError, plan_move_l
+from parol6.program import PROGRAM_DIR, ProgramError
+from parol6.state import get_robot_state
+from parol6.trajectory import DEFAULT_DT, plan_joint_move
+from parol6.validation import TrajectoryValidator
+
+SCRIPT_EXT = ".p6"
+DEFAULT_SPEED = 0.5
+MAX_LOOP_COUNT = 1000
+MAX_INSTRUCTIONS = 10000        # After loop unrolling
+WAIT_SLICE = 0.05               # WAIT checks keep_running() this often [s]
+
+MOVE_OPS = ("MOVEJ", "MOVEL")
+POINT_TYPES = ("JOINTS", "POSE")
+GRIP_ACTIONS = {"CLOSE": True, "ON": True, "OPEN": False, "OFF": False}
+KEYWORDS = MOVE_OPS + POINT_TYPES + ("WAIT", "GRIP", "SET", "LOOP", "END", "SPEED", "TOOL")
+
+
+class ScriptError(ProgramError):
+    """Script error at a source line; code is E3 for syntax errors."""
+
+    def __init__(self, message, line, code="E3"):
+        super().__init__(f"line {line}: {message}")
+        self.code = code
+        self.line = line
+
+
+class Instruction:
+    def __init__(self, op, line, trajectory=None, value=None):
+        self.op = op                    # MOVE, WAIT, GRIP, TOOL
+        self.line = line
+        self.trajectory = trajectory    # MOVE: validated JointTrajectory [rad]
+        self.value = value              # WAIT: seconds, GRIP: close flag, TOOL: tool name
+
+    def __repr__(self):
+        detail = f"{self.trajectory.duration:.2f}s" if self.trajectory is not None else self.value
+        return f"<{self.op} line {self.line}: {detail}>"
+
+
+class CompiledScript:
+    def __init__(self, name, instructions, end_joints):
+        self.name = name
+        self.instructions = instructions
+        self.end_joints = end_joints
+
+    def __len__(self):
+        return len(self.instructions)
+
+    @property
+    def duration(self):
+        return sum(i.trajectory.duration if i.op == "MOVE" else i.value
+                   for i in self.instructions if i.op in ("MOVE", "WAIT"))
+
+
+# ==============================================================================
+# PARSER
+# ==============================================================================
+def _numbers(tokens, count, line, what):
+    if len(tokens) < count:
+        raise ScriptError(f"{what} needs {count} values", line)
+    try:
+        return [float(v) for v in tokens[:count]]
+    except ValueError:
+        raise ScriptError(f"{what}: invalid number in {' '.join(tokens[:count])}", line)
+
+
+def _point(tokens, line):
+    """('JOINTS' | 'POSE', values) from tokens starting with the point type; returns (point, rest)."""
+    kind = tokens[0]
+    return (kind, np.array(_numbers(tokens[1:], 6, line, kind))), tokens[7:]
+
+
+def _speed(tokens, line):
+    if not tokens:
+        return None
+    if tokens[0] != "SPEED" or len(tokens) != 2:
+        raise ScriptError(f"unexpected '{' '.join(tokens)}'", line)
+    speed = _numbers(tokens[1:], 1, line, "SPEED")[0]
+    if not 0.0 < speed <= 1.0:
+        raise ScriptError("SPEED must be in (0, 1]", line)
+    return speed
+
+
+def parse_script(source, poses=None):
+    """
+    Statements of a script as nested lists of (line, op, args); LOOP carries its body.
+    poses: named poses {name: [deg]} usable as move targets.
+    """
+    poses = poses or {}
+    root = []
+    blocks = [(None, root)]
+    defined = set()
+    for line, raw in enumerate(source.splitlines(), 1):
+        tokens = raw.split("#", 1)[0].replace(",", " ").upper().split()
+        if not tokens:
+            continue
+        op = tokens[0]
+        body = blocks[-1][1]
+
+        if len(tokens) > 2 and tokens[1] == "=":
+            if not op.isidentifier() or op in KEYWORDS:
+                raise ScriptError(f"invalid variable name '{op}'", line)
+            if tokens[2] not in POINT_TYPES:
+                raise ScriptError("a variable needs JOINTS or POSE values", line)
+            point, rest = _point(tokens[2:], line)
+            if rest:
+                raise ScriptError(f"unexpected '{' '.join(rest)}'", line)
+            defined.add(op)
+            body.append((line, "LET", (op, point)))
+        elif op in MOVE_OPS:
+            if len(tokens) < 2:
+                raise ScriptError(f"{op} needs a target", line)
+            if tokens[1] in POINT_TYPES:
+                target, rest = _point(tokens[1:], line)
+            elif tokens[1] in defined:
+                target, rest = tokens[1], tokens[2:]
+            elif tokens[1] in poses:
+                target, rest = ("JOINTS", np.array(poses[tokens[1]], dtype=float)), tokens[2:]
+            else:
+                raise ScriptError(f"unknown point '{tokens[1]}'", line)
+            body.append((line, op, (target, _speed(rest, line))))
+        elif op == "WAIT":
+            seconds = _numbers(tokens[1:], 1, line, "WAIT")[0]
+            if len(tokens) != 2 or seconds < 0.0:
+                raise ScriptError("WAIT needs one time in seconds >= 0", line)
+            body.append((line, "WAIT", seconds))
+        elif op == "GRIP":
+            if len(tokens) != 2 or tokens[1] not in GRIP_ACTIONS:
+                raise ScriptError("GRIP needs OPEN or CLOSE", line)
+            body.append((line, "GRIP", GRIP_ACTIONS[tokens[1]]))
+        elif op == "SET":
+            if len(tokens) != 3 or tokens[1] not in ("TOOL", "SPEED"):
+                raise ScriptError("use SET TOOL <name> or SET SPEED <0..1>", line)
+            if tokens[1] == "TOOL":
+                if tokens[2] not in ROBOT_TOOLS:
+                    raise ScriptError(f"unknown tool '{tokens[2]}'", line)
+                body.append((line, "TOOL", tokens[2]))
+            else:
+                body.append((line, "SPEED", _speed(tokens[1:], line)))
+        elif op == "LOOP":
+            count = _numbers(tokens[1:], 1, line, "LOOP")[0]
+            if len(tokens) != 2 or count != int(count) or not 1 <= count <= MAX_LOOP_COUNT:
+                raise ScriptError(f"LOOP needs a count 1..{MAX_LOOP_COUNT}", line)
+            loop = []
+            body.append((line, "LOOP", (int(count), loop)))
+            blocks.append((line, loop))
+        elif op == "END":
+            if len(tokens) != 1 or len(blocks) == 1:
+                raise ScriptError("END without LOOP", line)
+            blocks.pop()
+        else:
+            raise ScriptError(f"unknown instruction '{op}'", line)
+
+    if len(blocks) > 1:
+        raise ScriptError("LOOP without END", blocks[-1][0])
+    return root
+
+
+# ==============================================================================
+# COMPILER
+# ==============================================================================
+class _Compiler:
+    def __init__(self, engine, validator, start_joints, dt):
+        self.engine = engine
+        self.validator = validator
+        self.dt = dt
+        self.q = np.asarray(start_joints, dtype=float)
+        self.speed = DEFAULT_SPEED
+        self.variables = {}
+        self.instructions = []
+        self.plans = {}     # Unrolled loops repeat the same moves from the same starts
+
+    def emit(self, instruction):
+        if len(self.instructions) >= MAX_INSTRUCTIONS:
+            raise ScriptError(f"more than {MAX_INSTRUCTIONS} instructions after LOOP expansion",
+                              instruction.line)
+        self.instructions.append(instruction)
+
+    def compile(self, statements):
+        for line, op, args in statements:
+            if op == "LET":
+                self.variables[args[0]] = args[1]
+            elif op == "SPEED":
+                self.speed = args
+            elif op == "TOOL":
+                if args != self.engine.current_tool:
+                    self.engine.set_tool(args)
+                self.emit(Instruction("TOOL", line, value=args))
+            elif op in ("WAIT", "GRIP"):
+                self.emit(Instruction(op, line, value=args))
+            elif op == "LOOP":
+                count, body = args
+                for _ in range(count):
+                    self.compile(body)
+            else:
+                self.emit(Instruction("MOVE", line, trajectory=self.move(line, op, *args)))
+
+    def _pose(self, point):
+        kind, values = point
+        if kind == "POSE":
+            return values[:3] / 1000.0, R.from_euler('xyz', values[3:], degrees=True).as_matrix()
+        tcp = self.engine.forward_kinematics(np.radians(values))
+        return tcp[:3, 3], tcp[:3, :3]
+
+    def _joints(self, point, line):
+        kind, values = point
+        if kind == "JOINTS":
+            return np.radians(values)
+        position, rotation = self._pose(point)
+        q = self.engine.inverse_kinematics(position, rotation, initial_guess=self.q)
+        if not self.engine._is_converged(q, position, rotation):
+            raise ScriptError(f"no IK solution for POSE {values.tolist()}", line, "IKE")
+        return q
+
+    def move(self, line, op, target, speed):
+        point = self.variables[target] if isinstance(target, str) else target
+        speed = speed or self.speed
+        key = (op, point[0], point[1].tobytes(), self.engine.current_tool, speed, np.round(self.q, 6).tobytes())
+        traj = self.plans.get(key)
+        if traj is None:
+            try:
+                if op == "MOVEJ":
+                    traj = plan_joint_move(self.q, self._joints(point, line), speed_scale=speed, dt=self.dt)
+                else:
+                    traj = plan_move_l(self.engine, self.q, *self._pose(point), speed_scale=speed, dt=self.dt)
+            except PlanningError as e:
+                raise ScriptError(str(e), line, e.code)
+            violation = self.validator.validate(traj.q, traj.dt)
+            if violation:
+                raise ScriptError(str(violation), line, violation.code)
+            self.plans[key] = traj
+        self.q = traj.q[-1]
+        return traj
+
+
+def compile_script(engine, source, start_joints, poses=None, name="script", dt=DEFAULT_DT, validator=None):
+    """Parses, plans and validates a script from start_joints [rad]. Returns a CompiledScript."""
+    statements = parse_script(source, poses)
+    # TOOL statements switch the tool of a private engine; the shared one changes only at run time
+    private = engine.fork()
+    if validator is None:
+        validator = TrajectoryValidator(private)
+    else:
+        # Workspace checks of the moves after a TOOL statement need that tool's offset
+        validator = copy.copy(validator)
+        validator.engine = private
+    compiler = _Compiler(private, validator, start_joints, dt)
+    compiler.compile(statements)
+    print(f"[SCRIPT] '{name}': {len(statements)} statements -> {len(compiler.instructions)} instructions, "
+          f"{len(compiler.plans)} planned moves")
+    return CompiledScript(name, compiler.instructions, compiler.q)
+
+
+def load_script(name, directory=PROGRAM_DIR):
+    """Source of programs/<name>.p6 (or of the path itself)."""
+    path = name if os.path.exists(name) else os.path.join(directory, name + SCRIPT_EXT)
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except Exception as e:
+        raise ProgramError(f"Cannot load script '{name}': {e}")
+
+
+# ==============================================================================
+# EXECUTION
+# ==============================================================================
+def execute_script(compiled, engine, streamer, send=None, keep_running=lambda: True, check=None, on_sample=None,
+                   state=None):
+    """Runs the instruction list. Returns True when every instruction was executed."""
+    for instruction in compiled.instructions:
+        if not keep_running():
+            return False
+        if instruction.op == "MOVE":
+            if not streamer.stream(instruction.trajectory, keep_running=keep_running, check=check,
+                                   on_sample=on_sample):
+                return False
+        elif instruction.op == "WAIT":
+            end = time.monotonic() + instruction.value
+            while time.monotonic() < end:
+                if not keep_running():
+                    return False
+                time.sleep(min(WAIT_SLICE, max(0.0, end - time.monotonic())))
+        elif instruction.op == "GRIP":
+            if send:
+                send(protocol.grip_command(engine.current_tool, instruction.value))
+        elif instruction.op == "TOOL":
+            engine.set_tool(instruction.value)
+            if state:
+                state.update(tool=engine.current_tool)
+            if send and instruction.value in protocol.TOOL_COMMANDS:
+                send(protocol.TOOL_COMMANDS[instruction.value])
+    return True
+
+
+class ScriptRunner:
+    """
+    Compiles and runs a script in a background thread (same callbacks as ProgramRunner).
+    on_error(code, detail) gets "E3" with the line for syntax errors, the planning code
+    (IKE, OORn, COL) for rejected moves and "PRG" on completion.
+    """
+
+    def __init__(self, engine, streamer, send=None, library=None, on_sample=None, on_error=None):
+        self.engine = engine
+        self.streamer = streamer
+        self.send = send
+        self.library = library          # NamedMoveLibrary: its poses are valid move targets
+        self.on_sample = on_sample
+        self.on_error = on_error
+        self.validator = TrajectoryValidator(engine)
+        self.running = False
+        self._thread = None
+
+    def start(self, source, start_joints, name="script", keep_running=lambda: True, check=None, on_done=None):
+        if self.running:
+            return False
+        self.running = True
+        self._thread = threading.Thread(target=self._run,
+                                        args=(source, start_joints, name, keep_running, check, on_done),
+                                        daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def _report(self, code, detail=None):
+        if self.on_error:
+            self.on_error(code, detail)
+
+    def _run(self, source, start_joints, name, keep_running, check, on_done):
+        completed = False
+        try:
+            poses = self.library.poses if self.library else None
+            compiled = compile_script(self.engine, source, start_joints, poses=poses, name=name,
+                                      validator=self.validator)
+            print(f"[SCRIPT] '{name}': {compiled.duration:.2f} s")
+            completed = execute_script(compiled, self.engine, self.streamer, self.send,
+                                       keep_running=lambda: self.running and keep_running(),
+                                       check=check, on_sample=self.on_sample, state=get_robot_state())
+        except ProgramError as e:
+            print(f"[SCRIPT] {e.code}: {e}")
+            self._report(e.code, str(e))
+        except Exception as e:
+            print(f"[SCRIPT] Unexpected error: {e}")
+            self._report("E3", str(e))
+        finally:
+            self.running = False
+            if completed:
+                self._report("PRG")
+            if on_done:
+                on_done(completed)
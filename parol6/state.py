@@ -0,0 +1,181 @@
+"""
+Authoritative robot state, published as immutable versioned snapshots.
+
+Writers (UART reader, motion threads, views) call the update methods: each builds a new
+StateSnapshot under the writer lock and swaps a single reference. Readers on any thread
+take `state.snapshot` (one attribute read) and get a consistent view without locking;
+the joint arrays of a snapshot are read-only.
+
+Joints are in rad. Commanded joints are in the J_ setpoint convention; measured joints
+are the A_ feedback as reported (protocol.feedback_to_joints(), no sign change), which is
+what CartesianView followed before the store existed.
+
+The commanded joints follow the measured ones on the first feedback and whenever the
+robot has been idle for FOLLOW_DELAY and drifted more than FOLLOW_TOLERANCE (moved by
+hand, homing, a stop with lagging feedback).
+"""
+import threading
+import time
+import numpy as np
+
+FOLLOW_DELAY = 1.5              # s without setpoints before the feedback is adopted
+FOLLOW_TOLERANCE = np.radians(0.5)
+
+
+def _frozen(joints):
+    q = np.array(joints, dtype=float).reshape(6)
+    q.flags.writeable = False
+    return q
+
+
+class StateSnapshot:
+    __slots__ = ("version", "commanded", "measured", "tool", "homed", "estop", "moving", "alarms",
+                 "synced", "commanded_time", "measured_time")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StateSnapshot is immutable")
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes, version=self.version + 1)
+        return StateSnapshot(**fields)
+
+    @property
+    def commanded_deg(self):
+        return np.degrees(self.commanded)
+
+    @property
+    def measured_deg(self):
+        return np.degrees(self.measured)
+
+    def as_dict(self):
+        return {
+            "version": self.version,
+            "commanded_deg": self.commanded_deg.tolist(),
+            "measured_deg": self.measured_deg.tolist(),
+            "tool": self.tool,
+            "homed": self.homed,
+            "estop": self.estop,
+            "moving": self.moving,
+            "alarms": list(self.alarms),
+            "feedback_age": None if self.measured_time is None else time.monotonic() - self.measured_time,
+        }
+
+
+class RobotState:
+    def __init__(self, tool=None):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._snapshot = StateSnapshot(
+            version=0, commanded=_frozen(np.zeros(6)), measured=_frozen(np.zeros(6)), tool=tool,
+            homed=False, estop=False, moving=False, alarms=(), synced=False,
+            commanded_time=None, measured_time=None)
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def subscribe(self, callback):
+        """callback(snapshot) after every change (called on the writer's thread)."""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _publish(self, snapshot):
+        self._snapshot = snapshot
+        return snapshot
+
+    def _notify(self, snapshot):
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"[STATE] Listener error: {e}")
+        return snapshot
+
+    def update(self, **changes):
+        """Publishes a snapshot with the given fields changed (tool, homed, estop, moving)."""
+        with self._lock:
+            snapshot = self._publish(self._snapshot.replace(**changes))
+        return self._notify(snapshot)
+
+    # ================= JOINTS =================
+
+    def set_commanded(self, joints):
+        with self._lock:
+            snapshot = self._publish(self._snapshot.replace(
+                commanded=_frozen(joints), synced=True, commanded_time=time.monotonic()))
+        return self._notify(snapshot)
+
+    def set_measured(self, joints, follow=True):
+        """Stores feedback [rad]; the commanded joints adopt it (see module doc) if follow."""
+        now = time.monotonic()
+        measured = _frozen(joints)
+        with self._lock:
+            current = self._snapshot
+            changes = {"measured": measured, "measured_time": now}
+            if follow and not current.moving:
+                idle = current.commanded_time is None or now - current.commanded_time >= FOLLOW_DELAY
+                drift = np.max(np.abs(current.commanded - measured))
+                if not current.synced or (idle and drift > FOLLOW_TOLERANCE):
+                    changes.update(commanded=measured, synced=True)
+            snapshot = self._publish(current.replace(**changes))
+        return self._notify(snapshot)
+
+    def set_measured_joint(self, index, value):
+        """Single joint feedback [rad] (per-motor diagnostics); no commanded follow."""
+        with self._lock:
+            measured = self._snapshot.measured.copy()
+            measured[index] = value
+            snapshot = self._publish(self._snapshot.replace(measured=_frozen(measured),
+                                                            measured_time=time.monotonic()))
+        return self._notify(snapshot)
+
+    def start_joints(self):
+        """Where the next move starts [rad] (writable copy of the commanded joints)."""
+        return self._snapshot.commanded.copy()
+
+    # ================= FLAGS =================
+
+    def set_homed(self, homed):
+        """Homing puts the robot at the joint zero; the setpoint starts there."""
+        if homed:
+            with self._lock:
+                snapshot = self._publish(self._snapshot.replace(
+                    homed=True, commanded=_frozen(np.zeros(6)), synced=True, commanded_time=time.monotonic()))
+            return self._notify(snapshot)
+        return self.update(homed=False)
+
+    def add_alarm(self, code):
+        with self._lock:
+            if code in self._snapshot.alarms:
+                return self._snapshot
+            snapshot = self._publish(self._snapshot.replace(alarms=self._snapshot.alarms + (code,)))
+        return self._notify(snapshot)
+
+    def clear_alarms(self):
+        return self.update(alarms=())
+
+
+# ==============================================================================
+# SHARED STATE (ONE PER PROCESS)
+# ==============================================================================
+_shared_state = None
+_shared_lock = threading.Lock()
+
+def get_robot_state():
+    global _shared_state
+    with _shared_lock:
+        if _shared_state is None:
+            _shared_state = RobotState()
+        return _shared_state
@@ -0,0 +1,160 @@
+"""
+Trajectory streaming to the controller.
+
+legacy   : one "J_j1,...,j6" setpoint per sample, paced by the host (old firmware).
+buffered : timestamped points are queued in a controller-side buffer with credit-based
+           flow control, so host scheduling hiccups do not reach the motors.
+
+Both modes step through the samples on the shared setpoint scheduler (parol6.scheduler),
+so streamed moves show up in the same jitter / missed-deadline stats as the jog loops.
+
+Buffered protocol (ASCII lines, joints in degrees, t in ms from trajectory start):
+    host -> ctrl : TB_START_<dt_ms>                    open a buffered trajectory
+                   TP_<seq>,<t_ms>,<j1>,...,<j6>       one point (uses one credit)
+                   TB_END                              no more points
+                   TB_ABORT                            stop and flush the buffer
+    ctrl -> host : TB_CREDIT_<n>                       n more free buffer slots
+                   TB_DONE                             last point executed
+                   TB_UNDERRUN                         buffer ran empty while moving
+"""
+import threading
+import numpy as np
+from parol6.protocol import format_joint_command
+from parol6.scheduler import get_setpoint_scheduler
+
+STREAM_LEGACY = "legacy"
+STREAM_BUFFERED = "buffered"
+CREDIT_TIMEOUT = 1.0            # s without credits before a buffered stream is aborted
+
+
+class TrajectoryStreamer:
+    def __init__(self, uart, mode=STREAM_LEGACY, scheduler=None):
+        self.uart = uart
+        self.mode = mode if mode in (STREAM_LEGACY, STREAM_BUFFERED) else STREAM_LEGACY
+        self.scheduler = scheduler or get_setpoint_scheduler()
+        self._cond = threading.Condition()
+        self._credits = 0
+        self._done = False
+        self.stats = {"points": 0, "credit_waits": 0, "underruns": 0}
+
+    # ================= CONTROLLER MESSAGES =================
+
+    def handle_message(self, line):
+        """Consumes TB_* replies from the UART reader. Returns True if the line was handled."""
+        if not line.startswith("TB_"):
+            return False
+        with self._cond:
+            if line.startswith("TB_CREDIT_"):
+                try:
+                    self._credits += int(line[len("TB_CREDIT_"):])
+                except ValueError:
+                    print(f"[STREAM] Bad credit message: {line}")
+            elif line == "TB_DONE":
+                self._done = True
+            elif line == "TB_UNDERRUN":
+                self.stats["underruns"] += 1
+                print("[STREAM] Controller buffer underrun")
+            self._cond.notify_all()
+        return True
+
+    # ================= STREAMING =================
+
+    def stream(self, trajectory, keep_running=lambda: True, check=None, on_sample=None):
+        """
+        Streams a JointTrajectory (rad). on_sample(q) follows the planned timeline on the
+        host (UI state); check(q) returning False or keep_running() False aborts.
+        Returns True when the whole trajectory was executed.
+        """
+        if self.mode == STREAM_BUFFERED and self.uart and self.uart.is_open():
+            return self._stream_buffered(trajectory, keep_running, check, on_sample)
+        return self._stream_legacy(trajectory, keep_running, check, on_sample)
+
+    def _send_setpoint(self, q):
+        if self.uart and self.uart.is_open():
+            self.uart.send_message(format_joint_command(q))
+
+    def _play(self, trajectory, keep_running, check, on_sample, emit):
+        """
+        Steps through the samples on the setpoint scheduler (blocking): sample k is due at
+        k * trajectory.dt. emit(k) sends it; after an overrun every sample already due is
+        checked, but only the latest one is emitted. Returns True when the last sample went out.
+        """
+        n = len(trajectory)
+        clock = [None]          # trajectory time of the current tick [s]
+        due = [0]               # first sample not emitted yet
+
+        def step(dt):
+            clock[0] = 0.0 if clock[0] is None else clock[0] + dt
+            last = min(n - 1, int(clock[0] / trajectory.dt + 1e-9))
+            if last >= due[0]:
+                if check is not None and not all(check(q) for q in trajectory.q[due[0]:last + 1]):
+                    return False
+                emit(last)
+                if on_sample:
+                    on_sample(trajectory.q[last])
+                due[0] = last + 1
+            return due[0] < n
+
+        if n:
+            self.scheduler.run(step, keep_running=keep_running)
+        return due[0] >= n
+
+    def _stream_legacy(self, trajectory, keep_running, check, on_sample):
+        return self._play(trajectory, keep_running, check, on_sample,
+                          lambda k: self._send_setpoint(trajectory.q[k]))
+
+    def _fill(self, trajectory, sent):
+        """Sends as many points as the controller has credits for (non-blocking)."""
+        with self._cond:
+            n = min(self._credits, len(trajectory) - sent)
+            self._credits -= n
+        for k in range(sent, sent + n):
+            vals = ",".join(f"{v:.2f}" for v in np.degrees(trajectory.q[k]))
+            self.uart.send_message(f"TP_{k},{int(round(trajectory.t[k] * 1000))},{vals}")
+        self.stats["points"] += n
+        return sent + n
+
+    def _wait_credits(self, timeout):
+        with self._cond:
+            if self._credits == 0:
+                self.stats["credit_waits"] += 1
+            return self._cond.wait_for(lambda: self._credits > 0, timeout)
+
+    def abort(self):
+        if self.uart and self.uart.is_open() and self.mode == STREAM_BUFFERED:
+            self.uart.send_message("TB_ABORT")
+
+    def _stream_buffered(self, trajectory, keep_running, check, on_sample):
+        with self._cond:
+            self._credits = 0
+            self._done = False
+        self.uart.send_message(f"TB_START_{int(round(trajectory.dt * 1000))}")
+        if not self._wait_credits(CREDIT_TIMEOUT):
+            print("[STREAM] No TB_CREDIT from controller - falling back to J_ streaming")
+            return self._stream_legacy(trajectory, keep_running, check, on_sample)
+
+        # Host timeline (UI state, checks) on the scheduler; points go out as credits allow
+        filled = [0]
+
+        def emit(k):
+            filled[0] = self._fill(trajectory, filled[0])
+
+        if not self._play(trajectory, keep_running, check, on_sample, emit):
+            self.abort()
+            return False
+        sent = filled[0]
+
+        # The controller lags the host timeline by its buffer depth
+        while sent < len(trajectory):
+            if not keep_running() or not self._wait_credits(CREDIT_TIMEOUT):
+                print("[STREAM] Credit timeout - aborting")
+                self.abort()
+                return False
+            sent = self._fill(trajectory, sent)
+        self.uart.send_message("TB_END")
+
+        with self._cond:
+            done = self._cond.wait_for(lambda: self._done, CREDIT_TIMEOUT + trajectory.duration)
+        if not done:
+            print("[STREAM] TB_DONE not received")
+        return done
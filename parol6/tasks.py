@@ -0,0 +1,257 @@
+"""
+One scheduler thread for the timed non-motion work of the app (clock, label refresh,
+delayed start-up steps, test sequences) instead of a daemon thread per job. Jog and move
+loops stream setpoints from their own threads (SetpointScheduler.run), never from here.
+
+Tasks run one at a time on the loop thread, ordered by absolute deadline
+(time.monotonic_ns):
+
+    loop.call_later(delay, fn)      fn() once after delay [s]
+    loop.call_every(period, fn)     fn(dt) on a drift-free grid until it returns False
+    loop.spawn(generator)           the generator yields how long [s] to wait before it resumes
+
+Every call returns a Task; task.cancel() drops it before its next run and on_done(task)
+is called on the loop thread when a task ends (finished, cancelled or failed). A task
+must not block - waits are yields or deadlines - because it holds up all the others.
+
+Periodic tasks skip missed deadlines instead of bursting (as SetpointScheduler.run);
+precise tasks spin the last SPIN_NS before their deadline. The run time of every call is
+accounted per task name (stats(), summary()).
+"""
+import heapq
+import itertools
+import threading
+import time
+
+SPIN_NS = 500_000               # Busy-wait the last 0.5 ms before a precise deadline
+
+
+class Task:
+    def __init__(self, loop, name, precise=False, on_done=None):
+        self.loop = loop
+        self.name = name
+        self.precise = precise
+        self.on_done = on_done
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.late_ns = 0            # Wake-up delay of the current run
+        self.missed = 0             # Deadlines skipped before the current run (periodic)
+        self._done = threading.Event()
+
+    def cancel(self):
+        self.cancelled = True
+        self.loop._cancel(self)
+
+    @property
+    def active(self):
+        return not self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the task ended (do not call from a task)."""
+        return self._done.wait(timeout)
+
+    def _fire(self, deadline_ns):
+        """Runs once; returns the next deadline [ns] or None when the task is finished."""
+        raise NotImplementedError
+
+
+class _DelayedTask(Task):
+    def __init__(self, loop, fn, name, **kwargs):
+        super().__init__(loop, name, **kwargs)
+        self.fn = fn
+
+    def _fire(self, deadline_ns):
+        self.result = self.fn()
+        return None
+
+
+class _PeriodicTask(Task):
+    def __init__(self, loop, fn, period, name, **kwargs):
+        super().__init__(loop, name, **kwargs)
+        self.fn = fn
+        self.period_ns = max(1, int(period * 1e9))
+        self.period = self.period_ns / 1e9
+        self.dt = self.period
+
+    def _fire(self, deadline_ns):
+        if self.fn(self.dt) is False:
+            return None
+        # Next deadline on the absolute grid; skip the ones already missed
+        deadline_ns += self.period_ns
+        now = time.monotonic_ns()
+        self.missed = (now - deadline_ns) // self.period_ns + 1 if now > deadline_ns else 0
+        self.dt = (1 + self.missed) * self.period
+        return deadline_ns + self.missed * self.period_ns
+
+
+class _GeneratorTask(Task):
+    def __init__(self, loop, generator, name, **kwargs):
+        super().__init__(loop, name, **kwargs)
+        self.generator = generator
+
+    def _fire(self, deadline_ns):
+        try:
+            delay = next(self.generator)
+        except StopIteration as e:
+            self.result = e.value
+            return None
+        return time.monotonic_ns() + int(max(0.0, delay or 0.0) * 1e9)
+
+    def _close(self):
+        self.generator.close()
+
+
+class TaskLoop:
+    def __init__(self, name="parol6-tasks"):
+        self.name = name
+        self.current = None         # Task being run (loop thread only)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._started_ns = time.monotonic_ns()
+
+    # ================= SCHEDULING =================
+
+    def call_later(self, delay, fn, name=None, on_done=None):
+        task = _DelayedTask(self, fn, name or getattr(fn, "__name__", "task"), on_done=on_done)
+        return self._schedule(task, delay)
+
+    def call_every(self, period, fn, name=None, delay=0.0, precise=False, on_done=None):
+        task = _PeriodicTask(self, fn, period, name or getattr(fn, "__name__", "task"),
+                             precise=precise, on_done=on_done)
+        return self._schedule(task, delay)
+
+    def spawn(self, generator, name=None, on_done=None):
+        task = _GeneratorTask(self, generator, name or getattr(generator, "__name__", "task"), on_done=on_done)
+        return self._schedule(task, 0.0)
+
+    def _schedule(self, task, delay):
+        deadline = time.monotonic_ns() + int(max(0.0, delay) * 1e9)
+        with self._cond:
+            self._push(task, deadline)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return task
+
+    def _push(self, task, deadline_ns):
+        heapq.heappush(self._heap, (deadline_ns, next(self._seq), task))
+        self._cond.notify()
+
+    def _cancel(self, task):
+        # Move a waiting task to the front: the loop drops it and calls on_done right away
+        with self._cond:
+            for k, entry in enumerate(self._heap):
+                if entry[2] is task:
+                    self._heap[k] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    self._push(task, 0)
+                    break
+
+    # ================= LOOP =================
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, _, task = self._heap[0]
+                if not task.cancelled:
+                    wait_ns = deadline - time.monotonic_ns() - (SPIN_NS if task.precise else 0)
+                    if wait_ns > 0:
+                        # Woken early by a new or cancelled task: look at the heap again
+                        self._cond.wait(wait_ns / 1e9)
+                        continue
+                heapq.heappop(self._heap)
+            if task.cancelled:
+                self._finish(task)
+                continue
+            while task.precise and time.monotonic_ns() < deadline:
+                pass
+            self._step(task, deadline)
+
+    def _step(self, task, deadline):
+        self.current = task
+        start = time.monotonic_ns()
+        task.late_ns = max(0, start - deadline)
+        try:
+            next_deadline = task._fire(deadline)
+        except Exception as e:
+            print(f"[TASKS] Task '{task.name}' failed: {e}")
+            task.error = e
+            next_deadline = None
+        finally:
+            self.current = None
+        self._account(task.name, time.monotonic_ns() - start)
+
+        if next_deadline is None or task.cancelled:
+            self._finish(task)
+        else:
+            with self._cond:
+                self._push(task, next_deadline)
+
+    def _finish(self, task):
+        if isinstance(task, _GeneratorTask) and task.cancelled:
+            task._close()
+        task._done.set()
+        if task.on_done:
+            try:
+                task.on_done(task)
+            except Exception as e:
+                print(f"[TASKS] on_done of '{task.name}' failed: {e}")
+
+    # ================= STATS =================
+
+    def _account(self, name, run_ns):
+        with self._stats_lock:
+            entry = self._stats.setdefault(name, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += run_ns
+            entry[2] = max(entry[2], run_ns)
+
+    def active_tasks(self):
+        with self._cond:
+            return sorted({task.name for _, _, task in self._heap if not task.cancelled})
+
+    def stats(self):
+        """{name: {runs, total_ms, mean_ms, max_ms}} since the start (or reset_stats)."""
+        with self._stats_lock:
+            return {name: {"runs": runs, "total_ms": total / 1e6, "mean_ms": total / 1e6 / max(1, runs),
+                           "max_ms": peak / 1e6}
+                    for name, (runs, total, peak) in self._stats.items()}
+
+    def busy_fraction(self):
+        """Share of wall time spent running tasks."""
+        with self._stats_lock:
+            busy = sum(entry[1] for entry in self._stats.values())
+        return busy / max(1, time.monotonic_ns() - self._started_ns)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+            self._started_ns = time.monotonic_ns()
+
+    def summary(self):
+        stats = sorted(self.stats().items(), key=lambda item: -item[1]["total_ms"])
+        parts = [f"{name}: {s['runs']}x {s['mean_ms']:.2f}/{s['max_ms']:.2f}ms" for name, s in stats]
+        return f"busy={100.0 * self.busy_fraction():.1f}% | " + ", ".join(parts)
+
+
+# ==============================================================================
+# SHARED LOOP (ONE PER PROCESS)
+# ==============================================================================
+_shared_loop = None
+_shared_lock = threading.Lock()
+
+def get_task_loop():
+    global _shared_loop
+    with _shared_lock:
+        if _shared_loop is None:
+            _shared_loop = TaskLoop()
+        return _shared_loop
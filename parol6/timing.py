@@ -0,0 +1,48 @@
+from collections import deque
+import numpy as np
+
+
+class LoopTimingHistogram:
+    """
+    Collects loop periods of a periodic thread (e.g. the 20 Hz jog loop)
+    and summarizes them as mean / jitter (std) / max plus a coarse histogram.
+    Only the last `history` periods are kept (ring buffer), so a long jog or
+    program does not grow memory; the histogram counts every period.
+    """
+
+    def __init__(self, nominal_period, bin_width=0.005, n_bins=12, history=1000):
+        self.nominal_period = nominal_period
+        self.bin_width = bin_width
+        self.n_bins = n_bins
+        self.history = history
+        self.reset()
+
+    def reset(self):
+        self.counts = np.zeros(self.n_bins, dtype=int)
+        self.periods = deque(maxlen=self.history)
+        self._last = None
+
+    def tick(self, now):
+        """Call once per loop iteration with a monotonic timestamp [s]."""
+        if self._last is not None:
+            period = now - self._last
+            self.periods.append(period)
+            self.counts[min(int(period / self.bin_width), self.n_bins - 1)] += 1
+        self._last = now
+
+    def stats(self):
+        if not self.periods:
+            return {"n": 0, "mean_ms": 0.0, "jitter_ms": 0.0, "max_ms": 0.0}
+        p = np.array(self.periods) * 1000.0
+        return {
+            "n": int(self.counts.sum()),
+            "mean_ms": float(p.mean()),
+            "jitter_ms": float(np.std(p - self.nominal_period * 1000.0)),
+            "max_ms": float(p.max()),
+        }
+
+    def summary(self):
+        s = self.stats()
+        bins = " ".join(f"{int(i * self.bin_width * 1000)}:{c}" for i, c in enumerate(self.counts) if c)
+        return (f"n={s['n']} mean={s['mean_ms']:.1f}ms jitter={s['jitter_ms']:.2f}ms "
+                f"max={s['max_ms']:.1f}ms | {bins}")
@@ -0,0 +1,220 @@
+"""
+Joint-space trajectory generator.
+
+Point-to-point moves are synchronized: all joints follow one normalized profile s(t) in
+[0, 1] (a straight line in joint space, like the old _animate_move), so they start and
+stop together. The profile limits come from the joint that is slowest relative to its
+distance, which makes the move time-optimal for the given per-joint limits.
+
+    profile = "scurve"    jerk-limited, 7 phases
+    profile = "trapezoid" acceleration-limited, 3 phases
+
+Trajectories are sampled on a fixed time grid (NumPy arrays, rad / rad/s).
+Velocity and acceleration limits are clamped to the drive VMAX / AMAX configured in
+motor_settings.json (see parol6.drives).
+"""
+import numpy as np
+from parol6.drives import get_drive_model
+
+DEFAULT_DT = 0.05               # 20 Hz, same as the jog loops
+
+# Per-joint limits at 100 % speed (90 deg/s matches the previous JOG animation speed)
+JOINT_MAX_VEL = np.radians([90.0] * 6)
+JOINT_MAX_ACC = np.radians([180.0] * 6)
+JOINT_MAX_JERK = np.radians([900.0] * 6)
+
+
+def drive_limits(max_vel, max_acc):
+    """Planner limits [rad] clamped to the per-joint drive limits."""
+    vel, acc = get_drive_model().joint_limits()
+    return (np.minimum(np.asarray(max_vel, dtype=float), np.radians(vel)),
+            np.minimum(np.asarray(max_acc, dtype=float), np.radians(acc)))
+
+
+class MotionProfile:
+    """Rest-to-rest profile for a distance L with velocity / acceleration / jerk limits."""
+
+    def __init__(self, distance, max_vel, max_acc, max_jerk=None):
+        self.distance = float(distance)
+        self.jerk_limited = max_jerk is not None and np.isfinite(max_jerk)
+        phases = self._plan(self.distance, max_vel, max_acc, max_jerk)
+
+        # Phase table: start time, duration, start pos / vel / acc, jerk
+        self.starts = np.zeros(len(phases))
+        self.durations = np.array([p[0] for p in phases])
+        self.acc0 = np.array([p[1] for p in phases])
+        self.jerks = np.array([p[2] for p in phases])
+        self.pos0 = np.zeros(len(phases))
+        self.vel0 = np.zeros(len(phases))
+        t = p = v = 0.0
+        for i, (dur, acc, jerk) in enumerate(phases):
+            self.starts[i], self.pos0[i], self.vel0[i] = t, p, v
+            p += v * dur + acc * dur ** 2 / 2.0 + jerk * dur ** 3 / 6.0
+            v += acc * dur + jerk * dur ** 2 / 2.0
+            t += dur
+        self.duration = t
+
+    def _accel_times(self, vp, a, j):
+        if not self.jerk_limited:
+            return 0.0, vp / a
+        if vp * j >= a * a:
+            tj = a / j
+            return tj, tj + vp / a
+        tj = np.sqrt(vp / j)
+        return tj, 2.0 * tj
+
+    def _plan(self, L, v, a, j):
+        if L <= 0.0:
+            return [(0.0, 0.0, 0.0)]
+        tj, ta = self._accel_times(v, a, j)
+        if v * ta >= L:
+            # Peak velocity not reached: largest vp with vp * ta(vp) <= L
+            lo, hi = 0.0, v
+            for _ in range(60):
+                mid = 0.5 * (lo + hi)
+                if mid * self._accel_times(mid, a, j)[1] > L:
+                    hi = mid
+                else:
+                    lo = mid
+            v = lo
+            tj, ta = self._accel_times(v, a, j)
+            tv = max(0.0, L / v - ta) if v > 0 else 0.0
+        else:
+            tv = L / v - ta
+
+        if not self.jerk_limited:
+            acc = v / ta
+            return [(ta, acc, 0.0), (tv, 0.0, 0.0), (ta, -acc, 0.0)]
+        ap = j * tj
+        tc = max(0.0, ta - 2.0 * tj)
+        return [(tj, 0.0, j), (tc, ap, 0.0), (tj, ap, -j), (tv, 0.0, 0.0),
+                (tj, 0.0, -j), (tc, -ap, 0.0), (tj, -ap, j)]
+
+    def sample(self, t):
+        """Position and velocity of the profile at times t (array)."""
+        t = np.clip(np.asarray(t, dtype=float), 0.0, self.duration)
+        idx = np.clip(np.searchsorted(self.starts, t, side="right") - 1, 0, len(self.starts) - 1)
+        dt = t - self.starts[idx]
+        a0, j = self.acc0[idx], self.jerks[idx]
+        pos = self.pos0[idx] + self.vel0[idx] * dt + a0 * dt ** 2 / 2.0 + j * dt ** 3 / 6.0
+        vel = self.vel0[idx] + a0 * dt + j * dt ** 2 / 2.0
+        end = t >= self.duration
+        pos[end] = self.distance
+        vel[end] = 0.0
+        return pos, vel
+
+
+class JointTrajectory:
+    """Joint trajectory on a fixed time grid: t (N,), q (N, 6) [rad], qd (N, 6) [rad/s]."""
+
+    def __init__(self, t, q, qd, dt=DEFAULT_DT):
+        self.t = t
+        self.q = q
+        self.qd = qd
+        self.dt = dt
+        self.duration = float(t[-1]) if len(t) else 0.0
+
+    def __len__(self):
+        return len(self.t)
+
+    def at(self, time_s):
+        """Joints at an arbitrary time (linear interpolation between grid samples)."""
+        if len(self.t) == 1 or time_s <= 0.0:
+            return self.q[0].copy()
+        if time_s >= self.duration:
+            return self.q[-1].copy()
+        k = min(int(time_s / self.dt), len(self.t) - 2)
+        w = (time_s - self.t[k]) / (self.t[k + 1] - self.t[k])
+        return self.q[k] + w * (self.q[k + 1] - self.q[k])
+
+
+def plan_joint_move(start, target, max_vel=JOINT_MAX_VEL, max_acc=JOINT_MAX_ACC, max_jerk=JOINT_MAX_JERK,
+                    speed_scale=1.0, profile="scurve", dt=DEFAULT_DT):
+    """
+    Synchronized, time-optimal point-to-point move from start to target [rad].
+    speed_scale (0..1] scales the velocity and acceleration limits (speed slider).
+    """
+    start = np.asarray(start, dtype=float)
+    target = np.asarray(target, dtype=float)
+    max_vel, max_acc = drive_limits(max_vel, max_acc)
+    delta = target - start
+    dist = np.abs(delta)
+    moving = dist > 1e-9
+    if not np.any(moving):
+        return JointTrajectory(np.zeros(1), start[None, :].copy(), np.zeros((1, len(start))), dt)
+
+    scale = max(1e-3, float(speed_scale))
+    # Limits of the normalized profile s in [0, 1]: the most constrained joint wins
+    v = np.min(np.asarray(max_vel, dtype=float)[moving] * scale / dist[moving])
+    a = np.min(np.asarray(max_acc, dtype=float)[moving] * scale / dist[moving])
+    j = np.min(np.asarray(max_jerk, dtype=float)[moving] * scale / dist[moving]) if profile == "scurve" else None
+
+    shape = MotionProfile(1.0, v, a, j)
+    n = int(np.ceil(shape.duration / dt)) + 1
+    t = np.arange(n) * dt
+    s, sd = shape.sample(t)
+    q = start + s[:, None] * delta
+    qd = sd[:, None] * delta
+    return JointTrajectory(t, q, qd, dt)
+
+
+def time_scale_path(q, dt=DEFAULT_DT, max_vel=JOINT_MAX_VEL, speed_scale=1.0, max_acc=JOINT_MAX_ACC):
+    """
+    Retimes a joint path sampled every dt to the joint velocity and acceleration limits
+    (clamped to the drives, scaled by speed_scale); it never runs faster than sampled.
+
+    Long segments are split first, then the path is followed sample by sample (s = sample
+    index) with a squared path speed x = sdot^2 per sample and a constant path acceleration
+    on each segment, so q_ddot = dq * sddot there. x is capped by the velocity limits and by the direction change at
+    every sample (seen within one dt on the output grid), then a forward (acceleration) and
+    a backward (deceleration) pass bound |x[i+1] - x[i]| by the acceleration limits. The
+    path starts and ends at rest and is resampled on the fixed dt grid.
+    """
+    q = np.asarray(q, dtype=float)
+    if len(q) < 2:
+        return JointTrajectory(np.zeros(len(q)), q.copy(), np.zeros_like(q), dt)
+
+    scale = max(1e-3, float(speed_scale))
+    max_vel, max_acc = drive_limits(max_vel, max_acc)
+    max_vel, max_acc = max_vel * scale, max_acc * scale
+
+    # Segments longer than one sample at full speed are split, so the speed can ramp inside them
+    pieces = np.max(np.ceil(np.abs(np.diff(q, axis=0)) / (max_vel * dt)), axis=1).astype(int)
+    if np.any(pieces > 1):
+        w = np.concatenate([np.arange(m) / m for m in np.maximum(pieces, 1)])
+        first = np.repeat(np.arange(len(q) - 1), np.maximum(pieces, 1))
+        q = np.vstack([q[first] + w[:, None] * (q[first + 1] - q[first]), q[-1:]])
+
+    seg = np.diff(q, axis=0)                            # dq/ds of every segment
+    step = np.abs(seg)
+    with np.errstate(divide="ignore"):
+        # Velocity: both segments meeting at a sample; direction change: |d2| * sdot / dt.
+        # Both share one dt window on the output grid, so each gets half of max_acc.
+        near = np.maximum(np.vstack([step[:1], step]), np.vstack([step, step[-1:]]))
+        x = np.minimum(np.min((max_vel / near) ** 2, axis=1), 1.0 / dt ** 2)
+        turn = np.abs(np.diff(seg, axis=0))
+        x[1:-1] = np.minimum(x[1:-1], np.min((0.5 * max_acc * dt / turn) ** 2, axis=1))
+        gain = np.min(max_acc / step, axis=1)           # max |x[i+1] - x[i]| on segment i
+    x[0] = x[-1] = 0.0
+    x, gain = x.tolist(), gain.tolist()
+    for i in range(len(x) - 1):
+        x[i + 1] = min(x[i + 1], x[i] + gain[i])
+    for i in range(len(x) - 2, -1, -1):
+        x[i] = min(x[i], x[i + 1] + gain[i])
+
+    speed = np.sqrt(np.asarray(x))
+    duration = 2.0 / np.maximum(speed[:-1] + speed[1:], 1e-9)
+    t_path = np.concatenate([[0.0], np.cumsum(duration)])
+    n = int(np.ceil(t_path[-1] / dt - 1e-9)) + 1
+    t = np.minimum(np.arange(n) * dt, t_path[-1])
+
+    # Path parameter on the output grid: constant sddot inside every segment
+    k = np.clip(np.searchsorted(t_path, t, side="right") - 1, 0, len(seg) - 1)
+    u = t - t_path[k]
+    accel = (speed[k + 1] ** 2 - speed[k] ** 2) / 2.0
+    frac = np.clip(speed[k] * u + 0.5 * accel * u ** 2, 0.0, 1.0)
+    q_new = q[k] + frac[:, None] * seg[k]
+    q_new[-1] = q[-1]
+    qd = np.gradient(q_new, dt, axis=0)
+    qd[0] = qd[-1] = 0.0
+    return JointTrajectory(np.arange(n) * dt, q_new, qd, dt)
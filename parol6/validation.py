@@ -0,0 +1,135 @@
+"""
+Pre-flight validation of a planned joint trajectory.
+
+The whole (N, 6) path is checked before anything is sent to the robot:
+    OORn : joint n outside its limits, or over its velocity / acceleration bound
+    IKE  : invalid joints (NaN) or TCP outside the workspace box
+    COL  : self-collision (hull pairs) or penetration of a cell obstacle
+Each check runs over all samples at once; the earliest violation wins.
+"""
+import numpy as np
+from parol6.collision import get_collision_checker
+from parol6.obstacles import get_obstacle_monitor
+from parol6.trajectory import DEFAULT_DT, JOINT_MAX_ACC, JOINT_MAX_VEL, drive_limits
+
+# TCP workspace box [m] (same as the Cartesian jog limits)
+WORKSPACE_LIMITS = {
+    'x': (-0.700, 0.700),
+    'y': (-0.700, 0.700),
+    'z': (-0.300, 0.900)
+}
+VALIDATION_TOLERANCE = 0.05     # 5 % over a velocity / acceleration bound is still accepted
+
+
+class Violation:
+    def __init__(self, index, code, message):
+        self.index = index
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return f"{self.code} at sample {self.index}: {self.message}"
+
+
+class TrajectoryValidator:
+    def __init__(self, engine, max_vel=None, max_acc=None, workspace=WORKSPACE_LIMITS,
+                 tolerance=VALIDATION_TOLERANCE):
+        """
+        max_vel / max_acc [rad]: None = the planner limits clamped to the drives
+        (trajectory.drive_limits, looked up per validate() as the gear ratios may change).
+        """
+        self.engine = engine
+        self.max_vel = None if max_vel is None else np.asarray(max_vel, dtype=float)
+        self.max_acc = None if max_acc is None else np.asarray(max_acc, dtype=float)
+        self.box_min = np.array([workspace[a][0] for a in "xyz"])
+        self.box_max = np.array([workspace[a][1] for a in "xyz"])
+        self.tolerance = tolerance
+        self.collision = None
+        self.obstacles = None
+        try:
+            self.collision = get_collision_checker(engine)
+            self.obstacles = get_obstacle_monitor(engine)
+        except Exception as e:
+            print(f"[VALIDATE] Collision checks unavailable: {e}")
+
+    def limits(self):
+        """Velocity and acceleration bounds [rad] checked by validate()."""
+        max_vel, max_acc = drive_limits(JOINT_MAX_VEL, JOINT_MAX_ACC)
+        if self.max_vel is not None:
+            max_vel = self.max_vel
+        if self.max_acc is not None:
+            max_acc = self.max_acc
+        return max_vel, max_acc
+
+    @staticmethod
+    def _first(mask):
+        """(sample, joint) of the first True entry of a (N, 6) mask, or None."""
+        rows = np.nonzero(mask.any(axis=1))[0]
+        if not len(rows):
+            return None
+        return int(rows[0]), int(np.argmax(mask[rows[0]]))
+
+    def _kinematic_violations(self, q, dt):
+        found = []
+        bad = ~np.isfinite(q).all(axis=1)
+        if bad.any():
+            found.append(Violation(int(np.argmax(bad)), "IKE", "invalid joint values"))
+            return found
+
+        limits = np.asarray(self.engine.joint_limits_rad, dtype=float)
+        hit = self._first((q < limits[:, 0] - 1e-6) | (q > limits[:, 1] + 1e-6))
+        if hit:
+            n, j = hit
+            found.append(Violation(n, f"OOR{j + 1}", f"J{j + 1} = {np.degrees(q[n, j]):.1f} deg outside limits"))
+
+        max_vel, max_acc = self.limits()
+        if len(q) > 1:
+            vel = np.diff(q, axis=0) / dt
+            hit = self._first(np.abs(vel) > max_vel * (1.0 + self.tolerance))
+            if hit:
+                n, j = hit
+                found.append(Violation(n + 1, f"OOR{j + 1}",
+                                       f"J{j + 1} velocity {np.degrees(abs(vel[n, j])):.1f} deg/s over limit"))
+        if len(q) > 2:
+            acc = np.diff(q, n=2, axis=0) / dt ** 2
+            hit = self._first(np.abs(acc) > max_acc * (1.0 + self.tolerance))
+            if hit:
+                n, j = hit
+                found.append(Violation(n + 2, f"OOR{j + 1}",
+                                       f"J{j + 1} acceleration {np.degrees(abs(acc[n, j])):.1f} deg/s^2 over limit"))
+
+        tcp = self.engine.forward_kinematics_batch(q)[:, :3, 3]
+        outside = ((tcp < self.box_min) | (tcp > self.box_max)).any(axis=1)
+        if outside.any():
+            n = int(np.argmax(outside))
+            found.append(Violation(n, "IKE", f"TCP {np.round(tcp[n] * 1000.0, 1).tolist()} mm outside workspace"))
+        return found
+
+    def _collision_violations(self, q):
+        found = []
+        if self.collision:
+            # Contacts already present at the start (hull approximation) must not block the move
+            start_pairs = self.collision.colliding_pairs(q[0])
+            n, pair = self.collision.first_collision(q, skip_pairs=start_pairs)
+            if n is not None:
+                found.append(Violation(n, "COL", f"self-collision {pair[0]}-{pair[1]}"))
+        if self.obstacles and self.obstacles.active:
+            distance, names = self.obstacles.clearance_batch(q)
+            # Starting inside an obstacle is only allowed while moving out of it
+            inside = (distance < 0.0) & (distance < distance[0])
+            if inside.any():
+                n = int(np.argmax(inside))
+                found.append(Violation(n, "COL", f"obstacle '{names[n]}' penetrated ({distance[n] * 1000:.1f} mm)"))
+        return found
+
+    def validate(self, q, dt=DEFAULT_DT, check_collision=True):
+        """First Violation of a (N, 6) joint trajectory [rad] sampled every dt, or None."""
+        q = np.atleast_2d(np.asarray(q, dtype=float))
+        if not len(q):
+            return None
+        found = self._kinematic_violations(q, dt)
+        if check_collision and np.isfinite(q).all():
+            # Only the part before the first kinematic violation needs the (costly) collision pass
+            end = min([v.index for v in found], default=len(q) - 1) + 1
+            found += self._collision_violations(q[:end])
+        return min(found, key=lambda v: v.index) if found else None